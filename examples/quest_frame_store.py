@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Quest Test Server Frame Store
+Bounded, thread-safe ring buffer for the frames and messages kept in memory
+by quest_test_server.py and quest_test_server_async.py
+
+Features:
+1. Capacity limited by item count and by total payload bytes
+2. O(1) append, eviction and lookup by frame_id / message_id
+3. Optional preallocated contiguous storage for fixed-size frames
+"""
+
+import threading
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+class FrameStore:
+    """Ring buffer of dataclass items (CameraFrame, AudioFrame, TextMessage)
+
+    Items are kept in insertion order and are expected to have increasing
+    keys, which is how the servers allocate frame and message ids.
+
+    With fixed_size=True, the first frame appended to an empty store fixes
+    the slot size and one contiguous arena is allocated for all slots.
+    Later frames of that size are copied into their slot instead of keeping
+    their own buffer alive, and frames of other sizes are stored as-is.
+    Frames read back from the arena get a private copy of their data, so a
+    slot being overwritten never changes a frame already returned."""
+
+    def __init__(self, max_items: int = 100, max_bytes: Optional[int] = None,
+                 key: str = 'frame_id', data_attr: Optional[str] = 'data',
+                 fixed_size: bool = False):
+        if max_items < 1:
+            raise ValueError("max_items must be at least 1")
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.key = key
+        self.data_attr = data_attr
+        self.fixed_size = fixed_size and data_attr is not None
+
+        self.lock = threading.Lock()
+
+        # Ring of stored items; positions [start, start + count) are live
+        self.items: List[Any] = [None] * max_items
+        self.sizes: List[int] = [0] * max_items
+        self.start = 0
+        self.count = 0
+
+        # Key -> ring position
+        self.index: Dict[Any, int] = {}
+
+        # Total payload bytes of stored items
+        self.total_bytes = 0
+
+        # Contiguous storage for fixed-size frames, allocated on first use
+        self.slot_size = 0
+        self.arena: Optional[memoryview] = None
+        self.in_arena: List[bool] = [False] * max_items
+
+        # Counters
+        self.appended = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def item_size(self, item) -> int:
+        """Payload size of an item in bytes"""
+        if self.data_attr is None:
+            return 0
+        return len(getattr(item, self.data_attr))
+
+    def allocate_arena(self, slot_size: int):
+        """Allocate one contiguous buffer holding every fixed-size slot
+
+        The number of slots is bounded by both max_items and max_bytes,
+        which lowers max_items when the byte budget is the tighter limit."""
+        slots = self.max_items
+        if self.max_bytes is not None:
+            slots = max(1, min(slots, self.max_bytes // slot_size))
+        self.max_items = slots
+        self.items = self.items[:slots]
+        self.sizes = self.sizes[:slots]
+        self.in_arena = self.in_arena[:slots]
+        self.slot_size = slot_size
+        self.arena = memoryview(bytearray(slots * slot_size))
+
+    def slot(self, position: int) -> memoryview:
+        """Arena view of the slot at a ring position"""
+        offset = position * self.slot_size
+        return self.arena[offset:offset + self.slot_size]
+
+    def evict_oldest(self):
+        """Drop the oldest item (lock held)"""
+        position = self.start
+        item = self.items[position]
+        del self.index[getattr(item, self.key)]
+        self.total_bytes -= self.sizes[position]
+        self.items[position] = None
+        self.sizes[position] = 0
+        self.in_arena[position] = False
+        self.start = (self.start + 1) % self.max_items
+        self.count -= 1
+        self.evicted += 1
+
+    def append(self, item):
+        """Store an item, evicting the oldest ones to stay within capacity"""
+        size = self.item_size(item)
+        with self.lock:
+            if self.fixed_size and self.arena is None and self.count == 0 and size:
+                self.allocate_arena(size)
+
+            # Make room by count, then by bytes
+            if self.count == self.max_items:
+                self.evict_oldest()
+            if self.max_bytes is not None:
+                while self.count and self.total_bytes + size > self.max_bytes:
+                    self.evict_oldest()
+
+            position = (self.start + self.count) % self.max_items
+            if self.arena is not None and size == self.slot_size:
+                view = self.slot(position)
+                view[:] = getattr(item, self.data_attr)
+                item = replace(item, **{self.data_attr: view})
+                self.in_arena[position] = True
+
+            self.items[position] = item
+            self.sizes[position] = size
+            self.index[getattr(item, self.key)] = position
+            self.total_bytes += size
+            self.count += 1
+            self.appended += 1
+
+    def read(self, position: int):
+        """Return the item at a ring position, detached from the arena (lock held)"""
+        item = self.items[position]
+        if self.in_arena[position]:
+            item = replace(item, **{self.data_attr: bytes(getattr(item, self.data_attr))})
+        return item
+
+    def get(self, key) -> Optional[Any]:
+        """Look up an item by key in O(1)
+
+        Items outside the arena are returned as stored, so callers may
+        update fields such as TextMessage.status in place."""
+        with self.lock:
+            position = self.index.get(key)
+            if position is None:
+                return None
+            return self.read(position)
+
+    def key_at(self, offset: int):
+        """Key of the item 'offset' places after the oldest one (lock held)"""
+        return getattr(self.items[(self.start + offset) % self.max_items], self.key)
+
+    def bisect_key(self, key) -> int:
+        """Offset of the first item whose key is not less than 'key' (lock held)"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def page(self, limit: int = 10, before=None, after=None) -> List[Any]:
+        """Return up to 'limit' items, oldest first
+
+        Without a cursor, these are the latest 'limit' items. With 'after',
+        they are the oldest items whose key is greater than it; with
+        'before', the newest items whose key is less than it."""
+        with self.lock:
+            if limit <= 0 or not self.count:
+                return []
+            if after is not None:
+                first = self.bisect_key(after)
+                if first < self.count and self.key_at(first) == after:
+                    first += 1
+                last = min(self.count, first + limit)
+            else:
+                last = self.count if before is None else self.bisect_key(before)
+                first = max(0, last - limit)
+            return [self.read((self.start + offset) % self.max_items)
+                    for offset in range(first, last)]
+
+    def latest(self, limit: int = 10) -> List[Any]:
+        """Return the latest 'limit' items, oldest first"""
+        return self.page(limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """Occupancy and eviction statistics"""
+        with self.lock:
+            return {
+                "items": self.count,
+                "max_items": self.max_items,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "slot_size": self.slot_size,
+                "appended": self.appended,
+                "evicted": self.evicted
+            }
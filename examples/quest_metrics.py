@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Quest Test Server Metrics
+Performance instrumentation for quest_test_server.py and quest_test_server_async.py
+
+Features:
+1. Latency histograms per route and stage (parse, decode, process) and per
+   persisted channel and stage (convert, write)
+2. Frames/s and MB/s per channel over sliding windows
+3. In-flight request gauges and request counters per route
+4. Callback gauges for queue depths and buffer occupancy, and callback
+   counters for running totals
+5. Prometheus text exposition format and a JSON view of the same data
+"""
+
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Sliding windows for throughput, in seconds
+DEFAULT_WINDOWS = (10, 60)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class Histogram:
+    """Fixed-bucket latency histogram (not locked; guarded by Metrics.lock)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by linear interpolation within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99)
+        }
+
+class SlidingWindow:
+    """Per-second frame and byte counts for the last max_window seconds"""
+
+    def __init__(self, max_window: int):
+        self.size = max_window + 1
+        self.seconds = [-1] * self.size
+        self.frames = [0] * self.size
+        self.bytes = [0] * self.size
+
+    def add(self, now: float, frames: int, nbytes: int):
+        second = int(now)
+        slot = second % self.size
+        if self.seconds[slot] != second:
+            self.seconds[slot] = second
+            self.frames[slot] = 0
+            self.bytes[slot] = 0
+        self.frames[slot] += frames
+        self.bytes[slot] += nbytes
+
+    def totals(self, now: float, window: int) -> Tuple[int, int]:
+        """Frames and bytes recorded in the last 'window' complete seconds"""
+        current = int(now)
+        frames = nbytes = 0
+        for slot in range(self.size):
+            if current - window <= self.seconds[slot] < current:
+                frames += self.frames[slot]
+                nbytes += self.bytes[slot]
+        return frames, nbytes
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """Render a Prometheus label set"""
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+def format_value(value: float) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metrics:
+    """Thread-safe metrics registry shared by request handlers and writers"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 windows: Tuple[int, ...] = DEFAULT_WINDOWS):
+        self.buckets = buckets
+        self.windows = windows
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+
+        self.stage_histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.persist_histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.requests: Dict[str, int] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.throughput: Dict[str, SlidingWindow] = {}
+
+        # name -> (help, [(labels, callback)]), for gauges and callback counters
+        self.gauges: Dict[str, Tuple[str, List[Tuple[Dict[str, str], Callable[[], float]]]]] = {}
+        # Names in self.gauges that are counters
+        self.counters: Set[str] = set()
+
+    def histogram(self, table: Dict, key: Tuple[str, str]) -> Histogram:
+        """Find or create a histogram (lock held)"""
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+        return histogram
+
+    def observe_stage(self, route: str, stage: str, seconds: float):
+        with self.lock:
+            self.histogram(self.stage_histograms, (route, stage)).observe(seconds)
+
+    def observe_persist(self, channel: str, stage: str, seconds: float):
+        with self.lock:
+            self.histogram(self.persist_histograms, (channel, stage)).observe(seconds)
+
+    @contextmanager
+    def stage(self, route: str, stage: str):
+        """Time a request-handling stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(route, stage, time.perf_counter() - start)
+
+    @contextmanager
+    def persist(self, channel: str, stage: str):
+        """Time a persistence stage on a writer thread"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_persist(channel, stage, time.perf_counter() - start)
+
+    @contextmanager
+    def request(self, route: str):
+        """Track a request: in-flight gauge, request count and 'total' stage"""
+        with self.lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+            self.in_flight[route] = self.in_flight.get(route, 0) + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.in_flight[route] -= 1
+                self.histogram(self.stage_histograms, (route, 'total')).observe(elapsed)
+
+    def track(self, route: str):
+        """Decorator applying request() to a sync or async route handler"""
+        def decorator(handler):
+            if inspect.iscoroutinefunction(handler):
+                @functools.wraps(handler)
+                async def async_wrapper(*args, **kwargs):
+                    with self.request(route):
+                        return await handler(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(handler)
+            def wrapper(*args, **kwargs):
+                with self.request(route):
+                    return handler(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_frames(self, channel: str, nbytes: int, frames: int = 1):
+        """Count received frames for throughput"""
+        with self.lock:
+            window = self.throughput.get(channel)
+            if window is None:
+                window = self.throughput[channel] = SlidingWindow(max(self.windows))
+            window.add(time.time(), frames, nbytes)
+
+    def add_gauge(self, name: str, help_text: str, callback: Callable[[], float],
+                  labels: Optional[Dict[str, str]] = None):
+        """Register a gauge sampled from a callback at export time"""
+        with self.lock:
+            entry = self.gauges.setdefault(name, (help_text, []))
+            entry[1].append((labels or {}, callback))
+
+    def add_counter(self, name: str, help_text: str, callback: Callable[[], float],
+                    labels: Optional[Dict[str, str]] = None):
+        """Register a counter sampled from a callback at export time
+
+        The callback must return a total that never decreases."""
+        self.add_gauge(name, help_text, callback, labels)
+        with self.lock:
+            self.counters.add(name)
+
+    def rates(self, now: float) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Frames/s and MB/s per channel and window (lock held)"""
+        uptime = max(now - self.start_time, 1e-9)
+        result = {}
+        for channel, window in sorted(self.throughput.items()):
+            result[channel] = {}
+            for seconds in self.windows:
+                frames, nbytes = window.totals(now, seconds)
+                span = min(seconds, uptime)
+                result[channel][f"{seconds}s"] = {
+                    "frames_per_second": frames / span,
+                    "megabytes_per_second": nbytes / span / (1024 * 1024)
+                }
+        return result
+
+    def sample_gauges(self) -> Dict[str, List[Tuple[Dict[str, str], float]]]:
+        """Call gauge callbacks outside the lock"""
+        with self.lock:
+            gauges = {name: list(entries) for name, (_, entries) in self.gauges.items()}
+        samples = {}
+        for name, entries in gauges.items():
+            samples[name] = []
+            for labels, callback in entries:
+                try:
+                    value = callback()
+                except Exception:
+                    value = math.nan
+                samples[name].append((labels, value))
+        return samples
+
+    def to_json(self) -> Dict[str, Any]:
+        """Metrics as a JSON-serializable dict"""
+        gauges = self.sample_gauges()
+        now = time.time()
+        with self.lock:
+            routes = {}
+            for route, count in sorted(self.requests.items()):
+                routes[route] = {"total": count, "in_flight": self.in_flight.get(route, 0), "stages": {}}
+            for (route, stage), histogram in sorted(self.stage_histograms.items()):
+                routes.setdefault(route, {"total": 0, "in_flight": 0, "stages": {}})
+                routes[route]["stages"][stage] = histogram.summary()
+
+            persist = {}
+            for (channel, stage), histogram in sorted(self.persist_histograms.items()):
+                persist.setdefault(channel, {})[stage] = histogram.summary()
+
+            result = {
+                "uptime": now - self.start_time,
+                "routes": routes,
+                "persist": persist,
+                "throughput": self.rates(now)
+            }
+            counters = set(self.counters)
+
+        result["gauges"] = {}
+        result["counters"] = {}
+        for name, samples in gauges.items():
+            if len(samples) == 1 and not samples[0][0]:
+                value = samples[0][1]
+            else:
+                value = {','.join(f"{k}={v}" for k, v in labels.items()): value
+                         for labels, value in samples}
+            result["counters" if name in counters else "gauges"][name] = value
+        return result
+
+    def histogram_lines(self, name: str, help_text: str, label_names: Tuple[str, str],
+                        table: Dict[Tuple[str, str], Histogram]) -> List[str]:
+        """Prometheus lines for one histogram family (lock held)"""
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for key, histogram in sorted(table.items()):
+            labels = dict(zip(label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), histogram.counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels({**labels, "le": format_value(bound)})
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_value(histogram.sum)}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return lines
+
+    def to_prometheus(self) -> str:
+        """Metrics in Prometheus text exposition format"""
+        gauges = self.sample_gauges()
+        now = time.time()
+        with self.lock:
+            lines = self.histogram_lines(
+                'quest_request_stage_seconds', 'Request handling time by route and stage',
+                ('route', 'stage'), self.stage_histograms)
+            lines += self.histogram_lines(
+                'quest_persist_stage_seconds', 'Persistence time by channel and stage',
+                ('channel', 'stage'), self.persist_histograms)
+
+            lines += ["# HELP quest_requests_total Requests received by route",
+                      "# TYPE quest_requests_total counter"]
+            for route, count in sorted(self.requests.items()):
+                lines.append(f"quest_requests_total{format_labels({'route': route})} {count}")
+
+            lines += ["# HELP quest_requests_in_flight Requests currently being handled by route",
+                      "# TYPE quest_requests_in_flight gauge"]
+            for route, count in sorted(self.in_flight.items()):
+                lines.append(f"quest_requests_in_flight{format_labels({'route': route})} {count}")
+
+            rates = self.rates(now)
+            for metric, key, help_text in (
+                    ('quest_frames_per_second', 'frames_per_second', 'Received frames per second over a sliding window'),
+                    ('quest_megabytes_per_second', 'megabytes_per_second', 'Received MB per second over a sliding window')):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+                for channel, windows in rates.items():
+                    for window, values in windows.items():
+                        labels = format_labels({'channel': channel, 'window': window})
+                        lines.append(f"{metric}{labels} {format_value(values[key])}")
+
+            help_texts = {name: help_text for name, (help_text, _) in self.gauges.items()}
+            counters = set(self.counters)
+
+        for name, samples in sorted(gauges.items()):
+            metric_type = 'counter' if name in counters else 'gauge'
+            lines += [f"# HELP {name} {help_texts[name]}", f"# TYPE {name} {metric_type}"]
+            for labels, value in samples:
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+        lines += ["# HELP quest_uptime_seconds Seconds since the server started",
+                  "# TYPE quest_uptime_seconds gauge",
+                  f"quest_uptime_seconds {format_value(now - self.start_time)}"]
+        return '\n'.join(lines) + '\n'
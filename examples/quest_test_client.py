@@ -7,6 +7,7 @@ Features:
 1. Simulate sending camera environment information
 2. Simulate sending microphone audio information
 3. Receive and confirm text messages
+4. Optionally stream all channels over one WebSocket connection (--stream)
 """
 
 import argparse
@@ -20,11 +21,25 @@ from datetime import datetime
 from typing import Dict, Any
 import cv2
 
+# /stream binary messages are a 4-byte big-endian header length, a JSON
+# header with "channel", "seq" and the frame metadata, then the raw payload
+STREAM_HEADER_LENGTH_SIZE = 4
+
 class QuestTestClient:
-    def __init__(self, server_url: str = "http://localhost:8888"):
+    def __init__(self, server_url: str = "http://localhost:8888", binary: bool = False, stream: bool = False):
         self.server_url = server_url
+        self.binary = binary
+        self.stream = stream
         self.running = False
         
+        # Pooled HTTP connections, shared by all sending threads
+        self.session = requests.Session()
+        
+        # WebSocket stream state (--stream mode)
+        self.ws = None
+        self.ws_lock = threading.Lock()
+        self.stream_seq = 0
+        
         # Counters
         self.camera_frame_count = 0
         self.audio_frame_count = 0
@@ -34,11 +49,12 @@ class QuestTestClient:
         self.camera_thread = None
         self.audio_thread = None
         self.text_thread = None
+        self.receive_thread = None
     
     def test_server_connection(self) -> bool:
         """Test server connection"""
         try:
-            response = requests.get(f"{self.server_url}/health", timeout=5)
+            response = self.session.get(f"{self.server_url}/health", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 print(f"✅ Server connection successful: {data['status']}")
@@ -50,8 +66,8 @@ class QuestTestClient:
             print(f"❌ Cannot connect to server: {e}")
             return False
     
-    def generate_test_camera_frame(self, width: int = 1920, height: int = 1080) -> Dict[str, Any]:
-        """Generate test camera frame data"""
+    def generate_test_camera_image(self, width: int = 1920, height: int = 1080) -> np.ndarray:
+        """Generate test camera image as an RGB pixel array"""
         # Create test image (checkerboard pattern)
         image = np.zeros((height, width, 3), dtype=np.uint8)
         
@@ -77,8 +93,13 @@ class QuestTestClient:
         rect_x2, rect_y2 = 400, 300
         image[rect_y1:rect_y2, rect_x1:rect_x2] = [0, 0, 255]  # Blue
         
-        # Convert to RGB format and encode to base64
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        # Convert to RGB format
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    
+    def generate_test_camera_frame(self, width: int = 1920, height: int = 1080) -> Dict[str, Any]:
+        """Generate test camera frame data"""
+        # Encode RGB image to base64
+        rgb_image = self.generate_test_camera_image(width, height)
         frame_data = base64.b64encode(rgb_image.tobytes()).decode('utf-8')
         
         return {
@@ -89,8 +110,8 @@ class QuestTestClient:
             "timestamp": datetime.now().isoformat()
         }
     
-    def generate_test_audio_frame(self, sample_rate: int = 16000, duration_ms: float = 100.0) -> Dict[str, Any]:
-        """Generate test audio frame data"""
+    def generate_test_audio_samples(self, sample_rate: int = 16000, duration_ms: float = 100.0) -> np.ndarray:
+        """Generate test audio as 16-bit PCM samples"""
         # Generate sine wave test audio
         duration_sec = duration_ms / 1000.0
         samples = int(sample_rate * duration_sec)
@@ -101,7 +122,11 @@ class QuestTestClient:
         audio_data = np.sin(2 * np.pi * frequency * t)
         
         # Convert to 16-bit integer
-        audio_data = (audio_data * 32767).astype(np.int16)
+        return (audio_data * 32767).astype(np.int16)
+    
+    def generate_test_audio_frame(self, sample_rate: int = 16000, duration_ms: float = 100.0) -> Dict[str, Any]:
+        """Generate test audio frame data"""
+        audio_data = self.generate_test_audio_samples(sample_rate, duration_ms)
         
         # Encode to base64
         audio_bytes = base64.b64encode(audio_data.tobytes()).decode('utf-8')
@@ -118,7 +143,7 @@ class QuestTestClient:
     def send_camera_frame(self, frame_data: Dict[str, Any]) -> bool:
         """Send camera frame to server"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.server_url}/camera/frame",
                 json=frame_data,
                 timeout=10
@@ -136,10 +161,43 @@ class QuestTestClient:
             print(f"❌ Error sending camera frame: {e}")
             return False
     
+    def send_camera_frame_raw(self, rgb_image: np.ndarray, format_type: str = "RGB") -> bool:
+        """Send camera frame to server as raw binary pixels
+
+        Frame metadata travels in X-Frame-* headers, and the pixel buffer is
+        sent as-is, without base64 or JSON encoding."""
+        try:
+            height, width = rgb_image.shape[:2]
+            headers = {
+                "Content-Type": "application/octet-stream",
+                "X-Frame-Width": str(width),
+                "X-Frame-Height": str(height),
+                "X-Frame-Format": format_type,
+                "X-Frame-Timestamp": datetime.now().isoformat()
+            }
+            response = self.session.post(
+                f"{self.server_url}/camera/frame/raw",
+                data=memoryview(np.ascontiguousarray(rgb_image)).cast('B'),
+                headers=headers,
+                timeout=10
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                print(f"📷 Camera frame sent successfully: {result['frame_id']}")
+                return True
+            else:
+                print(f"❌ Camera frame send failed: {response.status_code}")
+                return False
+                
+        except Exception as e:
+            print(f"❌ Error sending camera frame: {e}")
+            return False
+    
     def send_audio_frame(self, audio_data: Dict[str, Any]) -> bool:
         """Send audio frame to server"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.server_url}/audio/frame",
                 json=audio_data,
                 timeout=10
@@ -160,7 +218,7 @@ class QuestTestClient:
     def send_text_message(self, content: str) -> bool:
         """Send text message to server"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.server_url}/text/send",
                 json={"content": content},
                 timeout=10
@@ -181,7 +239,7 @@ class QuestTestClient:
     def confirm_text_received(self, message_id: str, status: str = "delivered") -> bool:
         """Confirm text message reception"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.server_url}/text/confirm",
                 json={"message_id": message_id, "status": status},
                 timeout=10
@@ -199,15 +257,124 @@ class QuestTestClient:
             print(f"❌ Error confirming text message: {e}")
             return False
     
+    def connect_stream(self) -> bool:
+        """Open the WebSocket stream to the server"""
+        try:
+            from websockets.sync.client import connect
+        except ImportError as e:
+            print(f"❌ Streaming mode requires websockets: {e}")
+            print("Install with: pip install websockets")
+            return False
+        
+        stream_url = self.server_url.replace("http", "ws", 1) + "/stream"
+        try:
+            self.ws = connect(stream_url, max_size=None)
+            print(f"✅ Stream connected: {stream_url}")
+            return True
+        except Exception as e:
+            print(f"❌ Cannot open stream: {e}")
+            return False
+    
+    def next_stream_seq(self) -> int:
+        """Allocate a sequence number for a stream message (ws_lock held)"""
+        self.stream_seq += 1
+        return self.stream_seq
+    
+    def send_stream_frame(self, header: Dict[str, Any], payload) -> bool:
+        """Send one binary frame over the stream
+
+        The length-prefixed header and the payload go out as fragments of a
+        single WebSocket message, so the payload is not copied."""
+        try:
+            with self.ws_lock:
+                header["seq"] = self.next_stream_seq()
+                header_bytes = json.dumps(header).encode('utf-8')
+                prefix = len(header_bytes).to_bytes(STREAM_HEADER_LENGTH_SIZE, 'big')
+                self.ws.send([prefix + header_bytes, payload])
+            return True
+        except Exception as e:
+            print(f"❌ Error streaming {header.get('channel')} frame: {e}")
+            return False
+    
+    def send_stream_command(self, command: Dict[str, Any]) -> bool:
+        """Send one JSON command over the stream"""
+        try:
+            with self.ws_lock:
+                command["seq"] = self.next_stream_seq()
+                self.ws.send(json.dumps(command))
+            return True
+        except Exception as e:
+            print(f"❌ Error streaming {command.get('type')} command: {e}")
+            return False
+    
+    def stream_camera_frame(self, rgb_image: np.ndarray, format_type: str = "RGB") -> bool:
+        """Stream camera frame to server"""
+        height, width = rgb_image.shape[:2]
+        header = {
+            "channel": "camera",
+            "width": width,
+            "height": height,
+            "format": format_type,
+            "timestamp": datetime.now().isoformat()
+        }
+        return self.send_stream_frame(header, memoryview(np.ascontiguousarray(rgb_image)).cast('B'))
+    
+    def stream_audio_frame(self, samples: np.ndarray, sample_rate: int = 16000, duration_ms: float = 100.0) -> bool:
+        """Stream audio frame to server"""
+        header = {
+            "channel": "audio",
+            "sample_rate": sample_rate,
+            "channels": 1,
+            "format": "PCM",
+            "duration_ms": duration_ms,
+            "timestamp": datetime.now().isoformat()
+        }
+        return self.send_stream_frame(header, memoryview(samples).cast('B'))
+    
+    def receive_loop(self):
+        """Stream receiving loop: handles acks and messages pushed by the server"""
+        try:
+            for message in self.ws:
+                reply = json.loads(message)
+                reply_type = reply.get("type")
+                channel = reply.get("channel")
+                
+                if reply_type == "ack" and channel == "camera":
+                    self.camera_frame_count += 1
+                    print(f"📷 Camera frame acked: {reply['frame_id']}")
+                elif reply_type == "ack" and channel == "audio":
+                    self.audio_frame_count += 1
+                    print(f"🎤 Audio frame acked: {reply['frame_id']}")
+                elif reply_type == "ack" and channel == "text":
+                    if "new_status" in reply:
+                        print(f"✅ Text message confirmation successful: {reply['message_id']} -> {reply['new_status']}")
+                    else:
+                        self.text_message_count += 1
+                        print(f"📝 Text message sent successfully: {reply['message_id']}")
+                elif reply_type == "text":
+                    # Message pushed by the server: confirm delivery and read
+                    print(f"📨 Text message received: {reply['message_id']}: {reply['content']}")
+                    self.send_stream_command({"type": "text_confirm", "message_id": reply["message_id"], "status": "delivered"})
+                    self.send_stream_command({"type": "text_confirm", "message_id": reply["message_id"], "status": "read"})
+                elif reply_type == "error":
+                    print(f"❌ Stream {channel} error (seq {reply.get('seq')}): {reply.get('error')}")
+                    
+        except Exception as e:
+            if self.running:
+                print(f"❌ Stream receive error: {e}")
+    
     def camera_loop(self):
         """Camera data sending loop"""
         while self.running:
             try:
-                # Generate test camera frame
-                frame_data = self.generate_test_camera_frame()
-                
-                # Send to server
-                if self.send_camera_frame(frame_data):
+                # Generate test camera frame and send to server
+                if self.stream:
+                    # Counted when the server acks the frame
+                    self.stream_camera_frame(self.generate_test_camera_image())
+                elif self.binary:
+                    if self.send_camera_frame_raw(self.generate_test_camera_image()):
+                        self.camera_frame_count += 1
+                elif self.send_camera_frame(self.generate_test_camera_frame()):
                     self.camera_frame_count += 1
                 
                 # Wait 1 second
@@ -221,11 +388,11 @@ class QuestTestClient:
         """Audio data sending loop"""
         while self.running:
             try:
-                # Generate test audio frame
-                audio_data = self.generate_test_audio_frame()
-                
-                # Send to server
-                if self.send_audio_frame(audio_data):
+                # Generate test audio frame and send to server
+                if self.stream:
+                    # Counted when the server acks the frame
+                    self.stream_audio_frame(self.generate_test_audio_samples())
+                elif self.send_audio_frame(self.generate_test_audio_frame()):
                     self.audio_frame_count += 1
                 
                 # Wait 100 milliseconds
@@ -242,7 +409,11 @@ class QuestTestClient:
                 # Send test text message
                 message_content = f"Test message #{self.text_message_count + 1} - {datetime.now().strftime('%H:%M:%S')}"
                 
-                if self.send_text_message(message_content):
+                if self.stream:
+                    # The server pushes the message back over the stream,
+                    # and receive_loop confirms it
+                    self.send_stream_command({"type": "text_send", "content": message_content})
+                elif self.send_text_message(message_content):
                     self.text_message_count += 1
                     
                     # Simulate delivery confirmation
@@ -269,9 +440,17 @@ class QuestTestClient:
             print("❌ Cannot connect to server, please ensure server is running")
             return
         
+        # Open stream connection (streaming mode)
+        if self.stream and not self.connect_stream():
+            return
+        
         self.running = True
         
         # Start threads
+        if self.stream:
+            self.receive_thread = threading.Thread(target=self.receive_loop, daemon=True)
+            self.receive_thread.start()
+        
         self.camera_thread = threading.Thread(target=self.camera_loop, daemon=True)
         self.audio_thread = threading.Thread(target=self.audio_loop, daemon=True)
         self.text_thread = threading.Thread(target=self.text_loop, daemon=True)
@@ -307,6 +486,12 @@ class QuestTestClient:
         if self.text_thread:
             self.text_thread.join(timeout=2.0)
         
+        # Close stream connection
+        if self.ws:
+            self.ws.close()
+        if self.receive_thread:
+            self.receive_thread.join(timeout=2.0)
+        
         print("✅ Client stopped")
         print(f"📊 Statistics:")
         print(f"  Camera frames: {self.camera_frame_count}")
@@ -317,11 +502,13 @@ def main():
     """Main function"""
     parser = argparse.ArgumentParser(description='Quest Device Test Client')
     parser.add_argument('--server', default='http://localhost:8888', help='Server URL (default: http://localhost:8888)')
+    parser.add_argument('--binary', action='store_true', help='Send camera frames as raw binary instead of base64 JSON')
+    parser.add_argument('--stream', action='store_true', help='Stream all channels over a WebSocket connection (requires the async server)')
     
     args = parser.parse_args()
     
     # Create and start client
-    client = QuestTestClient(server_url=args.server)
+    client = QuestTestClient(server_url=args.server, binary=args.binary, stream=args.stream)
     client.start()
 
 if __name__ == '__main__':
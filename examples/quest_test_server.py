@@ -15,11 +15,10 @@ import logging
 import os
 import time
 import threading
-import wave
 import base64
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional
 from dataclasses import dataclass, asdict
 
 try:
@@ -32,6 +31,10 @@ except ImportError as e:
     print("请安装: pip install flask flask-cors opencv-python numpy")
     exit(1)
 
+from quest_frame_store import FrameStore
+from quest_writer_pool import WriterPool, RollingWavWriter, POLICIES, POLICY_DROP
+from quest_metrics import Metrics, PROMETHEUS_CONTENT_TYPE
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -72,18 +75,50 @@ class TextMessage:
     content: str
     status: str  # sent, delivered, read
 
+# Headers carrying frame metadata for /camera/frame/raw uploads
+RAW_FRAME_HEADER_WIDTH = 'X-Frame-Width'
+RAW_FRAME_HEADER_HEIGHT = 'X-Frame-Height'
+RAW_FRAME_HEADER_FORMAT = 'X-Frame-Format'
+RAW_FRAME_HEADER_TIMESTAMP = 'X-Frame-Timestamp'
+RAW_FRAME_REQUIRED_HEADERS = (RAW_FRAME_HEADER_WIDTH, RAW_FRAME_HEADER_HEIGHT)
+
+def frame_to_dict(frame) -> Dict[str, Any]:
+    """Convert a frame to a JSON-serializable dict, base64-encoding its data"""
+    result = asdict(frame)
+    result['data'] = base64.b64encode(frame.data).decode('utf-8')
+    return result
+
+def read_into(stream, view: memoryview) -> int:
+    """Fill a memoryview from a binary stream, returning the number of bytes read"""
+    total = 0
+    while total < len(view):
+        count = stream.readinto(view[total:])
+        if not count:
+            break
+        total += count
+    return total
+
 class QuestTestServer:
-    def __init__(self, port: int = 8888, save_data: bool = False):
+    def __init__(self, port: int = 8888, save_data: bool = False,
+                 history: int = 100, buffer_mb: int = 128,
+                 save_workers: int = 2, save_queue_size: int = 64,
+                 save_policy: str = POLICY_DROP, audio_segment_seconds: float = 60.0,
+                 max_body_mb: int = 64):
         self.port = port
         self.save_data = save_data
+        self.max_body_size = max_body_mb * 1024 * 1024
         self.start_time = time.time()
         
-        # Data storage
-        self.camera_frames: List[CameraFrame] = []
-        self.audio_frames: List[AudioFrame] = []
-        self.text_messages: List[TextMessage] = []
+        # Data storage: bounded ring buffers, capped per channel at
+        # 'history' items and 'buffer_mb' megabytes of frame data
+        buffer_bytes = buffer_mb * 1024 * 1024
+        self.camera_frames = FrameStore(history, buffer_bytes, fixed_size=True)
+        self.audio_frames = FrameStore(history, buffer_bytes, fixed_size=True)
+        self.text_messages = FrameStore(history, key='message_id', data_attr=None)
         
-        # Counters
+        # Counters, guarded by id_lock so that ids are unique across
+        # Flask worker threads and increase in store order
+        self.id_lock = threading.Lock()
         self.camera_frame_count = 0
         self.audio_frame_count = 0
         self.text_message_count = 0
@@ -103,6 +138,17 @@ class QuestTestServer:
             
             logger.info(f"Data will be saved to: {self.data_dir.absolute()}")
         
+        # Background persistence: saves run on writer threads, and audio is
+        # appended to rolling WAV segments on a single ordered lane
+        self.writer = None
+        if self.save_data:
+            self.writer = WriterPool(save_workers, save_queue_size, save_policy)
+            self.audio_writer = RollingWavWriter(self.audio_dir, segment_seconds=audio_segment_seconds)
+        
+        # Performance metrics
+        self.metrics = Metrics()
+        self.register_gauges()
+        
         # Initialize Flask application
         self.app = Flask(__name__)
         CORS(self.app)  # Allow cross-origin requests
@@ -123,6 +169,19 @@ class QuestTestServer:
             "last_text_message": None
         }
     
+    def register_gauges(self):
+        """Expose queue depths, buffer occupancy and dropped saves as metrics"""
+        for channel, store in (('camera', self.camera_frames), ('audio', self.audio_frames), ('text', self.text_messages)):
+            self.metrics.add_gauge('quest_frame_store_items', 'Items held in memory by channel',
+                                   store.__len__, {'channel': channel})
+            self.metrics.add_gauge('quest_frame_store_bytes', 'Frame bytes held in memory by channel',
+                                   lambda store=store: store.total_bytes, {'channel': channel})
+        if self.writer:
+            self.metrics.add_gauge('quest_save_queue_depth', 'Save jobs waiting for a writer thread',
+                                   self.writer.depth)
+            self.metrics.add_counter('quest_save_queue_dropped_total', 'Save jobs dropped because the queue was full',
+                                     lambda: self.writer.dropped)
+    
     def register_routes(self):
         """Register API routes"""
         
@@ -138,21 +197,25 @@ class QuestTestServer:
             })
         
         @self.app.route('/camera/frame', methods=['POST'])
+        @self.metrics.track('/camera/frame')
         def receive_camera_frame():
             """Receive Quest camera frame data"""
             try:
                 # Get request data
-                data = request.get_json()
+                with self.metrics.stage('/camera/frame', 'parse'):
+                    data = request.get_json()
                 if not data:
                     return jsonify({"error": "No JSON data received"}), 400
                 
                 # Parse camera frame data
-                camera_frame = self.parse_camera_frame(data)
+                with self.metrics.stage('/camera/frame', 'decode'):
+                    camera_frame = self.parse_camera_frame(data)
                 if camera_frame is None:
                     return jsonify({"error": "Invalid camera frame data"}), 400
                 
                 # Process camera frame data
-                self.process_camera_frame(camera_frame)
+                with self.metrics.stage('/camera/frame', 'process'):
+                    self.process_camera_frame(camera_frame)
                 
                 # Update statistics
                 self.update_camera_stats(len(camera_frame.data))
@@ -166,23 +229,61 @@ class QuestTestServer:
             except Exception as e:
                 logger.error(f"Error processing camera frame data: {e}")
                 return jsonify({"error": str(e)}), 500
-        
+
+        @self.app.route('/camera/frame/raw', methods=['POST'])
+        @self.metrics.track('/camera/frame/raw')
+        def receive_camera_frame_raw():
+            """Receive Quest camera frame as raw binary pixels"""
+            try:
+                content_length = request.content_length
+                if not content_length:
+                    return jsonify({"error": "Content-Length required"}), 411
+                if content_length > self.max_body_size:
+                    return jsonify({"error": "Camera frame too large"}), 413
+
+                # Parse camera frame, reading the body straight into its buffer
+                with self.metrics.stage('/camera/frame/raw', 'parse'):
+                    camera_frame = self.parse_raw_camera_frame(request.headers, request.stream, content_length)
+                if camera_frame is None:
+                    return jsonify({"error": "Invalid camera frame data"}), 400
+
+                # Process camera frame data
+                with self.metrics.stage('/camera/frame/raw', 'process'):
+                    self.process_camera_frame(camera_frame)
+
+                # Update statistics
+                self.update_camera_stats(len(camera_frame.data))
+
+                return jsonify({
+                    "status": "success",
+                    "frame_id": camera_frame.frame_id,
+                    "timestamp": camera_frame.timestamp
+                })
+
+            except Exception as e:
+                logger.error(f"Error processing raw camera frame data: {e}")
+                return jsonify({"error": str(e)}), 500
+
         @self.app.route('/audio/frame', methods=['POST'])
+        @self.metrics.track('/audio/frame')
         def receive_audio_frame():
             """Receive Quest microphone audio data"""
             try:
                 # Get request data
-                data = request.get_json()
+                with self.metrics.stage('/audio/frame', 'parse'):
+                    data = request.get_json()
                 if not data:
                     return jsonify({"error": "No JSON data received"}), 400
                 
                 # Parse audio frame data
-                audio_frame = self.parse_audio_frame(data)
+                with self.metrics.stage('/audio/frame', 'decode'):
+                    audio_frame = self.parse_audio_frame(data)
                 if audio_frame is None:
                     return jsonify({"error": "Invalid audio frame data"}), 400
                 
                 # Process audio frame data
-                self.process_audio_frame(audio_frame)
+                with self.metrics.stage('/audio/frame', 'process'):
+                    self.process_audio_frame(audio_frame)
                 
                 # Update statistics
                 self.update_audio_stats(len(audio_frame.data))
@@ -198,6 +299,7 @@ class QuestTestServer:
                 return jsonify({"error": str(e)}), 500
         
         @self.app.route('/text/send', methods=['POST'])
+        @self.metrics.track('/text/send')
         def send_text_message():
             """Send text message to Quest device"""
             try:
@@ -209,10 +311,10 @@ class QuestTestServer:
                 if not content:
                     return jsonify({"error": "No content provided"}), 400
                 
-                # Create text message
+                # Create text message (message_id is assigned when processed)
                 message = TextMessage(
                     timestamp=datetime.now().isoformat(),
-                    message_id=f"msg_{self.text_message_count:06d}",
+                    message_id="",
                     content=content,
                     status="sent"
                 )
@@ -231,6 +333,7 @@ class QuestTestServer:
                 return jsonify({"error": str(e)}), 500
         
         @self.app.route('/text/confirm', methods=['POST'])
+        @self.metrics.track('/text/confirm')
         def confirm_text_received():
             """Confirm Quest device received text message"""
             try:
@@ -265,28 +368,47 @@ class QuestTestServer:
                 "audio_frames": len(self.audio_frames),
                 "text_messages": len(self.text_messages),
                 "stats": self.stats,
-                "save_data": self.save_data
+                "save_data": self.save_data,
+                "save_queue": self.writer.stats() if self.writer else None,
+                "frame_store": {
+                    "camera": self.camera_frames.stats(),
+                    "audio": self.audio_frames.stats()
+                }
             })
         
+        @self.app.route('/metrics', methods=['GET'])
+        def get_metrics():
+            """Get performance metrics in Prometheus text format"""
+            return Response(self.metrics.to_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+        
+        @self.app.route('/metrics/json', methods=['GET'])
+        def get_metrics_json():
+            """Get performance metrics as JSON"""
+            return jsonify(self.metrics.to_json())
+        
         @self.app.route('/camera/frames', methods=['GET'])
         def get_camera_frames():
-            """Get camera frames list"""
+            """Get camera frames list, paginated by frame_id with 'before'/'after'"""
             limit = request.args.get('limit', 10, type=int)
-            frames = self.camera_frames[-limit:] if self.camera_frames else []
-            return jsonify([asdict(frame) for frame in frames])
+            before = request.args.get('before', type=int)
+            after = request.args.get('after', type=int)
+            frames = self.camera_frames.page(limit, before=before, after=after)
+            return jsonify([frame_to_dict(frame) for frame in frames])
         
         @self.app.route('/audio/frames', methods=['GET'])
         def get_audio_frames():
-            """Get audio frames list"""
+            """Get audio frames list, paginated by frame_id with 'before'/'after'"""
             limit = request.args.get('limit', 10, type=int)
-            frames = self.audio_frames[-limit:] if self.audio_frames else []
-            return jsonify([asdict(frame) for frame in frames])
+            before = request.args.get('before', type=int)
+            after = request.args.get('after', type=int)
+            frames = self.audio_frames.page(limit, before=before, after=after)
+            return jsonify([frame_to_dict(frame) for frame in frames])
         
         @self.app.route('/text/messages', methods=['GET'])
         def get_text_messages():
             """Get text messages list"""
             limit = request.args.get('limit', 10, type=int)
-            messages = self.text_messages[-limit:] if self.text_messages else []
+            messages = self.text_messages.latest(limit)
             return jsonify([asdict(msg) for msg in messages])
     
     def parse_camera_frame(self, data: Dict[str, Any]) -> Optional[CameraFrame]:
@@ -321,13 +443,57 @@ class QuestTestServer:
                 height=height,
                 format=format_type,
                 data=frame_data,
-                frame_id=self.camera_frame_count
+                frame_id=-1  # Assigned in process_camera_frame
             )
             
         except Exception as e:
             logger.error(f"Error parsing camera frame data: {e}")
             return None
-    
+
+    def parse_raw_camera_frame(self, headers, stream, content_length: int) -> Optional[CameraFrame]:
+        """Parse binary camera frame data
+
+        Frame metadata comes from X-Frame-* headers and the body holds the raw
+        pixels. The body is read directly into a buffer sized from
+        Content-Length, avoiding the base64 and JSON copies of /camera/frame."""
+        try:
+            # Check required headers
+            for header in RAW_FRAME_REQUIRED_HEADERS:
+                if header not in headers:
+                    logger.error(f"Raw camera frame missing required header: {header}")
+                    return None
+
+            # Parse headers
+            width = int(headers[RAW_FRAME_HEADER_WIDTH])
+            height = int(headers[RAW_FRAME_HEADER_HEIGHT])
+            format_type = headers.get(RAW_FRAME_HEADER_FORMAT, 'RGB')
+            timestamp = headers.get(RAW_FRAME_HEADER_TIMESTAMP, datetime.now().isoformat())
+
+            # Validate data size before allocating the buffer
+            expected_size = width * height * 3  # RGB format
+            if content_length != expected_size:
+                logger.error(f"Camera frame data size mismatch: expected {expected_size}, actual {content_length}")
+                return None
+
+            # Read body into preallocated buffer
+            frame_data = bytearray(content_length)
+            if read_into(stream, memoryview(frame_data)) != content_length:
+                logger.error("Raw camera frame body shorter than Content-Length")
+                return None
+
+            return CameraFrame(
+                timestamp=timestamp,
+                width=width,
+                height=height,
+                format=format_type,
+                data=frame_data,
+                frame_id=-1  # Assigned in process_camera_frame
+            )
+
+        except Exception as e:
+            logger.error(f"Error parsing raw camera frame data: {e}")
+            return None
+
     def parse_audio_frame(self, data: Dict[str, Any]) -> Optional[AudioFrame]:
         """Parse audio frame data"""
         try:
@@ -357,7 +523,7 @@ class QuestTestServer:
                 format=format_type,
                 data=audio_data,
                 duration_ms=duration_ms,
-                frame_id=self.audio_frame_count
+                frame_id=-1  # Assigned in process_audio_frame
             )
             
         except Exception as e:
@@ -367,17 +533,15 @@ class QuestTestServer:
     def process_camera_frame(self, camera_frame: CameraFrame):
         """Process camera frame data"""
         try:
-            # Add to memory storage
-            self.camera_frames.append(camera_frame)
-            self.camera_frame_count += 1
-            
-            # Limit number of frames in memory (keep latest 100 frames)
-            if len(self.camera_frames) > 100:
-                self.camera_frames.pop(0)
+            # Assign frame id and add to memory storage (oldest frames are evicted)
+            with self.id_lock:
+                camera_frame.frame_id = self.camera_frame_count
+                self.camera_frame_count += 1
+                self.camera_frames.append(camera_frame)
             
             # Save to file (if enabled)
             if self.save_data:
-                self.save_camera_frame(camera_frame)
+                self.writer.submit(self.save_camera_frame, camera_frame)
             
             logger.info(f"Processed camera frame: {camera_frame.width}x{camera_frame.height}, "
                        f"format: {camera_frame.format}, size: {len(camera_frame.data)} bytes")
@@ -389,17 +553,15 @@ class QuestTestServer:
     def process_audio_frame(self, audio_frame: AudioFrame):
         """Process audio frame data"""
         try:
-            # Add to memory storage
-            self.audio_frames.append(audio_frame)
-            self.audio_frame_count += 1
-            
-            # Limit number of frames in memory (keep latest 100 frames)
-            if len(self.audio_frames) > 100:
-                self.audio_frames.pop(0)
+            # Assign frame id and add to memory storage (oldest frames are evicted)
+            with self.id_lock:
+                audio_frame.frame_id = self.audio_frame_count
+                self.audio_frame_count += 1
+                self.audio_frames.append(audio_frame)
             
             # Save to file (if enabled)
             if self.save_data:
-                self.save_audio_frame(audio_frame)
+                self.writer.submit(self.save_audio_frame, audio_frame, lane='audio')
             
             logger.info(f"Processed audio frame: {audio_frame.sample_rate}Hz, "
                        f"channels: {audio_frame.channels}, duration: {audio_frame.duration_ms}ms, "
@@ -412,17 +574,15 @@ class QuestTestServer:
     def process_text_message(self, message: TextMessage):
         """Process text message"""
         try:
-            # Add to memory storage
-            self.text_messages.append(message)
-            self.text_message_count += 1
-            
-            # Limit number of messages in memory (keep latest 100 messages)
-            if len(self.text_messages) > 100:
-                self.text_messages.pop(0)
+            # Assign message id and add to memory storage (oldest messages are evicted)
+            with self.id_lock:
+                message.message_id = f"msg_{self.text_message_count:06d}"
+                self.text_message_count += 1
+                self.text_messages.append(message)
             
             # Save to file (if enabled)
             if self.save_data:
-                self.save_text_message(message)
+                self.writer.submit(self.save_text_message, message)
             
             logger.info(f"Sent text message: {message.message_id}, content: {message.content[:50]}...")
             
@@ -432,48 +592,43 @@ class QuestTestServer:
     
     def update_text_message_status(self, message_id: str, status: str):
         """Update text message status"""
-        for message in self.text_messages:
-            if message.message_id == message_id:
-                message.status = status
-                logger.info(f"Updated message status: {message_id} -> {status}")
-                return
+        message = self.text_messages.get(message_id)
+        if message is not None:
+            message.status = status
+            logger.info(f"Updated message status: {message_id} -> {status}")
+            return
         
         logger.warning(f"Message not found: {message_id}")
     
     def save_camera_frame(self, camera_frame: CameraFrame):
         """Save camera frame to file"""
         try:
-            # Convert to numpy array
-            data = np.frombuffer(camera_frame.data, dtype=np.uint8)
-            
-            # Reshape to image format
-            if camera_frame.format.upper() == 'RGB':
-                image = data.reshape(camera_frame.height, camera_frame.width, 3)
-                # Convert to BGR format for OpenCV save
-                image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-            else:
-                image = data.reshape(camera_frame.height, camera_frame.width, 3)
+            with self.metrics.persist('camera', 'convert'):
+                # Convert to numpy array
+                data = np.frombuffer(camera_frame.data, dtype=np.uint8)
+                
+                # Reshape to image format
+                if camera_frame.format.upper() == 'RGB':
+                    image = data.reshape(camera_frame.height, camera_frame.width, 3)
+                    # Convert to BGR format for OpenCV save
+                    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+                else:
+                    image = data.reshape(camera_frame.height, camera_frame.width, 3)
             
-            # Save image
+            # Save image (JPEG encode and write)
             filename = f"camera_frame_{camera_frame.frame_id:06d}_{camera_frame.timestamp.replace(':', '-')}.jpg"
             filepath = self.camera_dir / filename
-            cv2.imwrite(str(filepath), image)
+            with self.metrics.persist('camera', 'write'):
+                cv2.imwrite(str(filepath), image)
             
         except Exception as e:
             logger.error(f"Error saving camera frame: {e}")
     
     def save_audio_frame(self, audio_frame: AudioFrame):
-        """Save audio frame to file"""
+        """Append audio frame to the current WAV segment (runs on the 'audio' writer lane)"""
         try:
-            # Save as WAV file
-            filename = f"audio_frame_{audio_frame.frame_id:06d}_{audio_frame.timestamp.replace(':', '-')}.wav"
-            filepath = self.audio_dir / filename
-            
-            with wave.open(str(filepath), 'wb') as wav_file:
-                wav_file.setnchannels(audio_frame.channels)
-                wav_file.setsampwidth(2)  # 16-bit
-                wav_file.setframerate(audio_frame.sample_rate)
-                wav_file.writeframes(audio_frame.data)
+            with self.metrics.persist('audio', 'write'):
+                self.audio_writer.write(audio_frame)
             
         except Exception as e:
             logger.error(f"Error saving audio frame: {e}")
@@ -485,8 +640,9 @@ class QuestTestServer:
             filename = f"text_message_{message.message_id}_{message.timestamp.replace(':', '-')}.json"
             filepath = self.text_dir / filename
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(asdict(message), f, ensure_ascii=False, indent=2)
+            with self.metrics.persist('text', 'write'):
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump(asdict(message), f, ensure_ascii=False, indent=2)
             
         except Exception as e:
             logger.error(f"Error saving text message: {e}")
@@ -496,12 +652,14 @@ class QuestTestServer:
         self.stats["camera_frames"] += 1
         self.stats["camera_bytes"] += bytes_received
         self.stats["last_camera_frame"] = datetime.now().isoformat()
+        self.metrics.record_frames('camera', bytes_received)
     
     def update_audio_stats(self, bytes_received: int):
         """Update audio statistics"""
         self.stats["audio_frames"] += 1
         self.stats["audio_bytes"] += bytes_received
         self.stats["last_audio_frame"] = datetime.now().isoformat()
+        self.metrics.record_frames('audio', bytes_received)
     
     def run(self):
         """Run server"""
@@ -510,6 +668,7 @@ class QuestTestServer:
         logger.info("API endpoints:")
         logger.info("  GET  /health - Health check")
         logger.info("  POST /camera/frame - Receive camera frame")
+        logger.info("  POST /camera/frame/raw - Receive camera frame as raw pixels")
         logger.info("  POST /audio/frame - Receive audio frame")
         logger.info("  POST /text/send - Send text message")
         logger.info("  POST /text/confirm - Confirm text reception")
@@ -517,8 +676,20 @@ class QuestTestServer:
         logger.info("  GET  /camera/frames - Get camera frames list")
         logger.info("  GET  /audio/frames - Get audio frames list")
         logger.info("  GET  /text/messages - Get text messages list")
+        logger.info("  GET  /metrics - Performance metrics (Prometheus text)")
+        logger.info("  GET  /metrics/json - Performance metrics (JSON)")
         
-        self.app.run(host='0.0.0.0', port=self.port, debug=False)
+        try:
+            self.app.run(host='0.0.0.0', port=self.port, debug=False)
+        finally:
+            self.close()
+    
+    def close(self):
+        """Flush pending saves and finish the current audio segment"""
+        if self.writer:
+            self.writer.close()
+            self.audio_writer.close()
+            logger.info(f"Writer pool stopped: {self.writer.stats()}")
 
 def main():
     """Main function"""
@@ -526,6 +697,16 @@ def main():
     parser.add_argument('--port', type=int, default=8888, help='Server port (default: 8888)')
     parser.add_argument('--save-data', action='store_true', help='Save received data to files')
     parser.add_argument('--no-save', action='store_true', help='Do not save data to files')
+    parser.add_argument('--history', type=int, default=100, help='Frames/messages kept in memory per channel (default: 100)')
+    parser.add_argument('--buffer-mb', type=int, default=128, help='Memory cap for frame data per channel in MB (default: 128)')
+    parser.add_argument('--save-workers', type=int, default=2, help='Background writer threads (default: 2)')
+    parser.add_argument('--save-queue', type=int, default=64, help='Maximum pending saves (default: 64)')
+    parser.add_argument('--save-policy', choices=POLICIES, default=POLICY_DROP,
+                        help='When the save queue is full: drop new saves or block the request (default: drop)')
+    parser.add_argument('--audio-segment-seconds', type=float, default=60.0,
+                        help='Length of each saved WAV segment in seconds (default: 60)')
+    parser.add_argument('--max-body-mb', type=int, default=64,
+                        help='Maximum raw camera frame body size in MB (default: 64)')
     
     args = parser.parse_args()
     
@@ -533,7 +714,12 @@ def main():
     save_data = not args.no_save if args.save_data or not args.no_save else False
     
     # Create and run server
-    server = QuestTestServer(port=args.port, save_data=save_data)
+    server = QuestTestServer(port=args.port, save_data=save_data,
+                             history=args.history, buffer_mb=args.buffer_mb,
+                             save_workers=args.save_workers, save_queue_size=args.save_queue,
+                             save_policy=args.save_policy,
+                             audio_segment_seconds=args.audio_segment_seconds,
+                             max_body_mb=args.max_body_mb)
     server.run()
 
 if __name__ == '__main__':
@@ -0,0 +1,954 @@
+#!/usr/bin/env python3
+"""
+Quest Device Test Server (asyncio variant)
+High-throughput drop-in replacement for quest_test_server.py, intended for
+labs with many headsets streaming at the same time
+
+Differences from the Flask server:
+1. Requests are served by an aiohttp event loop instead of the Flask dev server
+2. JSON parsing and base64 decoding run in a thread pool, off the event loop
+3. Disk persistence goes through a bounded writer pool (quest_writer_pool.py)
+4. A WebSocket endpoint (/stream) carries camera, audio and text over one
+   persistent connection, with per-frame acks and server-pushed text messages
+
+Routes, request/response bodies and /status semantics are the same as
+quest_test_server.py, so quest_test_client.py works unchanged.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+from dataclasses import dataclass, asdict, fields
+
+try:
+    from aiohttp import web, WSMsgType
+    import cv2
+    import numpy as np
+except ImportError as e:
+    print(f"缺少依赖包: {e}")
+    print("请安装: pip install aiohttp opencv-python numpy")
+    exit(1)
+
+from quest_frame_store import FrameStore
+from quest_writer_pool import WriterPool, RollingWavWriter, POLICIES, POLICY_BLOCK, POLICY_DROP
+from quest_metrics import Metrics, PROMETHEUS_CONTENT_TYPE
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('quest_test_server_async.log'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CameraFrame:
+    """Camera frame data structure"""
+    timestamp: str
+    width: int
+    height: int
+    format: str  # RGB, BGR, YUV, etc.
+    data: bytes
+    frame_id: int
+
+@dataclass
+class AudioFrame:
+    """Audio frame data structure"""
+    timestamp: str
+    sample_rate: int
+    channels: int
+    format: str  # PCM, WAV, etc.
+    data: bytes
+    duration_ms: float
+    frame_id: int
+
+@dataclass
+class TextMessage:
+    """Text message structure"""
+    timestamp: str
+    message_id: str
+    content: str
+    status: str  # sent, delivered, read
+
+# Headers carrying frame metadata for /camera/frame/raw uploads
+RAW_FRAME_HEADER_WIDTH = 'X-Frame-Width'
+RAW_FRAME_HEADER_HEIGHT = 'X-Frame-Height'
+RAW_FRAME_HEADER_FORMAT = 'X-Frame-Format'
+RAW_FRAME_HEADER_TIMESTAMP = 'X-Frame-Timestamp'
+RAW_FRAME_REQUIRED_HEADERS = (RAW_FRAME_HEADER_WIDTH, RAW_FRAME_HEADER_HEIGHT)
+
+# /stream binary messages are a 4-byte big-endian header length, a JSON
+# header with "channel", "seq" and the frame metadata, then the raw payload
+STREAM_HEADER_LENGTH_SIZE = 4
+STREAM_CHANNEL_CAMERA = 'camera'
+STREAM_CHANNEL_AUDIO = 'audio'
+STREAM_CHANNEL_TEXT = 'text'
+
+# Bytes per sample of PCM audio frames (16-bit)
+AUDIO_SAMPLE_WIDTH = 2
+
+class RequestError(Exception):
+    """Client error reported back as HTTP 400"""
+
+def require_positive_int(header: Dict[str, Any], key: str) -> int:
+    """Return header[key], raising RequestError unless it is a positive integer"""
+    value = header[key]
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise RequestError(f"Stream frame {key} must be a positive integer, got {value!r}")
+    return value
+
+def frame_to_dict(frame) -> Dict[str, Any]:
+    """Convert a frame to a JSON-serializable dict, base64-encoding its data"""
+    # Avoid asdict(), which would deep-copy the frame data
+    result = {field.name: getattr(frame, field.name) for field in fields(frame)}
+    result['data'] = base64.b64encode(frame.data).decode('utf-8')
+    return result
+
+class AsyncQuestTestServer:
+    def __init__(self, port: int = 8888, save_data: bool = False,
+                 host: str = '0.0.0.0', decode_workers: Optional[int] = None,
+                 save_workers: int = 2, save_queue_size: int = 64,
+                 max_body_mb: int = 64, history: int = 100, buffer_mb: int = 128,
+                 save_policy: str = POLICY_DROP, audio_segment_seconds: float = 60.0):
+        self.port = port
+        self.host = host
+        self.save_data = save_data
+        self.start_time = time.time()
+
+        # Data storage: bounded ring buffers, capped per channel at
+        # 'history' items and 'buffer_mb' megabytes of frame data. Appends
+        # happen on the event loop; reads may come from the decode pool.
+        buffer_bytes = buffer_mb * 1024 * 1024
+        self.camera_frames = FrameStore(history, buffer_bytes, fixed_size=True)
+        self.audio_frames = FrameStore(history, buffer_bytes, fixed_size=True)
+        self.text_messages = FrameStore(history, key='message_id', data_attr=None)
+
+        # Counters
+        self.camera_frame_count = 0
+        self.audio_frame_count = 0
+        self.text_message_count = 0
+
+        # Thread pool for decoding. Persistence has its own writer threads
+        # so that slow disk writes cannot starve request parsing.
+        self.decode_executor = ThreadPoolExecutor(max_workers=decode_workers,
+                                                  thread_name_prefix='decode')
+
+        # Create save directories
+        if self.save_data:
+            self.data_dir = Path("quest_test_data")
+            self.data_dir.mkdir(exist_ok=True)
+
+            self.camera_dir = self.data_dir / "camera"
+            self.audio_dir = self.data_dir / "audio"
+            self.text_dir = self.data_dir / "text"
+
+            self.camera_dir.mkdir(exist_ok=True)
+            self.audio_dir.mkdir(exist_ok=True)
+            self.text_dir.mkdir(exist_ok=True)
+
+            logger.info(f"Data will be saved to: {self.data_dir.absolute()}")
+
+        # Background persistence: saves run on writer threads, and audio is
+        # appended to rolling WAV segments on a single ordered lane. With the
+        # block policy, save_lock keeps waiting submissions in arrival order.
+        self.writer = None
+        self.save_lock = asyncio.Lock()
+        if self.save_data:
+            self.writer = WriterPool(save_workers, save_queue_size, save_policy)
+            self.audio_writer = RollingWavWriter(self.audio_dir, segment_seconds=audio_segment_seconds,
+                                                 sample_width=AUDIO_SAMPLE_WIDTH)
+
+        # Connected /stream clients, which receive pushed text messages
+        self.stream_clients = set()
+
+        # Performance metrics
+        self.metrics = Metrics()
+        self.register_gauges()
+
+        # Initialize aiohttp application. The default body limit of 1 MB is
+        # too small for uncompressed 1080p frames.
+        self.max_body_size = max_body_mb * 1024 * 1024
+        self.app = web.Application(client_max_size=self.max_body_size,
+                                   middlewares=[self.cors_middleware])
+        self.app.on_shutdown.append(self.on_shutdown)
+        self.app.on_cleanup.append(self.on_cleanup)
+
+        # Register routes
+        self.register_routes()
+
+        # Statistics
+        self.stats = {
+            "camera_frames": 0,
+            "audio_frames": 0,
+            "text_messages": 0,
+            "camera_bytes": 0,
+            "audio_bytes": 0,
+            "uptime": 0.0,
+            "last_camera_frame": None,
+            "last_audio_frame": None,
+            "last_text_message": None
+        }
+
+    @web.middleware
+    async def cors_middleware(self, request: web.Request, handler):
+        """Allow cross-origin requests, like flask_cors does for the Flask server"""
+        if request.method == 'OPTIONS':
+            response = web.Response()
+        else:
+            response = await handler(request)
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Allow-Headers'] = '*'
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        return response
+
+    def register_gauges(self):
+        """Expose queue depths, buffer occupancy and dropped saves as metrics"""
+        for channel, store in (('camera', self.camera_frames), ('audio', self.audio_frames), ('text', self.text_messages)):
+            self.metrics.add_gauge('quest_frame_store_items', 'Items held in memory by channel',
+                                   store.__len__, {'channel': channel})
+            self.metrics.add_gauge('quest_frame_store_bytes', 'Frame bytes held in memory by channel',
+                                   lambda store=store: store.total_bytes, {'channel': channel})
+        if self.writer:
+            self.metrics.add_gauge('quest_save_queue_depth', 'Save jobs waiting for a writer thread',
+                                   self.writer.depth)
+            self.metrics.add_counter('quest_save_queue_dropped_total', 'Save jobs dropped because the queue was full',
+                                     lambda: self.writer.dropped)
+        self.metrics.add_gauge('quest_stream_clients', 'Connected /stream clients',
+                               lambda: len(self.stream_clients))
+
+    def register_routes(self):
+        """Register API routes"""
+        track = self.metrics.track
+        self.app.router.add_get('/health', self.health_check)
+        self.app.router.add_post('/camera/frame', track('/camera/frame')(self.receive_camera_frame))
+        self.app.router.add_post('/camera/frame/raw', track('/camera/frame/raw')(self.receive_camera_frame_raw))
+        self.app.router.add_post('/audio/frame', track('/audio/frame')(self.receive_audio_frame))
+        self.app.router.add_post('/text/send', track('/text/send')(self.send_text_message))
+        self.app.router.add_post('/text/confirm', track('/text/confirm')(self.confirm_text_received))
+        self.app.router.add_get('/status', self.get_status)
+        self.app.router.add_get('/metrics', self.get_metrics)
+        self.app.router.add_get('/metrics/json', self.get_metrics_json)
+        self.app.router.add_get('/camera/frames', self.get_camera_frames)
+        self.app.router.add_get('/audio/frames', self.get_audio_frames)
+        self.app.router.add_get('/text/messages', self.get_text_messages)
+        self.app.router.add_get('/stream', self.stream_handler)
+
+    async def on_shutdown(self, app: web.Application):
+        """Close open stream connections"""
+        for ws in list(self.stream_clients):
+            await ws.close(code=1001, message=b'Server shutdown')
+
+    async def on_cleanup(self, app: web.Application):
+        """Flush pending saves and stop worker threads"""
+        if self.writer:
+            await asyncio.get_running_loop().run_in_executor(None, self.writer.close)
+            self.audio_writer.close()
+            logger.info(f"Writer pool stopped: {self.writer.stats()}")
+        self.decode_executor.shutdown(wait=True)
+
+    async def run_in_decoder(self, func, *args):
+        """Run a CPU-bound function in the decode thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.decode_executor, func, *args)
+
+    async def read_json(self, request: web.Request) -> Dict[str, Any]:
+        """Read a request body without blocking and parse it off the event loop"""
+        body = await request.read()
+        if not body:
+            raise RequestError("No JSON data received")
+        try:
+            data = await self.run_in_decoder(json.loads, body)
+        except ValueError:
+            raise RequestError("No JSON data received")
+        if not data:
+            raise RequestError("No JSON data received")
+        return data
+
+    async def health_check(self, request: web.Request) -> web.Response:
+        """Health check"""
+        self.stats["uptime"] = time.time() - self.start_time
+        return web.json_response({
+            "status": "healthy",
+            "timestamp": datetime.now().isoformat(),
+            "uptime": self.stats["uptime"],
+            "stats": self.stats
+        })
+
+    async def receive_camera_frame(self, request: web.Request) -> web.Response:
+        """Receive Quest camera frame data"""
+        try:
+            with self.metrics.stage('/camera/frame', 'parse'):
+                data = await self.read_json(request)
+
+            # Parse camera frame data (base64 decode happens in the pool)
+            with self.metrics.stage('/camera/frame', 'decode'):
+                camera_frame = await self.run_in_decoder(self.parse_camera_frame, data)
+            if camera_frame is None:
+                return web.json_response({"error": "Invalid camera frame data"}, status=400)
+
+            # Process camera frame data
+            with self.metrics.stage('/camera/frame', 'process'):
+                await self.process_camera_frame(camera_frame)
+
+            # Update statistics
+            self.update_camera_stats(len(camera_frame.data))
+
+            return web.json_response({
+                "status": "success",
+                "frame_id": camera_frame.frame_id,
+                "timestamp": camera_frame.timestamp
+            })
+
+        except RequestError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Error processing camera frame data: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def receive_camera_frame_raw(self, request: web.Request) -> web.Response:
+        """Receive Quest camera frame as raw binary pixels"""
+        try:
+            if not request.content_length:
+                return web.json_response({"error": "Content-Length required"}, status=411)
+            if request.content_length > self.max_body_size:
+                return web.json_response({"error": "Camera frame too large"}, status=413)
+
+            # Parse camera frame, reading the body straight into its buffer
+            with self.metrics.stage('/camera/frame/raw', 'parse'):
+                camera_frame = await self.parse_raw_camera_frame(request)
+            if camera_frame is None:
+                return web.json_response({"error": "Invalid camera frame data"}, status=400)
+
+            # Process camera frame data
+            with self.metrics.stage('/camera/frame/raw', 'process'):
+                await self.process_camera_frame(camera_frame)
+
+            # Update statistics
+            self.update_camera_stats(len(camera_frame.data))
+
+            return web.json_response({
+                "status": "success",
+                "frame_id": camera_frame.frame_id,
+                "timestamp": camera_frame.timestamp
+            })
+
+        except Exception as e:
+            logger.error(f"Error processing raw camera frame data: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def receive_audio_frame(self, request: web.Request) -> web.Response:
+        """Receive Quest microphone audio data"""
+        try:
+            with self.metrics.stage('/audio/frame', 'parse'):
+                data = await self.read_json(request)
+
+            # Parse audio frame data (base64 decode happens in the pool)
+            with self.metrics.stage('/audio/frame', 'decode'):
+                audio_frame = await self.run_in_decoder(self.parse_audio_frame, data)
+            if audio_frame is None:
+                return web.json_response({"error": "Invalid audio frame data"}, status=400)
+
+            # Process audio frame data
+            with self.metrics.stage('/audio/frame', 'process'):
+                await self.process_audio_frame(audio_frame)
+
+            # Update statistics
+            self.update_audio_stats(len(audio_frame.data))
+
+            return web.json_response({
+                "status": "success",
+                "frame_id": audio_frame.frame_id,
+                "timestamp": audio_frame.timestamp
+            })
+
+        except RequestError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Error processing audio frame data: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def send_text_message(self, request: web.Request) -> web.Response:
+        """Send text message to Quest device"""
+        try:
+            data = await self.read_json(request)
+
+            content = data.get('content')
+            if not content:
+                return web.json_response({"error": "No content provided"}, status=400)
+
+            # Create, process and push text message
+            message = await self.create_text_message(content)
+
+            return web.json_response({
+                "status": "success",
+                "message_id": message.message_id,
+                "timestamp": message.timestamp
+            })
+
+        except RequestError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Error sending text message: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def confirm_text_received(self, request: web.Request) -> web.Response:
+        """Confirm Quest device received text message"""
+        try:
+            data = await self.read_json(request)
+
+            message_id = data.get('message_id')
+            status = data.get('status', 'delivered')  # delivered, read
+
+            if not message_id:
+                return web.json_response({"error": "No message_id provided"}, status=400)
+
+            # Update message status
+            self.update_text_message_status(message_id, status)
+
+            return web.json_response({
+                "status": "success",
+                "message_id": message_id,
+                "new_status": status
+            })
+
+        except RequestError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Error confirming text message: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def stream_handler(self, request: web.Request) -> web.WebSocketResponse:
+        """Persistent bidirectional stream multiplexing camera, audio and text
+
+        Binary messages carry camera/audio frames, text messages carry JSON
+        commands ("text_send", "text_confirm"). Every message gets a JSON
+        "ack" or "error" reply echoing its channel and seq, and text messages
+        created by any client are pushed to all stream clients."""
+        ws = web.WebSocketResponse(max_msg_size=self.max_body_size, heartbeat=30.0)
+        await ws.prepare(request)
+        self.stream_clients.add(ws)
+        logger.info(f"Stream client connected: {request.remote}")
+
+        try:
+            async for msg in ws:
+                with self.metrics.request('/stream'):
+                    if msg.type == WSMsgType.BINARY:
+                        reply = await self.handle_stream_frame(msg.data)
+                    elif msg.type == WSMsgType.TEXT:
+                        reply = await self.handle_stream_command(msg.data)
+                    else:
+                        continue
+                    await ws.send_json(reply)
+        finally:
+            self.stream_clients.discard(ws)
+            logger.info(f"Stream client disconnected: {request.remote}")
+
+        return ws
+
+    async def handle_stream_frame(self, data: bytes) -> Dict[str, Any]:
+        """Handle one binary /stream message and return its ack
+
+        The frame keeps a memoryview into the received message, so the
+        payload is never copied."""
+        channel = None
+        seq = None
+        try:
+            with self.metrics.stage('/stream', 'parse'):
+                header_end = STREAM_HEADER_LENGTH_SIZE + int.from_bytes(
+                    data[:STREAM_HEADER_LENGTH_SIZE], 'big')
+                header = json.loads(data[STREAM_HEADER_LENGTH_SIZE:header_end])
+            if not isinstance(header, dict):
+                raise RequestError("Stream frame header must be a JSON object")
+            channel = header.get('channel')
+            seq = header.get('seq')
+            payload = memoryview(data)[header_end:]
+            timestamp = header.get('timestamp', datetime.now().isoformat())
+
+            if channel == STREAM_CHANNEL_CAMERA:
+                width = require_positive_int(header, 'width')
+                height = require_positive_int(header, 'height')
+                expected_size = width * height * 3  # RGB format
+                if len(payload) != expected_size:
+                    raise RequestError(f"Camera frame data size mismatch: expected {expected_size}, actual {len(payload)}")
+                camera_frame = CameraFrame(
+                    timestamp=timestamp,
+                    width=width,
+                    height=height,
+                    format=header.get('format', 'RGB'),
+                    data=payload,
+                    frame_id=-1
+                )
+                with self.metrics.stage('/stream', 'process'):
+                    await self.process_camera_frame(camera_frame)
+                self.update_camera_stats(len(payload))
+                frame_id = camera_frame.frame_id
+            elif channel == STREAM_CHANNEL_AUDIO:
+                sample_rate = require_positive_int(header, 'sample_rate')
+                channels = require_positive_int(header, 'channels')
+                sample_size = AUDIO_SAMPLE_WIDTH * channels
+                if not payload or len(payload) % sample_size:
+                    raise RequestError(f"Audio frame data size {len(payload)} is not a positive multiple of {sample_size}")
+                audio_frame = AudioFrame(
+                    timestamp=timestamp,
+                    sample_rate=sample_rate,
+                    channels=channels,
+                    format=header.get('format', 'PCM'),
+                    data=payload,
+                    duration_ms=header.get('duration_ms', 0.0),
+                    frame_id=-1
+                )
+                with self.metrics.stage('/stream', 'process'):
+                    await self.process_audio_frame(audio_frame)
+                self.update_audio_stats(len(payload))
+                frame_id = audio_frame.frame_id
+            else:
+                raise RequestError(f"Unknown stream channel: {channel}")
+
+            return {"type": "ack", "channel": channel, "seq": seq,
+                    "frame_id": frame_id, "timestamp": timestamp}
+
+        except (RequestError, KeyError, TypeError, ValueError) as e:
+            logger.error(f"Invalid stream frame: {e!r}")
+            return {"type": "error", "channel": channel, "seq": seq, "error": repr(e)}
+
+    async def handle_stream_command(self, text: str) -> Dict[str, Any]:
+        """Handle one JSON /stream command and return its ack"""
+        seq = None
+        try:
+            command = json.loads(text)
+            if not isinstance(command, dict):
+                raise RequestError("Stream command must be a JSON object")
+            seq = command.get('seq')
+            command_type = command.get('type')
+
+            if command_type == 'text_send':
+                content = command.get('content')
+                if not content:
+                    raise RequestError("No content provided")
+                message = await self.create_text_message(content)
+                return {"type": "ack", "channel": STREAM_CHANNEL_TEXT, "seq": seq,
+                        "message_id": message.message_id, "timestamp": message.timestamp}
+
+            if command_type == 'text_confirm':
+                message_id = command.get('message_id')
+                status = command.get('status', 'delivered')  # delivered, read
+                if not message_id:
+                    raise RequestError("No message_id provided")
+                self.update_text_message_status(message_id, status)
+                return {"type": "ack", "channel": STREAM_CHANNEL_TEXT, "seq": seq,
+                        "message_id": message_id, "new_status": status}
+
+            raise RequestError(f"Unknown stream command: {command_type}")
+
+        except (RequestError, ValueError) as e:
+            logger.error(f"Invalid stream command: {e}")
+            return {"type": "error", "channel": STREAM_CHANNEL_TEXT, "seq": seq, "error": str(e)}
+
+    async def push_text_message(self, message: TextMessage):
+        """Push a text message to every connected stream client"""
+        if not self.stream_clients:
+            return
+        payload = {"type": "text", **asdict(message)}
+        await asyncio.gather(*(ws.send_json(payload) for ws in list(self.stream_clients)),
+                             return_exceptions=True)
+
+    async def get_metrics(self, request: web.Request) -> web.Response:
+        """Get performance metrics in Prometheus text format"""
+        return web.Response(body=self.metrics.to_prometheus().encode('utf-8'),
+                            headers={'Content-Type': PROMETHEUS_CONTENT_TYPE})
+
+    async def get_metrics_json(self, request: web.Request) -> web.Response:
+        """Get performance metrics as JSON"""
+        return web.json_response(self.metrics.to_json())
+
+    async def get_status(self, request: web.Request) -> web.Response:
+        """Get server status"""
+        return web.json_response({
+            "camera_frames": len(self.camera_frames),
+            "audio_frames": len(self.audio_frames),
+            "text_messages": len(self.text_messages),
+            "stats": self.stats,
+            "save_data": self.save_data,
+            "save_queue": self.writer.stats() if self.writer else None,
+            "frame_store": {
+                "camera": self.camera_frames.stats(),
+                "audio": self.audio_frames.stats()
+            }
+        })
+
+    def get_int_query(self, request: web.Request, name: str, default: Optional[int] = None) -> Optional[int]:
+        """Read an integer query parameter, falling back to a default"""
+        try:
+            return int(request.query[name])
+        except (KeyError, ValueError):
+            return default
+
+    async def frames_response(self, store: FrameStore, request: web.Request) -> web.Response:
+        """Read and serialize a page of frames off the event loop
+
+        'limit' defaults to 10; 'before'/'after' are frame_id cursors."""
+        limit = self.get_int_query(request, 'limit', 10)
+        before = self.get_int_query(request, 'before')
+        after = self.get_int_query(request, 'after')
+
+        def serialize():
+            frames = store.page(limit, before=before, after=after)
+            return json.dumps([frame_to_dict(frame) for frame in frames])
+
+        body = await self.run_in_decoder(serialize)
+        return web.Response(text=body, content_type='application/json')
+
+    async def get_camera_frames(self, request: web.Request) -> web.Response:
+        """Get camera frames list, paginated by frame_id with 'before'/'after'"""
+        return await self.frames_response(self.camera_frames, request)
+
+    async def get_audio_frames(self, request: web.Request) -> web.Response:
+        """Get audio frames list, paginated by frame_id with 'before'/'after'"""
+        return await self.frames_response(self.audio_frames, request)
+
+    async def get_text_messages(self, request: web.Request) -> web.Response:
+        """Get text messages list"""
+        messages = self.text_messages.latest(self.get_int_query(request, 'limit', 10))
+        return web.json_response([asdict(msg) for msg in messages])
+
+    def parse_camera_frame(self, data: Dict[str, Any]) -> Optional[CameraFrame]:
+        """Parse camera frame data
+
+        Runs in the decode pool; frame_id is assigned later on the event loop."""
+        try:
+            # Check required fields
+            required_fields = ['width', 'height', 'data', 'format']
+            for field in required_fields:
+                if field not in data:
+                    logger.error(f"Camera frame missing required field: {field}")
+                    return None
+
+            # Parse data
+            width = data['width']
+            height = data['height']
+            format_type = data['format']
+            frame_data = data['data']
+            timestamp = data.get('timestamp', datetime.now().isoformat())
+
+            # Decode base64 data
+            if isinstance(frame_data, str):
+                frame_data = base64.b64decode(frame_data)
+
+            # Validate data size
+            expected_size = width * height * 3  # RGB format
+            if len(frame_data) != expected_size:
+                logger.warning(f"Camera frame data size mismatch: expected {expected_size}, actual {len(frame_data)}")
+
+            return CameraFrame(
+                timestamp=timestamp,
+                width=width,
+                height=height,
+                format=format_type,
+                data=frame_data,
+                frame_id=-1
+            )
+
+        except Exception as e:
+            logger.error(f"Error parsing camera frame data: {e}")
+            return None
+
+    async def parse_raw_camera_frame(self, request: web.Request) -> Optional[CameraFrame]:
+        """Parse binary camera frame data
+
+        Frame metadata comes from X-Frame-* headers and the body holds the raw
+        pixels. Body chunks are copied once, as they arrive, into a buffer
+        sized from Content-Length; there is no JSON or base64 step."""
+        headers = request.headers
+        try:
+            # Check required headers
+            for header in RAW_FRAME_REQUIRED_HEADERS:
+                if header not in headers:
+                    logger.error(f"Raw camera frame missing required header: {header}")
+                    return None
+
+            # Parse headers
+            width = int(headers[RAW_FRAME_HEADER_WIDTH])
+            height = int(headers[RAW_FRAME_HEADER_HEIGHT])
+            format_type = headers.get(RAW_FRAME_HEADER_FORMAT, 'RGB')
+            timestamp = headers.get(RAW_FRAME_HEADER_TIMESTAMP, datetime.now().isoformat())
+
+            # Validate data size before allocating the buffer
+            content_length = request.content_length
+            expected_size = width * height * 3  # RGB format
+            if content_length != expected_size:
+                logger.error(f"Camera frame data size mismatch: expected {expected_size}, actual {content_length}")
+                return None
+
+            # Read body into preallocated buffer
+            frame_data = bytearray(content_length)
+            view = memoryview(frame_data)
+            total = 0
+            async for chunk in request.content.iter_any():
+                if total + len(chunk) > content_length:
+                    logger.error("Raw camera frame body longer than Content-Length")
+                    return None
+                view[total:total + len(chunk)] = chunk
+                total += len(chunk)
+            if total != content_length:
+                logger.error("Raw camera frame body shorter than Content-Length")
+                return None
+
+            return CameraFrame(
+                timestamp=timestamp,
+                width=width,
+                height=height,
+                format=format_type,
+                data=frame_data,
+                frame_id=-1
+            )
+
+        except Exception as e:
+            logger.error(f"Error parsing raw camera frame data: {e}")
+            return None
+
+    def parse_audio_frame(self, data: Dict[str, Any]) -> Optional[AudioFrame]:
+        """Parse audio frame data
+
+        Runs in the decode pool; frame_id is assigned later on the event loop."""
+        try:
+            # Check required fields
+            required_fields = ['sample_rate', 'channels', 'data', 'format']
+            for field in required_fields:
+                if field not in data:
+                    logger.error(f"Audio frame missing required field: {field}")
+                    return None
+
+            # Parse data
+            sample_rate = data['sample_rate']
+            channels = data['channels']
+            format_type = data['format']
+            audio_data = data['data']
+            duration_ms = data.get('duration_ms', 0.0)
+            timestamp = data.get('timestamp', datetime.now().isoformat())
+
+            # Decode base64 data
+            if isinstance(audio_data, str):
+                audio_data = base64.b64decode(audio_data)
+
+            return AudioFrame(
+                timestamp=timestamp,
+                sample_rate=sample_rate,
+                channels=channels,
+                format=format_type,
+                data=audio_data,
+                duration_ms=duration_ms,
+                frame_id=-1
+            )
+
+        except Exception as e:
+            logger.error(f"Error parsing audio frame data: {e}")
+            return None
+
+    async def process_camera_frame(self, camera_frame: CameraFrame):
+        """Process camera frame data"""
+        camera_frame.frame_id = self.camera_frame_count
+        self.camera_frames.append(camera_frame)
+        self.camera_frame_count += 1
+
+        # Save to file (if enabled)
+        if self.save_data:
+            await self.enqueue_save(self.save_camera_frame, camera_frame)
+
+        logger.debug(f"Processed camera frame: {camera_frame.width}x{camera_frame.height}, "
+                     f"format: {camera_frame.format}, size: {len(camera_frame.data)} bytes")
+
+    async def process_audio_frame(self, audio_frame: AudioFrame):
+        """Process audio frame data"""
+        audio_frame.frame_id = self.audio_frame_count
+        self.audio_frames.append(audio_frame)
+        self.audio_frame_count += 1
+
+        # Save to file (if enabled)
+        if self.save_data:
+            await self.enqueue_save(self.save_audio_frame, audio_frame, lane='audio')
+
+        logger.debug(f"Processed audio frame: {audio_frame.sample_rate}Hz, "
+                     f"channels: {audio_frame.channels}, duration: {audio_frame.duration_ms}ms, "
+                     f"size: {len(audio_frame.data)} bytes")
+
+    async def create_text_message(self, content: str) -> TextMessage:
+        """Create a text message, process it and push it to stream clients"""
+        message = TextMessage(
+            timestamp=datetime.now().isoformat(),
+            message_id=f"msg_{self.text_message_count:06d}",
+            content=content,
+            status="sent"
+        )
+        await self.process_text_message(message)
+        await self.push_text_message(message)
+        return message
+
+    async def process_text_message(self, message: TextMessage):
+        """Process text message"""
+        self.text_messages.append(message)
+        self.text_message_count += 1
+
+        # Save to file (if enabled)
+        if self.save_data:
+            await self.enqueue_save(self.save_text_message, message)
+
+        logger.info(f"Sent text message: {message.message_id}, content: {message.content[:50]}...")
+
+    def update_text_message_status(self, message_id: str, status: str):
+        """Update text message status"""
+        message = self.text_messages.get(message_id)
+        if message is not None:
+            message.status = status
+            logger.info(f"Updated message status: {message_id} -> {status}")
+            return
+
+        logger.warning(f"Message not found: {message_id}")
+
+    async def enqueue_save(self, save_func, item, lane: Optional[str] = None):
+        """Queue an item for background persistence
+
+        With the drop policy this never waits; a full queue drops the save.
+        With the block policy the request waits for room in the queue, in a
+        decode thread so the event loop keeps running."""
+        if self.writer.policy != POLICY_BLOCK:
+            self.writer.submit(save_func, item, lane=lane)
+            return
+        async with self.save_lock:
+            await self.run_in_decoder(lambda: self.writer.submit(save_func, item, lane=lane))
+
+    def save_camera_frame(self, camera_frame: CameraFrame):
+        """Save camera frame to file"""
+        try:
+            with self.metrics.persist('camera', 'convert'):
+                # Convert to numpy array
+                data = np.frombuffer(camera_frame.data, dtype=np.uint8)
+
+                # Reshape to image format
+                if camera_frame.format.upper() == 'RGB':
+                    image = data.reshape(camera_frame.height, camera_frame.width, 3)
+                    # Convert to BGR format for OpenCV save
+                    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+                else:
+                    image = data.reshape(camera_frame.height, camera_frame.width, 3)
+
+            # Save image (JPEG encode and write)
+            filename = f"camera_frame_{camera_frame.frame_id:06d}_{camera_frame.timestamp.replace(':', '-')}.jpg"
+            filepath = self.camera_dir / filename
+            with self.metrics.persist('camera', 'write'):
+                cv2.imwrite(str(filepath), image)
+
+        except Exception as e:
+            logger.error(f"Error saving camera frame: {e}")
+
+    def save_audio_frame(self, audio_frame: AudioFrame):
+        """Append audio frame to the current WAV segment (runs on the 'audio' writer lane)"""
+        try:
+            with self.metrics.persist('audio', 'write'):
+                self.audio_writer.write(audio_frame)
+
+        except Exception as e:
+            logger.error(f"Error saving audio frame: {e}")
+
+    def save_text_message(self, message: TextMessage):
+        """Save text message to file"""
+        try:
+            # Save as JSON file
+            filename = f"text_message_{message.message_id}_{message.timestamp.replace(':', '-')}.json"
+            filepath = self.text_dir / filename
+
+            with self.metrics.persist('text', 'write'):
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump(asdict(message), f, ensure_ascii=False, indent=2)
+
+        except Exception as e:
+            logger.error(f"Error saving text message: {e}")
+
+    def update_camera_stats(self, bytes_received: int):
+        """Update camera statistics"""
+        self.stats["camera_frames"] += 1
+        self.stats["camera_bytes"] += bytes_received
+        self.stats["last_camera_frame"] = datetime.now().isoformat()
+        self.metrics.record_frames('camera', bytes_received)
+
+    def update_audio_stats(self, bytes_received: int):
+        """Update audio statistics"""
+        self.stats["audio_frames"] += 1
+        self.stats["audio_bytes"] += bytes_received
+        self.stats["last_audio_frame"] = datetime.now().isoformat()
+        self.metrics.record_frames('audio', bytes_received)
+
+    def run(self):
+        """Run server"""
+        logger.info(f"Starting async Quest test server, port: {self.port}")
+        logger.info(f"Data saving: {'enabled' if self.save_data else 'disabled'}")
+        logger.info("API endpoints:")
+        logger.info("  GET  /health - Health check")
+        logger.info("  POST /camera/frame - Receive camera frame")
+        logger.info("  POST /camera/frame/raw - Receive camera frame as raw pixels")
+        logger.info("  POST /audio/frame - Receive audio frame")
+        logger.info("  POST /text/send - Send text message")
+        logger.info("  POST /text/confirm - Confirm text reception")
+        logger.info("  GET  /status - Get server status")
+        logger.info("  GET  /camera/frames - Get camera frames list")
+        logger.info("  GET  /audio/frames - Get audio frames list")
+        logger.info("  GET  /text/messages - Get text messages list")
+        logger.info("  GET  /stream - WebSocket stream for camera, audio and text")
+        logger.info("  GET  /metrics - Performance metrics (Prometheus text)")
+        logger.info("  GET  /metrics/json - Performance metrics (JSON)")
+
+        web.run_app(self.app, host=self.host, port=self.port, print=None)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Quest Device Test Server (asyncio)')
+    parser.add_argument('--port', type=int, default=8888, help='Server port (default: 8888)')
+    parser.add_argument('--host', default='0.0.0.0', help='Bind address (default: 0.0.0.0)')
+    parser.add_argument('--save-data', action='store_true', help='Save received data to files')
+    parser.add_argument('--no-save', action='store_true', help='Do not save data to files')
+    parser.add_argument('--decode-workers', type=int, default=None,
+                        help='Threads used for JSON/base64 decoding (default: Python default)')
+    parser.add_argument('--save-workers', type=int, default=2,
+                        help='Background writer threads (default: 2)')
+    parser.add_argument('--save-queue', type=int, default=64,
+                        help='Maximum pending saves (default: 64)')
+    parser.add_argument('--save-policy', choices=POLICIES, default=POLICY_DROP,
+                        help='When the save queue is full: drop new saves or block the request (default: drop)')
+    parser.add_argument('--audio-segment-seconds', type=float, default=60.0,
+                        help='Length of each saved WAV segment in seconds (default: 60)')
+    parser.add_argument('--max-body-mb', type=int, default=64,
+                        help='Maximum request body size in MB (default: 64)')
+    parser.add_argument('--history', type=int, default=100,
+                        help='Frames/messages kept in memory per channel (default: 100)')
+    parser.add_argument('--buffer-mb', type=int, default=128,
+                        help='Memory cap for frame data per channel in MB (default: 128)')
+
+    args = parser.parse_args()
+
+    # Default to save data unless explicitly specified not to save
+    save_data = not args.no_save
+
+    # Create and run server
+    server = AsyncQuestTestServer(port=args.port, save_data=save_data,
+                                  host=args.host,
+                                  decode_workers=args.decode_workers,
+                                  save_workers=args.save_workers,
+                                  save_queue_size=args.save_queue,
+                                  max_body_mb=args.max_body_mb,
+                                  history=args.history,
+                                  buffer_mb=args.buffer_mb,
+                                  save_policy=args.save_policy,
+                                  audio_segment_seconds=args.audio_segment_seconds)
+    server.run()
+
+if __name__ == '__main__':
+    main()
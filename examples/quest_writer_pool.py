@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Quest Test Server Writer Pool
+Background persistence for quest_test_server.py and quest_test_server_async.py
+
+Features:
+1. Bounded queues drained by worker threads, so disk I/O and JPEG encoding
+   stay off the request path
+2. Backpressure policy when writers fall behind: drop new jobs or block
+3. Ordered lanes, so jobs that must run in order (audio appends) share a worker
+4. Rolling WAV segments instead of one file per audio frame
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import wave
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Backpressure policies
+POLICY_DROP = 'drop'
+POLICY_BLOCK = 'block'
+POLICIES = (POLICY_DROP, POLICY_BLOCK)
+
+class WriterPool:
+    """Worker threads draining bounded job queues
+
+    Each worker owns one queue of max_queue // workers jobs. Jobs submitted
+    with a lane always go to the same worker and therefore run in
+    submission order; other jobs go to the least loaded worker."""
+
+    def __init__(self, workers: int = 2, max_queue: int = 64,
+                 policy: str = POLICY_DROP, block_timeout: Optional[float] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.workers = max(1, workers)
+        self.max_queue = max(self.workers, max_queue)
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        per_worker = self.max_queue // self.workers
+        self.queues = [queue.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self.lanes: Dict[str, int] = {}
+        self.lane_counter = itertools.count()
+
+        # Metrics
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+
+        self.threads = [threading.Thread(target=self.worker, args=(jobs,),
+                                         name=f'writer-{index}', daemon=True)
+                        for index, jobs in enumerate(self.queues)]
+        for thread in self.threads:
+            thread.start()
+
+    def pick_queue(self, lane: Optional[str]) -> queue.Queue:
+        """Choose the queue for a job"""
+        if lane is None:
+            return min(self.queues, key=lambda jobs: jobs.qsize())
+        with self.lock:
+            if lane not in self.lanes:
+                self.lanes[lane] = next(self.lane_counter) % self.workers
+            return self.queues[self.lanes[lane]]
+
+    def submit(self, func: Callable, *args, lane: Optional[str] = None) -> bool:
+        """Queue func(*args) for a worker
+
+        Returns False if the job was dropped: immediately with the drop
+        policy, or after block_timeout with the block policy."""
+        jobs = self.pick_queue(lane)
+        try:
+            if self.policy == POLICY_BLOCK:
+                jobs.put((func, args), timeout=self.block_timeout)
+            else:
+                jobs.put_nowait((func, args))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            logger.warning(f"Writer queue full, dropping {getattr(func, '__name__', 'job')}")
+            return False
+
+        with self.lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self.depth())
+        return True
+
+    def worker(self, jobs: queue.Queue):
+        """Run jobs from one queue until a None sentinel arrives"""
+        while True:
+            job = jobs.get()
+            try:
+                if job is None:
+                    return
+                func, args = job
+                try:
+                    func(*args)
+                    with self.lock:
+                        self.completed += 1
+                except Exception as e:
+                    with self.lock:
+                        self.failed += 1
+                    logger.error(f"Writer job failed: {e}")
+            finally:
+                jobs.task_done()
+
+    def depth(self) -> int:
+        """Number of queued jobs across all workers"""
+        return sum(jobs.qsize() for jobs in self.queues)
+
+    def flush(self):
+        """Wait until every queued job has run"""
+        for jobs in self.queues:
+            jobs.join()
+
+    def close(self):
+        """Run remaining jobs and stop the workers"""
+        for jobs in self.queues:
+            jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and job counters"""
+        with self.lock:
+            return {
+                "depth": self.depth(),
+                "max_depth": self.max_depth,
+                "capacity": self.max_queue,
+                "workers": self.workers,
+                "policy": self.policy,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "failed": self.failed
+            }
+
+class RollingWavWriter:
+    """Append audio frames to WAV segment files
+
+    A new segment starts when the current one reaches segment_seconds of
+    audio or when the sample rate or channel count changes. The WAV header
+    is patched on every write, so segments are readable while open.
+    Not thread-safe; submit writes on a single WriterPool lane."""
+
+    def __init__(self, directory: Path, prefix: str = 'audio_segment',
+                 segment_seconds: float = 60.0, sample_width: int = 2):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.segment_seconds = segment_seconds
+        self.sample_width = sample_width
+
+        self.wav_file = None
+        self.format = None
+        self.segment_frames = 0
+        self.segments = 0
+
+    def open_segment(self, frame):
+        """Start a new segment named after its first frame"""
+        self.close()
+        filename = f"{self.prefix}_{frame.frame_id:06d}_{frame.timestamp.replace(':', '-')}.wav"
+        self.wav_file = wave.open(str(self.directory / filename), 'wb')
+        self.wav_file.setnchannels(frame.channels)
+        self.wav_file.setsampwidth(self.sample_width)
+        self.wav_file.setframerate(frame.sample_rate)
+        self.format = (frame.sample_rate, frame.channels)
+        self.segment_frames = 0
+        self.segments += 1
+
+    def write(self, frame):
+        """Append one audio frame, rolling over to a new segment if needed"""
+        if (self.wav_file is None
+                or self.format != (frame.sample_rate, frame.channels)
+                or self.segment_frames >= self.segment_seconds * frame.sample_rate):
+            self.open_segment(frame)
+        self.wav_file.writeframes(frame.data)
+        self.segment_frames += len(frame.data) // (self.sample_width * frame.channels)
+
+    def close(self):
+        """Finish the current segment"""
+        if self.wav_file is not None:
+            self.wav_file.close()
+            self.wav_file = None
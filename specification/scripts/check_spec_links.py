@@ -66,7 +66,7 @@ class XREntityDatabase(EntityDatabase):
         root = Path(__file__).resolve().parent.parent.parent
         registryFile = str(root / 'specification/registry/xr.xml')
         registry = Registry()
-        registry.loadFile(registryFile)
+        registry.loadFile(registryFile, cachedir=self.registry_cache_dir)
         return registry
 
     def getNamePrefix(self):
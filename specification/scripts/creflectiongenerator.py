@@ -11,11 +11,47 @@
 import re
 from typing import Optional
 
+from cgenerator import CGeneratorOptions
 from generator import OutputGenerator, write
-from jinja_helpers import JinjaTemplate, make_jinja_environment
+from jinja_helpers import JinjaTemplate, get_jinja_environment
 from spec_tools.util import getElemName, getElemType
 
 
+class CReflectionGeneratorOptions(CGeneratorOptions):
+    """CReflectionGeneratorOptions - subclass of CGeneratorOptions."""
+
+    def __init__(self, templateCacheDir=None, **kwargs):
+        """Constructor.
+
+        - templateCacheDir - if not None, directory in which to cache
+        compiled templates between runs.
+
+        Other arguments are passed to CGeneratorOptions."""
+        CGeneratorOptions.__init__(self, **kwargs)
+        self.templateCacheDir = templateCacheDir
+
+
+class StructGroups:
+    """Holds struct types that have a structure type enum, grouped by the
+    protects they are available with, in the order they were added"""
+
+    def __init__(self):
+        self.unprotected_structs = []
+        self.structs_by_protect = {}
+
+    def add(self, struct):
+        if struct.structTypeName is None:
+            return
+        if struct.protect is None:
+            self.unprotected_structs.append(struct)
+        else:
+            self.structs_by_protect.setdefault(struct.protect, []).append(struct)
+
+    def protected_structs(self):
+        """Get (protect, structs) pairs for each non-empty protect group, sorted by protect."""
+        return sorted(self.structs_by_protect.items(), key=lambda item: item[0])
+
+
 class PolymorphicStructCollection:
     """Holds struct types that share a parentstruct"""
 
@@ -76,52 +112,36 @@ class CReflectionOutputGenerator(OutputGenerator):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.env = make_jinja_environment(file_with_templates_as_sibs=__file__)
+        self.env = None
         self.structs = []
         self.commands = []
         self.enums = []
         self.bitmasks = []
-        self.protects = set()
         self.template: Optional[JinjaTemplate] = None
-        self.parents = {}
+        # Indexes of self.structs, built as the structs are generated.
+        self.struct_groups = StructGroups()
+        self.struct_groups_by_parent = {}
 
     def beginFile(self, genOpts):
         OutputGenerator.beginFile(self, genOpts)
+        self.env = get_jinja_environment(file_with_templates_as_sibs=__file__,
+                                         cache_dir=getattr(genOpts, 'templateCacheDir', None))
         self.template = JinjaTemplate(self.env, f"template_{genOpts.filename}")
 
-    def _get_structs_for_protect(self, protect=None):
-        """
-        Get an array of structure objects available only with the given protects defined.
-        """
-        ret = [x for x in self.structs
-               if x.protect == protect and x.structTypeName is not None]
-        return ret
-
     def endFile(self):
         assert self.template
         assert self.registry
         file_data = ''
 
-        unprotected_structs = self._get_structs_for_protect()
-        protected_structs = [(x, self._get_structs_for_protect(protect=x))
-                             for x in sorted(self.protects)]
-        # drop empty collections
-        protected_structs = [(x, y) for x, y in protected_structs if y]
-
-        polymorphic_struct_families = []
-        for parent_name, child_names in self.parents.items():
-            # filter by name
-            prot = [
-                (protect, [s for s in structs if s.typeName in child_names])
-                for protect, structs in protected_structs
-            ]
-            # filter out empty protection groups
-            prot = [(protect, structs) for protect, structs in prot if structs]
-
-            polymorphic_struct_families.append(PolymorphicStructCollection(
+        unprotected_structs = self.struct_groups.unprotected_structs
+        protected_structs = self.struct_groups.protected_structs()
+
+        polymorphic_struct_families = [
+            PolymorphicStructCollection(
                 parent_name,
-                unprotected_structs=[s for s in unprotected_structs if s.typeName in child_names],
-                protect_sets_and_protected_structs=prot))
+                unprotected_structs=groups.unprotected_structs,
+                protect_sets_and_protected_structs=groups.protected_structs())
+            for parent_name, groups in self.struct_groups_by_parent.items()]
 
         extensions = list(
             ((name, data) for name, data in self.registry.extdict.items()
@@ -155,16 +175,19 @@ class CReflectionOutputGenerator(OutputGenerator):
         if alias:
             return
         category = typeElem.get('category')
+        struct = None
         if category in ('struct', 'union'):
             # If the type is a struct type, generate it using the
             # special-purpose generator.
             self.genStruct(typeinfo, name, alias)
+            struct = self.structs[-1]
 
         parent_struct = typeElem.get('parentstruct')
         if parent_struct is not None:
-            if parent_struct not in self.parents:
-                self.parents[parent_struct] = set()
-            self.parents[parent_struct].add(name)
+            if parent_struct not in self.struct_groups_by_parent:
+                self.struct_groups_by_parent[parent_struct] = StructGroups()
+            if struct is not None:
+                self.struct_groups_by_parent[parent_struct].add(struct)
 
     def genCmd(self, cmdinfo, name, alias):
         OutputGenerator.genCmd(self, cmdinfo, name, alias)
@@ -202,9 +225,9 @@ class CReflectionOutputGenerator(OutputGenerator):
         else:
             protect = None
 
-        self.structs.append(StructData(typeName, structTypeEnum, members, protect))
-        if protect:
-            self.protects.add(protect)
+        struct = StructData(typeName, structTypeEnum, members, protect)
+        self.structs.append(struct)
+        self.struct_groups.add(struct)
 
     def genGroup(self, groupinfo, groupName, alias=None):
         OutputGenerator.genGroup(self, groupinfo, groupName, alias)
@@ -4,11 +4,12 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import io
 from pathlib import Path
 from typing import List, Optional
 from dataclasses import dataclass
 
-from generator import GeneratorOptions, OutputGenerator, noneStr, write
+from generator import GeneratorOptions, IncludeWriter, OutputGenerator, noneStr, write
 from parse_dependency import dependencyLanguageComment
 
 _ENUM_TABLE_PREFIX = """
@@ -183,8 +184,14 @@ class DocOutputGenerator(OutputGenerator):
         # inferred type name pattern for different APIs.
         self.result_type = f"{genOpts.conventions.type_prefix}Result"
 
+        # The include files are written at the end, and only if changed.
+        self.includeWriter = IncludeWriter(self, genOpts.directory, f'{genOpts.filename}.manifest')
+
     def endFile(self):
+        assert self.genOpts
+        stamp = Path(self.genOpts.directory) / self.genOpts.filename
         OutputGenerator.endFile(self)
+        self.includeWriter.finish(stamp)
 
     def beginFeature(self, interface, emit):
         # Start processing in superclass
@@ -268,7 +275,7 @@ class DocOutputGenerator(OutputGenerator):
         # Create file
         filename = directory / f"{basename}{self.file_suffix}"
         self.logMsg('diag', '# Generating include file:', str(filename))
-        fp = open(filename, 'w', encoding='utf-8')
+        fp = io.StringIO()
 
         # Asciidoc anchor
         write(self.genOpts.conventions.warning_comment, file=fp)
@@ -293,13 +300,13 @@ class DocOutputGenerator(OutputGenerator):
         write('----', file=fp)
         write(contents, file=fp)
         write('----', file=fp)
-        fp.close()
+        self.includeWriter.write(filename, fp.getvalue())
 
         if self.genOpts.secondaryInclude:
             # Create secondary no cross-reference include file
             filename = directory / f'{basename}.no-xref{self.file_suffix}'
             self.logMsg('diag', '# Generating include file:', filename)
-            fp = open(filename, 'w', encoding='utf-8')
+            fp = io.StringIO()
 
             # Asciidoc anchor
             write(self.genOpts.conventions.warning_comment, file=fp)
@@ -308,7 +315,7 @@ class DocOutputGenerator(OutputGenerator):
             write('----', file=fp)
             write(contents, file=fp)
             write('----', file=fp)
-            fp.close()
+            self.includeWriter.write(filename, fp.getvalue())
 
     def writeEnumTable(self, basename, values):
         """Output a table of enumerants."""
@@ -319,7 +326,7 @@ class DocOutputGenerator(OutputGenerator):
         filename = directory / f"{basename}.comments{self.file_suffix}"
         self.logMsg('diag', '# Generating include file:', filename)
 
-        with open(filename, 'w', encoding='utf-8') as fp:
+        with io.StringIO() as fp:
             write(self.conventions.warning_comment, file=fp)
             write(_ENUM_TABLE_PREFIX, file=fp)
 
@@ -327,12 +334,13 @@ class DocOutputGenerator(OutputGenerator):
                 write(self._make_enumerant_table_row(data), file=fp)
 
             write(_TABLE_SUFFIX, file=fp)
+            self.includeWriter.write(filename, fp.getvalue())
 
     def writeBox(self, filename, prefix, items):
         """Write a generalized block/box for some values."""
         self.logMsg('diag', '# Generating include file:', filename)
 
-        with open(filename, 'w', encoding='utf-8') as fp:
+        with io.StringIO() as fp:
             write(self.conventions.warning_comment, file=fp)
             write(prefix, file=fp)
 
@@ -340,6 +348,7 @@ class DocOutputGenerator(OutputGenerator):
                 write(f"* {item}", file=fp)
 
             write(_BLOCK_SUFFIX, file=fp)
+            self.includeWriter.write(filename, fp.getvalue())
 
     def writeEnumBox(self, basename, values):
         """Output a box of enumerants."""
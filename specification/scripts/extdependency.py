@@ -8,11 +8,16 @@
 
 import argparse
 import errno
+import hashlib
+import pickle
+import sys
 import xml.etree.ElementTree as etree
 from pathlib import Path
 
+import parse_dependency
 from apiconventions import APIConventions
 from parse_dependency import dependencyNames
+from spec_tools.cache_file import loadCacheFile, saveCacheFile
 
 class DiGraph:
     """A directed graph.
@@ -34,15 +39,18 @@ class DiGraph:
 
     def __init__(self):
         self.__nodes = {}
+        self.__closure = None
 
     def add_node(self, node):
         if node not in self.__nodes:
             self.__nodes[node] = DiGraphNode()
+            self.__closure = None
 
     def add_edge(self, src, dest):
         self.add_node(src)
         self.add_node(dest)
         self.__nodes[src].adj.add(dest)
+        self.__closure = None
 
     def nodes(self):
         """Iterate over the nodes in the graph."""
@@ -53,42 +61,186 @@ class DiGraph:
         Iterate over the nodes reachable from the given start node, excluding
         the start node itself. Each node in the graph is yielded at most once.
         """
+        return self.closure().descendants(node)
+
+    def closure(self):
+        """Return a DiGraphClosure indexing the transitive closure of the
+        graph. It is computed once, until the graph is modified."""
+
+        if self.__closure is not None:
+            return self.__closure
+
+        nodes = list(self.__nodes)
+        ids = {node: i for i, node in enumerate(nodes)}
+        adj = [[ids[x] for x in self.__nodes[node].adj] for node in nodes]
+        reach = [0] * len(nodes)
+
+        # Find the strongly connected components with Tarjan's algorithm,
+        # iteratively to avoid deep recursion. Components are completed in
+        # reverse topological order, so the nodes reachable from every
+        # successor of a component are known when it is completed.
+        order = [None] * len(nodes)
+        low = [0] * len(nodes)
+        onStack = [False] * len(nodes)
+        stack = []
+        count = 0
+        for root in range(len(nodes)):
+            if order[root] is not None:
+                continue
+            work = [(root, 0)]
+            while work:
+                v, i = work[-1]
+                if i == 0:
+                    order[v] = low[v] = count
+                    count += 1
+                    stack.append(v)
+                    onStack[v] = True
+                if i < len(adj[v]):
+                    work[-1] = (v, i + 1)
+                    w = adj[v][i]
+                    if order[w] is None:
+                        work.append((w, 0))
+                    elif onStack[w]:
+                        low[v] = min(low[v], order[w])
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[v])
+                if low[v] != order[v]:
+                    continue
+
+                # v is the root of a component: pop its members
+                component = []
+                while True:
+                    w = stack.pop()
+                    onStack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+
+                bits = 0
+                for w in component:
+                    for x in adj[w]:
+                        bits |= (1 << x) | reach[x]
+                if len(component) > 1:
+                    # Every member of a cycle reaches every other member
+                    for w in component:
+                        bits |= 1 << w
+                for w in component:
+                    reach[w] = bits
+
+        self.__closure = DiGraphClosure(nodes, reach)
+        return self.__closure
 
-        # Implementation detail: Do a breadth-first traversal because it is
-        # easier than depth-first.
-
-        # All nodes seen during traversal.
-        seen = set()
+class DiGraphNode:
+    def __init__(self):
+        # Set of adjacent of nodes.
+        self.adj = set()
 
-        # The stack of nodes that need visiting.
-        visit_me = []
+class DiGraphClosure:
+    """Index of the transitive closure of a DiGraph.
 
-        # Bootstrap the traversal.
-        seen.add(node)
-        for x in self.__nodes[node].adj:
-            if x not in seen:
-                seen.add(x)
-                visit_me.append(x)
+    Nodes are numbered densely in graph order. The set of nodes reachable
+    from each node is a bitset: an int with bit i set if node i is
+    reachable. Membership queries take O(1) bitset operations, and
+    queries returning nodes take O(k) for k nodes returned.
 
-        while visit_me:
-            x = visit_me.pop()
-            assert x in seen
-            yield x
+    Only the node list and the bitsets are pickled, so the index is cheap
+    to cache.
+    """
 
-            for y in self.__nodes[x].adj:
-                if y not in seen:
-                    seen.add(y)
-                    visit_me.append(y)
+    def __init__(self, nodes, reach):
+        """Construct an index.
+
+        nodes - list of nodes, indexed by node id.
+
+        reach - list of bitsets of the node ids reachable from each node,
+        indexed by node id."""
+
+        self.nodes = nodes
+        self.reach = reach
+        self.__setstate__(self.__getstate__())
+
+    def __getstate__(self):
+        return {'nodes': self.nodes, 'reach': self.reach}
+
+    def __setstate__(self, state):
+        self.nodes = state['nodes']
+        self.reach = state['reach']
+        self.ids = {node: i for i, node in enumerate(self.nodes)}
+        self.__reachedBy = None
+
+    def bitset(self, nodes):
+        """Return the bitset of an iterable of nodes."""
+        bits = 0
+        for node in nodes:
+            bits |= 1 << self.ids[node]
+        return bits
+
+    def iterBitset(self, bits):
+        """Iterate over the nodes in a bitset, in graph order."""
+        while bits:
+            low = bits & -bits
+            yield self.nodes[low.bit_length() - 1]
+            bits ^= low
+
+    def descendantBits(self, node):
+        """Return the bitset of the nodes reachable from a node, excluding
+        the node itself."""
+        i = self.ids[node]
+        return self.reach[i] & ~(1 << i)
+
+    def ancestorBits(self, node):
+        """Return the bitset of the nodes from which a node is reachable,
+        excluding the node itself."""
+        if self.__reachedBy is None:
+            reachedBy = [0] * len(self.nodes)
+            for i, bits in enumerate(self.reach):
+                while bits:
+                    low = bits & -bits
+                    reachedBy[low.bit_length() - 1] |= 1 << i
+                    bits ^= low
+            self.__reachedBy = reachedBy
+        i = self.ids[node]
+        return self.__reachedBy[i] & ~(1 << i)
 
-class DiGraphNode:
-    def __init__(self):
-        # Set of adjacent of nodes.
-        self.adj = set()
+    def descendants(self, node):
+        """Iterate over the nodes reachable from a node, excluding the node
+        itself."""
+        return self.iterBitset(self.descendantBits(node))
+
+    def ancestors(self, node):
+        """Iterate over the nodes from which a node is reachable, excluding
+        the node itself."""
+        return self.iterBitset(self.ancestorBits(node))
+
+    def is_descendant(self, node, ancestor):
+        """Return True if node is reachable from ancestor, and is not
+        ancestor itself."""
+        return node != ancestor and bool(self.reach[self.ids[ancestor]] >> self.ids[node] & 1)
+
+    def common_descendants(self, nodes):
+        """Iterate over the nodes reachable from every one of an iterable of
+        nodes, excluding those nodes themselves."""
+        nodes = list(nodes)
+        if not nodes:
+            return iter(())
+        bits = -1
+        for node in nodes:
+            bits &= self.descendantBits(node)
+        return self.iterBitset(bits)
+
+# Bump when the cached dependency state changes in a way not reflected in
+# the source of this file.
+DEPENDENCY_CACHE_VERSION = 1
 
 class ApiDependencies:
     def __init__(self,
                  registry_path = None,
-                 api_name = None):
+                 api_name = None,
+                 cachedir = None):
         """Load an API registry and generate extension dependencies
 
         registry_path - relative filename of XML registry. If not specified,
@@ -96,6 +248,11 @@ class ApiDependencies:
 
         api_name - API name for which to generate dependencies. Only
         extensions supported for that API are considered.
+
+        cachedir - directory holding cached dependencies, or None. If the
+        dependencies of this registry and API have been cached there, they
+        are loaded instead of parsing the registry. Otherwise the newly
+        generated dependencies are cached.
         """
 
         conventions = APIConventions()
@@ -104,13 +261,18 @@ class ApiDependencies:
         if api_name is None:
             api_name = conventions.xml_api_name
 
+        self.registry_path = registry_path
+        self.__tree = None
+
+        if cachedir is not None and self.loadCache(api_name, cachedir):
+            return
+
         self.allExts = set()
         self.khrExts = set()
         self.ratifiedExts = set()
         self.versions = set()
         self.graph = DiGraph()
         self.extensions = {}
-        self.tree = etree.parse(registry_path)
 
         # Loop over all supported features (versions)
         for elem in self.tree.findall('feature'):
@@ -166,6 +328,61 @@ class ApiDependencies:
                 # Skip unsupported extensions
                 pass
 
+        # Index the transitive dependencies once, for all queries
+        self.closure = self.graph.closure()
+
+        if cachedir is not None:
+            self.saveCache(api_name, cachedir)
+
+    @property
+    def tree(self):
+        """The parsed XML registry, parsed on first use if the dependencies
+        were loaded from the cache."""
+        if self.__tree is None:
+            self.__tree = etree.parse(self.registry_path)
+        return self.__tree
+
+    def cachePath(self, api_name, cachedir):
+        """Return the path of the cached dependencies for the registry.
+
+        The cache is keyed by a hash of the registry contents, the API name,
+        and the source of the modules generating the dependencies, so any
+        change to them invalidates it."""
+        digest = hashlib.sha256()
+        for key in (DEPENDENCY_CACHE_VERSION, sys.version, api_name):
+            digest.update(str(key).encode('utf-8') + b'\0')
+        sources = [__file__, parse_dependency.__file__,
+                   sys.modules[APIConventions.__module__].__file__,
+                   self.registry_path]
+        for source in sources:
+            with open(source, 'rb') as fp:
+                digest.update(fp.read())
+        return Path(cachedir) / f'{Path(self.registry_path).stem}-deps-{digest.hexdigest()}.pickle'
+
+    def loadCache(self, api_name, cachedir):
+        """Load the cached dependencies for the registry, if any.
+
+        Returns True on success, or False if there is no usable cache."""
+        path = self.cachePath(api_name, cachedir)
+        state = loadCacheFile(path, pickle.load, warnCache, 'dependency cache')
+        if state is None:
+            return False
+        if not isinstance(state, dict) or 'closure' not in state:
+            warnCache(f'Ignoring invalid dependency cache {path}')
+            return False
+
+        self.__dict__.update(state)
+        return True
+
+    def saveCache(self, api_name, cachedir):
+        """Save the dependencies for the registry to the cache."""
+        path = self.cachePath(api_name, cachedir)
+        state = {key: value for key, value in self.__dict__.items()
+                 if key in DEPENDENCY_CACHE_KEYS}
+        saveCacheFile(path,
+                      lambda fp: pickle.dump(state, fp, protocol=pickle.HIGHEST_PROTOCOL),
+                      warnCache, 'dependency cache')
+
     def allExtensions(self):
         """Returns a set of all extensions in the graph"""
         return self.allExts
@@ -189,7 +406,7 @@ class ApiDependencies:
         if extension not in self.allExts:
             raise Exception(f'Extension {extension} not found in XML!')
 
-        return set(self.graph.descendants(extension))
+        return set(self.closure.descendants(extension))
 
     def versionChildren(self, version):
         """Returns a set of the dependencies of a version.
@@ -198,7 +415,56 @@ class ApiDependencies:
         if version not in self.versions:
             raise Exception(f'Version {version} not found in XML!')
 
-        return set(self.graph.descendants(version))
+        return set(self.closure.descendants(version))
+
+    def parents(self, name):
+        """Returns a set of the extensions and versions depending on an
+           extension or version, directly or indirectly.
+           Throws an exception if the name is not in the graph."""
+
+        if name not in self.closure.ids:
+            raise Exception(f'{name} not found in XML!')
+
+        return set(self.closure.ancestors(name))
+
+    def dependsOn(self, name, dependency):
+        """Returns True if an extension or version depends on another,
+           directly or indirectly.
+           Throws an exception if either name is not in the graph."""
+
+        for n in (name, dependency):
+            if n not in self.closure.ids:
+                raise Exception(f'{n} not found in XML!')
+
+        return self.closure.is_descendant(dependency, name)
+
+    def commonChildren(self, names):
+        """Returns a set of the dependencies shared by all of a collection of
+           extensions and versions.
+           Throws an exception if a name is not in the graph."""
+
+        # names may be an iterator, and is walked twice
+        names = list(names)
+        for name in names:
+            if name not in self.closure.ids:
+                raise Exception(f'{name} not found in XML!')
+
+        return set(self.closure.common_descendants(names))
+
+def warnCache(message):
+    """Report a dependency cache that cannot be used."""
+    print(message, file=sys.stderr)
+
+# ApiDependencies attributes saved in the dependency cache
+DEPENDENCY_CACHE_KEYS = (
+    'allExts',
+    'khrExts',
+    'ratifiedExts',
+    'versions',
+    'graph',
+    'extensions',
+    'closure',
+)
 
 
 # Test script
@@ -214,18 +480,22 @@ if __name__ == '__main__':
     parser.add_argument('-test', action='store',
                         default=None,
                         help='Specify extension to find dependencies of')
+    parser.add_argument('-cachedir', action='store', default=None,
+                        help='Cache the dependencies in the specified directory, and reuse them while the registry is unchanged')
 
     args = parser.parse_args()
 
-    deps = ApiDependencies(args.registry)
+    deps = ApiDependencies(args.registry, cachedir=args.cachedir)
     print('KHR exts =', sorted(deps.khrExtensions()))
     print('Ratified exts =', sorted(deps.ratifiedExtensions()))
+    if args.test is not None:
+        print(f'{args.test} dependencies =', sorted(deps.children(args.test)))
 
     import time
     startTime = time.process_time()
 
     for loop in range(args.loops):
-        deps = ApiDependencies(args.registry)
+        deps = ApiDependencies(args.registry, cachedir=args.cachedir)
 
     endTime = time.process_time()
 
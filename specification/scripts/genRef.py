@@ -9,16 +9,20 @@
 # Usage: genRef.py files
 
 import argparse
+import hashlib
 import io
+import json
+import multiprocessing
 import os
 import re
 import sys
 from collections import OrderedDict
-from reflib import (findRefs, fixupRefs, loadFile, logDiag, logWarn, logErr,
-                    printPageInfo, setLogFile)
+from reflib import (captureLogs, findRefs, fixupRefs, loadFile, logDiag,
+                    logWarn, logErr, printPageInfo, replayLogs, setLogFile)
 from reg import Registry
 from generator import GeneratorOptions
 from parse_dependency import dependencyNames
+from spec_tools.cache_file import writeFileAtomically
 from apiconventions import APIConventions
 
 
@@ -45,6 +49,28 @@ refpage_other_types = (
     'spirv'
 )
 
+# Increment when the format of the -manifest file changes.
+GENREF_MANIFEST_VERSION = 1
+
+# Manifest records of the refpage files written by this run, and by the
+# previous run, indexed by file name. See pageRecord().
+pageRecords = {}
+previousPageRecords = {}
+
+# Contents of the refpage files to write, indexed by file name
+pendingPages = {}
+
+# Number of times each refpage file was generated by this run
+pageWriteCounts = {}
+
+# Number of refpage files written, and left untouched because their
+# contents were unchanged
+pagesWritten = 0
+pagesUnchanged = 0
+
+# List of (page file name, contents) pairs generated by genRefEntry(), or
+# None when pages are written as they are generated
+collectedPages = None
 
 def makeExtensionInclude(name):
     """Return an include command for a generated extension interface.
@@ -114,6 +140,95 @@ def printFooter(fp, leveloffset=0):
           sep='\n', file=fp)
 
 
+class RefPageFile(io.StringIO):
+    """Refpage being generated, passed to emitPageText() when closed.
+
+    Used in place of a file opened for writing."""
+
+    def __init__(self, pageName):
+        super().__init__()
+        self.pageName = pageName
+
+    def close(self):
+        if not self.closed:
+            emitPageText(self.pageName, self.getvalue())
+        super().close()
+
+
+def pageRecord(pageName, digest):
+    """Return the manifest record of a refpage file: its content hash, size,
+    and modification time."""
+    st = os.stat(pageName)
+    return [digest, st.st_size, st.st_mtime_ns]
+
+
+def pageIsCurrent(pageName):
+    """Return True if a refpage file is still as recorded in the manifest of
+    the previous run."""
+    record = previousPageRecords.get(pageName)
+    try:
+        return record is not None and pageRecord(pageName, record[0]) == record
+    except OSError:
+        return False
+
+
+def writePage(pageName, text):
+    """Write a refpage file, unless it already has the same contents.
+
+    Leaving unchanged pages alone preserves their timestamps, so the
+    HTML built from them is not rebuilt.
+
+    - pageName - refpage file name
+    - text - contents of the page"""
+    global pagesWritten, pagesUnchanged
+
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    contents = text.replace('\n', os.linesep).encode('utf-8')
+
+    # The recorded content hash avoids reading pages which have not been
+    # touched since the previous run
+    if pageIsCurrent(pageName):
+        unchanged = previousPageRecords[pageName][0] == digest
+    else:
+        try:
+            with open(pageName, 'rb') as fp:
+                unchanged = fp.read() == contents
+        except OSError:
+            unchanged = False
+
+    if unchanged:
+        pagesUnchanged = pagesUnchanged + 1
+    else:
+        with open(pageName, 'wb') as fp:
+            fp.write(contents)
+        pagesWritten = pagesWritten + 1
+
+    pageRecords[pageName] = pageRecord(pageName, digest)
+
+
+def emitPageText(pageName, text):
+    """Add a generated refpage to those written by writePendingPages(), or
+    collect it if a spec file is being processed by genRefEntry().
+
+    - pageName - refpage file name
+    - text - contents of the page"""
+    if collectedPages is not None:
+        collectedPages.append((pageName, text))
+    else:
+        pendingPages[pageName] = text
+        pageWriteCounts[pageName] = pageWriteCounts.get(pageName, 0) + 1
+
+
+def writePendingPages():
+    """Write the generated refpages.
+
+    Pages are only written once all are generated, so a page generated
+    more than once is written only with its final contents."""
+    for pageName, text in pendingPages.items():
+        writePage(pageName, text)
+    pendingPages.clear()
+
+
 def macroPrefix(name):
     """Add a spec asciidoc macro prefix to an API name, depending on its type
     (protos, structs, enums, etc.).
@@ -490,7 +605,7 @@ def emitPage(baseDir, specDir, pi, file):
     fieldText = xrefRewrite(fieldText, specURL)
     descText = xrefRewrite(descText, specURL)
 
-    fp = open(pageName, 'w', encoding='utf-8')
+    fp = RefPageFile(pageName)
     refPageHead(pi.name,
                 pi.desc,
                 specText,
@@ -515,7 +630,7 @@ def autoGenEnumsPage(baseDir, pi, file):
     - pi - pageInfo for this page relative to file
     - file - list of strings making up the file, indexed by pi"""
     pageName = f'{baseDir}/{pi.name}{conventions.file_suffix}'
-    fp = open(pageName, 'w', encoding='utf-8')
+    fp = RefPageFile(pageName)
 
     # Add a dictionary entry for this page
     global genDict
@@ -568,7 +683,7 @@ def autoGenFlagsPage(baseDir, flagName):
     - baseDir - base directory to emit page into
     - flagName - API *Flags name"""
     pageName = f'{baseDir}/{flagName}{conventions.file_suffix}'
-    fp = open(pageName, 'w', encoding='utf-8')
+    fp = RefPageFile(pageName)
 
     # Add a dictionary entry for this page
     global genDict
@@ -623,7 +738,7 @@ def autoGenHandlePage(baseDir, handleName):
     # @@ Need to determine creation function & add handles/ include for the
     # @@ interface in generator.py.
     pageName = f'{baseDir}/{handleName}{conventions.file_suffix}'
-    fp = open(pageName, 'w', encoding='utf-8')
+    fp = RefPageFile(pageName)
 
     # Add a dictionary entry for this page
     global genDict
@@ -726,6 +841,221 @@ def genRef(specFile, baseDir):
     return pages
 
 
+def inputsDigest(baseDir):
+    """Return a hash of the inputs besides a spec file which affect the
+    pages extracted from it: the output directory, the API map, and the
+    source of this script and of the modules it uses."""
+    digest = hashlib.sha256()
+    for key in (GENREF_MANIFEST_VERSION, os.path.abspath(baseDir)):
+        digest.update(str(key).encode('utf-8') + b'\0')
+
+    modules = [sys.modules[__name__], api, sys.modules[findRefs.__module__]]
+    modules.extend(sys.modules[base.__module__]
+                   for base in type(conventions).__mro__)
+    sources = set(os.path.abspath(module.__file__)
+                  for module in modules if getattr(module, '__file__', None))
+    for source in sorted(sources):
+        with open(source, 'rb') as fp:
+            digest.update(fp.read())
+    return digest.hexdigest()
+
+
+def specFileDigest(specFile, baseDigest):
+    """Return a hash of a spec file and of the other inputs to extracting
+    pages from it, from inputsDigest()."""
+    digest = hashlib.sha256()
+    for key in (baseDigest, os.path.abspath(specFile)):
+        digest.update(str(key).encode('utf-8') + b'\0')
+    try:
+        with open(specFile, 'rb') as fp:
+            digest.update(fp.read())
+    except OSError:
+        # genRef() reports the missing file
+        return None
+    return digest.hexdigest()
+
+
+def genRefEntry(specFile, baseDir):
+    """Extract reference pages from a spec file without writing them.
+
+    Returns a tuple of the manifest entry for the spec file and a list of
+    (page file name, contents) pairs of the extracted pages, for
+    applyEntry().
+
+    The entry is a dictionary of
+    - 'pages' - page name for each page and alias name found
+    - 'generated' - names of generated pages
+    - 'written' - content hash of each page file written
+    - 'log' - what was logged, from captureLogs()"""
+    global genDict, collectedPages
+
+    savedGenDict = genDict
+    genDict = {}
+    collectedPages = []
+    try:
+        with captureLogs() as logs:
+            pages = genRef(specFile, baseDir) or {}
+        texts = collectedPages
+        entry = {
+            'pages': {name: pi.name for name, pi in pages.items()},
+            'generated': list(genDict),
+            'written': {pageName: hashlib.sha256(text.encode('utf-8')).hexdigest()
+                        for pageName, text in texts},
+            'log': logs,
+        }
+    finally:
+        genDict = savedGenDict
+        collectedPages = None
+
+    return entry, texts
+
+
+def _genRefInWorker(task):
+    return genRefEntry(*task)
+
+
+def genRefEntries(tasks, jobs):
+    """Yield the results of genRefEntry() for each (specFile, baseDir)
+    task in order, computed in a pool of worker processes if jobs > 1."""
+    # Workers inherit the API map and conventions, which are set up when
+    # running as a script.
+    if jobs > 1 and len(tasks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context('fork').Pool(min(jobs, len(tasks))) as pool:
+            yield from pool.imap(_genRefInWorker, tasks)
+    else:
+        for task in tasks:
+            yield genRefEntry(*task)
+
+
+def entryIsCurrent(entry, digest):
+    """Return True if a manifest entry from the previous run can be reused
+    for a spec file with the given specFileDigest()."""
+    return (entry is not None and
+            digest is not None and
+            entry.get('digest') == digest and
+            not entry.get('shared') and
+            all(pageIsCurrent(pageName) and
+                previousPageRecords[pageName][0] == pageDigest
+                for pageName, pageDigest in entry['written'].items()))
+
+
+def applyEntry(entry, texts, pages):
+    """Replay the log of extracting pages from a spec file, and record its
+    pages for writePendingPages(), genDict, and pages.
+
+    - entry - manifest entry from genRefEntry() or the previous run
+    - texts - (page file name, contents) pairs of its pages, or None to
+      reuse the pages written by the previous run
+    - pages - dictionary of page names for each page and alias name"""
+    replayLogs(entry['log'])
+
+    if texts is None:
+        for pageName in entry['written']:
+            pageRecords[pageName] = previousPageRecords[pageName]
+            pageWriteCounts[pageName] = pageWriteCounts.get(pageName, 0) + 1
+    else:
+        for pageName, text in texts:
+            emitPageText(pageName, text)
+
+    genDict.update((name, None) for name in entry['generated'])
+    pages.update(entry['pages'])
+
+
+def genRefFiles(specFiles, baseDir, jobs, manifestFile):
+    """Extract reference pages from spec files, in a pool of worker
+    processes if jobs > 1.
+
+    Pages are generated, and messages logged, in spec file order, as if by
+    genRef(). With a manifest file from a previous run, spec files whose
+    contents and other inputs are unchanged are skipped, and their pages
+    and log are taken from the manifest.
+
+    - specFiles - filenames to extract from
+    - baseDir - output directory to generate pages in
+    - jobs - number of worker processes
+    - manifestFile - None, or manifest file name
+
+    Returns a tuple of the dictionary of page names for each page and
+    alias name, and the manifest entries for each spec file."""
+    baseDigest = inputsDigest(baseDir)
+    previousEntries = {}
+    if manifestFile is not None:
+        previousEntries = loadManifest(manifestFile)
+
+    digests = [specFileDigest(specFile, baseDigest) for specFile in specFiles]
+    current = [entryIsCurrent(previousEntries.get(specFile), digest)
+               for specFile, digest in zip(specFiles, digests)]
+    if manifestFile is not None:
+        logDiag('genRef: reusing pages of', sum(current), 'unchanged spec files')
+
+    results = genRefEntries([(specFile, baseDir)
+                             for specFile, isCurrent in zip(specFiles, current)
+                             if not isCurrent],
+                            jobs)
+
+    pages = {}
+    entries = {}
+    for specFile, digest, isCurrent in zip(specFiles, digests, current):
+        if isCurrent:
+            entry = previousEntries[specFile]
+            texts = None
+        else:
+            entry, texts = next(results)
+            entry['digest'] = digest
+        applyEntry(entry, texts, pages)
+        entries[specFile] = entry
+
+    return pages, entries
+
+
+def loadManifest(manifestFile):
+    """Load the manifest of a previous run, returning its entries for each
+    spec file, and setting previousPageRecords."""
+    global previousPageRecords
+
+    try:
+        with open(manifestFile, 'r', encoding='utf-8') as fp:
+            manifest = json.load(fp)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logWarn('genRef: ignoring unreadable manifest', manifestFile, ':', e)
+        return {}
+
+    if manifest.get('version') != GENREF_MANIFEST_VERSION:
+        return {}
+
+    previousPageRecords = manifest['pages']
+    return manifest['files']
+
+
+def saveManifest(manifestFile, entries):
+    """Save the manifest of this run.
+
+    The manifest is always rewritten, so that its timestamp can be used
+    as a stamp by the build.
+
+    - manifestFile - manifest file name
+    - entries - manifest entries for each spec file"""
+    # A page generated more than once is written with the contents from
+    # its last generator, so spec files generating such pages cannot be
+    # skipped: the pages they would write are not in the manifest.
+    for entry in entries.values():
+        entry['shared'] = any(pageWriteCounts[pageName] > 1
+                              for pageName in entry['written'])
+
+    manifest = {
+        'version': GENREF_MANIFEST_VERSION,
+        'pages': pageRecords,
+        'files': entries,
+    }
+
+    # An interrupted run does not leave a partial manifest.
+    writeFileAtomically(manifestFile,
+                        lambda fp: json.dump(manifest, fp, indent=1, sort_keys=True),
+                        mode='w', encoding='utf-8')
+
+
 def genSinglePageRef(baseDir):
     """Generate the single-page version of the ref pages.
 
@@ -815,7 +1145,7 @@ def genSinglePageRef(baseDir):
 
     # Write head and body to the output file
     pageName = f'{baseDir}/apispec{conventions.file_suffix}'
-    fp = open(pageName, 'w', encoding='utf-8')
+    fp = RefPageFile(pageName)
 
     print(head.getvalue(), file=fp, end='')
     print(body.getvalue(), file=fp, end='')
@@ -898,7 +1228,7 @@ def genExtension(baseDir, extpath, name, info):
     # Write the extension refpage
     pageName = f'{baseDir}/{name}{conventions.file_suffix}'
     logDiag('genExtension:', pageName)
-    fp = open(pageName, 'w', encoding='utf-8')
+    fp = RefPageFile(pageName)
 
     # OpenXR-specific
     ref_page_sections = OrderedDict()
@@ -970,12 +1300,22 @@ if __name__ == '__main__':
     parser.add_argument('-registry', action='store',
                         default=conventions.registry_path,
                         help='Use specified registry file instead of default')
+    parser.add_argument('-cachedir', action='store', default=None,
+                        help='Cache the parsed registry in the specified directory, and reuse it while the registry is unchanged')
     parser.add_argument('-extpath', action='store',
                         default=None,
                         help='Use extension descriptions from this directory instead of autogenerating extension refpages')
+    parser.add_argument('-jobs', action='store', type=int,
+                        default=1,
+                        help='Extract pages in this many worker processes, or one per CPU if 0 (default: 1)')
+    parser.add_argument('-manifest', action='store', default=None,
+                        help='Record extracted pages in the specified manifest file, and skip spec files unchanged since the run which wrote it')
 
     results = parser.parse_args()
 
+    if results.jobs < 1:
+        results.jobs = os.cpu_count() or 1
+
     # Load the generated apimap module
     sys.path.insert(0, results.genpath)
     import apimap as api
@@ -992,12 +1332,9 @@ if __name__ == '__main__':
     else:
         baseDir = results.baseDir
 
-    # Dictionary of pages & aliases
-    pages = {}
-
-    for file in results.files:
-        d = genRef(file, baseDir)
-        pages.update(d)
+    # Dictionary of page names for each page & alias
+    pages, entries = genRefFiles(results.files, baseDir, results.jobs,
+                                 results.manifest)
 
     # Now figure out which pages were not generated from the spec.
     # This relies on the dictionaries of API constructs in the api module.
@@ -1007,7 +1344,7 @@ if __name__ == '__main__':
         # registry.loadFile, even though it is irrelevant to our uses.
         genOpts = GeneratorOptions(apiname = conventions.xml_api_name)
         registry = Registry(genOpts = genOpts)
-        registry.loadFile(results.registry)
+        registry.loadFile(results.registry, cachedir=results.cachedir)
 
         if conventions.write_refpage_include:
             # Only extensions with a supported="..." attribute in this set
@@ -1070,13 +1407,18 @@ if __name__ == '__main__':
 
         genSinglePageRef(baseDir)
 
+    writePendingPages()
+    logDiag('genRef: wrote', pagesWritten, 'pages,', pagesUnchanged,
+            'pages unchanged')
+    if results.manifest is not None:
+        saveManifest(results.manifest, entries)
+
     if results.rewrite:
         # Generate Apache rewrite directives for refpage aliases
         fp = open(results.rewrite, 'w', encoding='utf-8')
 
         for page in sorted(pages):
-            p = pages[page]
-            rewrite = p.name
+            rewrite = pages[page]
 
             if page != rewrite:
                 print('RewriteRule ^', page, '.html$ ', rewrite, '.html',
@@ -1093,7 +1435,6 @@ if __name__ == '__main__':
         lastLetter = None
 
         for page in sorted(pages, key=str.upper):
-            p = pages[page]
             letter = page[0:1].upper()
 
             if letter != lastLetter:
@@ -1107,7 +1448,7 @@ if __name__ == '__main__':
                 lastLetter = letter
 
             # Add this page to the list
-            print(28 * ' ', '<li><a href="', p.name, '.html" ',
+            print(28 * ' ', '<li><a href="', pages[page], '.html" ',
                   'target="pagedisplay">', page, '</a></li>',
                   sep='', file=fp)
 
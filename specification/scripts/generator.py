@@ -171,6 +171,7 @@ class GeneratorOptions:
                  requireCommandAliases=False,
                  redefineEnumExtends=False,
                  requireDepends=True,
+                 writeIfChanged=False,
                 ):
         """Constructor.
 
@@ -217,6 +218,8 @@ class GeneratorOptions:
         as required dependencies.
         - requireDepends - whether to follow API dependencies when emitting
         APIs.
+        - writeIfChanged - if True, leave generated files untouched when
+        their contents would not change, preserving their timestamps.
 
         Default is
           - core API versions
@@ -330,6 +333,10 @@ class GeneratorOptions:
         self.requireDepends = requireDepends
         """True if dependencies of API tags are transitively required."""
 
+        self.writeIfChanged = writeIfChanged
+        """True if generated files whose contents are unchanged should not
+        be rewritten."""
+
     def emptyRegex(self, pat):
         """Substitute a regular expression which matches no version
         or extension names for None or the empty string."""
@@ -402,6 +409,16 @@ class OutputGenerator:
         # File suffix for generated files, set in beginFile below.
         self.file_suffix = ''
 
+        self.filesWritten = 0
+        """Number of generated files written by writeFileIfChanged()."""
+
+        self.filesUnchanged = 0
+        """Number of generated files left untouched by writeFileIfChanged()
+        because their contents were unchanged."""
+
+        self.filesRemoved = 0
+        """Number of stale generated files removed by IncludeWriter.finish()."""
+
     def logMsg(self, level, *args):
         """Write a message of different categories to different
         destinations.
@@ -891,6 +908,27 @@ class OutputGenerator:
                 os.makedirs(path)
             self.madeDirs[path] = None
 
+    def writeFileIfChanged(self, filename, contents):
+        """Write a generated file, unless it already has exactly the given
+        contents. Returns True if the file was written.
+
+        - filename - path of the file to write
+        - contents - string contents of the file"""
+        data = contents.encode('utf-8')
+        try:
+            with open(filename, 'rb') as fp:
+                unchanged = (fp.read() == data)
+        except OSError:
+            unchanged = False
+        if unchanged:
+            self.logMsg('diag', 'Not rewriting unchanged file', filename)
+            self.filesUnchanged += 1
+            return False
+        with open(filename, 'wb') as fp:
+            fp.write(data)
+        self.filesWritten += 1
+        return True
+
     def beginFile(self, genOpts):
         """Start a new interface file
 
@@ -918,8 +956,11 @@ class OutputGenerator:
 
         self.conventions = genOpts.conventions
 
-        # Open a temporary file for accumulating output.
-        if self.genOpts.filename is not None:
+        # Open a temporary file for accumulating output, or accumulate it
+        # in memory to compare against the existing file.
+        if self.genOpts.filename is not None and self.genOpts.writeIfChanged:
+            self.outFile = io.StringIO(newline='\n')
+        elif self.genOpts.filename is not None:
             self.outFile = tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', newline='\n', delete=False)
         else:
             self.outFile = sys.stdout
@@ -931,7 +972,18 @@ class OutputGenerator:
             self.warnFile.flush()
         if self.diagFile:
             self.diagFile.flush()
-        if self.outFile:
+        if isinstance(self.outFile, io.StringIO):
+            if self.genOpts is None:
+                raise MissingGeneratorOptionsError()
+
+            # On successfully generating output, write it to the target file
+            # if it differs from what is already there.
+            directory = Path(self.genOpts.directory)
+            if not Path.exists(directory):
+                os.makedirs(directory)
+            self.writeFileIfChanged(directory / self.genOpts.filename, self.outFile.getvalue())
+            self.outFile.close()
+        elif self.outFile:
             self.outFile.flush()
             if self.outFile != sys.stdout and self.outFile != sys.stderr:
                 self.outFile.close()
@@ -948,6 +1000,7 @@ class OutputGenerator:
                         os.makedirs(directory)
                 shutil.copy(self.outFile.name, directory / self.genOpts.filename)
                 os.remove(self.outFile.name)
+                self.filesWritten += 1
         self.genOpts = None
 
     def beginFeature(self, interface, emit):
@@ -1425,3 +1478,75 @@ class OutputGenerator:
 
     def setRegistry(self, registry):
         self.registry: Optional["Registry"] = registry
+
+
+class IncludeWriter:
+    """Batches the include files written by a generator that writes many of
+    them, such as one per API entity, besides its own output file.
+
+    The files are written by finish(), using writeFileIfChanged() so that
+    unchanged files keep their timestamps. The files written are listed in
+    a manifest, so that files written by an earlier run but not by this
+    one, such as the includes of entities since removed from the registry,
+    are deleted."""
+
+    def __init__(self, generator, directory, manifest):
+        """Constructor.
+
+        - generator - the OutputGenerator writing the files, which counts
+        the files written, unchanged and removed
+        - directory - directory holding the manifest, to which the names
+        listed in it are relative
+        - manifest - file name of the manifest"""
+        self.generator = generator
+        self.directory = Path(directory)
+        self.manifest = self.directory / manifest
+        self.files = {}
+
+    def write(self, filename, contents):
+        """Queue a file to be written by finish().
+
+        - filename - path of the file to write
+        - contents - string contents of the file"""
+        self.files[Path(filename)] = contents
+
+    def manifestEntry(self, filename):
+        """Return the name of a file as listed in the manifest."""
+        try:
+            return filename.relative_to(self.directory).as_posix()
+        except ValueError:
+            return str(filename)
+
+    def finish(self, stamp=None):
+        """Write the queued files whose contents changed, remove the stale
+        files, and update the manifest. Returns True if any file was
+        written or removed.
+
+        - stamp - if not None, path of a file to touch when any file was
+        written or removed, so that it is newer than all of them"""
+        written = self.generator.filesWritten
+        for filename, contents in self.files.items():
+            self.generator.writeFileIfChanged(filename, contents)
+        changed = (self.generator.filesWritten != written)
+
+        entries = sorted(self.manifestEntry(filename) for filename in self.files)
+        try:
+            with open(self.manifest, 'r', encoding='utf-8') as fp:
+                stale = set(fp.read().splitlines()) - set(entries)
+        except OSError:
+            stale = set()
+        for entry in sorted(stale):
+            filename = self.directory / entry
+            if filename.exists():
+                self.generator.logMsg('diag', 'Removing stale file', str(filename))
+                os.remove(filename)
+                self.generator.filesRemoved += 1
+                changed = True
+
+        self.generator.makeDir(self.directory)
+        self.generator.writeFileIfChanged(self.manifest, ''.join(f'{entry}\n' for entry in entries))
+        self.files = {}
+
+        if changed and stamp is not None:
+            Path(stamp).touch()
+        return changed
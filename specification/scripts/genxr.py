@@ -5,6 +5,8 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import argparse
+import copy
+import multiprocessing
 import os
 import pdb
 import re
@@ -15,7 +17,7 @@ import xml.etree.ElementTree as etree
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 from cgenerator import CGeneratorOptions, COutputGenerator
-from creflectiongenerator import CReflectionOutputGenerator
+from creflectiongenerator import CReflectionGeneratorOptions, CReflectionOutputGenerator
 from docgenerator import DocGeneratorOptions, DocOutputGenerator
 from interfacedocgenerator import InterfaceDocGenerator
 from extensionmetadocgenerator import (ExtensionMetaDocGeneratorOptions,
@@ -289,8 +291,14 @@ def makeGenOpts(args):
             aliasMacro        = 'XR_MAY_ALIAS')
     ]
 
+    # Compiled templates of the reflection headers are cached with the registry
+    templateCacheDir = None
+    if args.cachedir:
+        templateCacheDir = os.path.join(args.cachedir, 'jinja')
+
     def make_reflection_options(fn):
-        return CGeneratorOptions(
+        return CReflectionGeneratorOptions(
+            templateCacheDir=templateCacheDir,
             conventions=conventions,
             filename=fn,
             directory=directory,
@@ -507,6 +515,7 @@ def genTarget(args):
     if args.target in genOpts:
         createGenerator = genOpts[args.target][0]
         options = genOpts[args.target][1]
+        options.writeIfChanged = args.writeIfChanged
 
         if not args.quiet:
             write('* Building', options.filename, file=sys.stderr)
@@ -530,6 +539,151 @@ def genTarget(args):
         return None
 
 
+def targetArgs(args, target):
+    """Return a copy of the parsed arguments selecting a single target.
+
+    A directory component of target is taken relative to the -o directory,
+    so several targets with different output directories can be generated
+    by one invocation."""
+    targs = copy.copy(args)
+    targs.target = os.path.basename(target)
+    targs.directory = os.path.join(args.directory, os.path.dirname(target))
+    return targs
+
+
+def loadRegistry(args, gen, options):
+    """Create a Registry object with the specified generator and generator
+    options, and load the registry XML file into it.
+
+    The options are set before XML loading as they may affect it."""
+    reg = Registry(gen, options)
+
+    if args.cachedir:
+        # Load the registry from the cache, or parse and cache it
+        startTimer(args.time)
+        reg.loadFile(args.registry, cachedir=args.cachedir)
+        endTimer(args.time, '* Time to load registry =')
+    else:
+        # Parse the specified registry XML into an ElementTree object
+        startTimer(args.time)
+        tree = etree.parse(args.registry)
+        endTimer(args.time, '* Time to make ElementTree =')
+
+        # Load the XML tree into the registry object
+        startTimer(args.time)
+        reg.loadElementTree(tree)
+        endTimer(args.time, '* Time to parse ElementTree =')
+
+    if args.dump:
+        write('* Dumping registry to regdump.txt', file=sys.stderr)
+        reg.dumpReg(filehandle=open('regdump.txt', 'w', encoding='utf-8'))
+
+    return reg
+
+
+def genTargets(args, reg, targets):
+    """Generate each of the targets in turn from a single registry.
+
+    - reg - an already-loaded Registry, or None to load one for the first
+      target
+    - targets - list of target names, optionally with a directory
+
+    Returns the registry, so it can be reused for further targets."""
+    for target in targets:
+        targs = targetArgs(args, target)
+        os.makedirs(targs.directory, exist_ok=True)
+
+        # Create the API generator & generator options
+        (gen, options) = genTarget(targs)
+
+        if reg is None:
+            reg = loadRegistry(args, gen, options)
+        else:
+            reg.setTarget(gen, options)
+
+        # apimap.py is imported by beginFile, and may have just been
+        # regenerated by a previous target.
+        sys.modules.pop('apimap', None)
+
+        # Finally, use the output generator to create the requested target
+        if args.debug:
+            pdb.runcall(reg.apiGen)
+        else:
+            startTimer(args.time)
+            reg.apiGen()
+            endTimer(args.time, f"* Time to generate {options.filename} =")
+
+        if not args.quiet:
+            logDiag('* Generated', options.filename)
+            if args.writeIfChanged:
+                write(f'* {options.filename}: wrote {gen.filesWritten} files, skipped {gen.filesUnchanged} unchanged files, removed {gen.filesRemoved} stale files',
+                      file=sys.stderr)
+
+    return reg
+
+
+# Targets other targets depend on, generated before any others in a batch
+BATCH_FIRST_TARGETS = ('apimap.py',)
+
+# State of a worker process in a parallel batch
+batchArgs = None
+batchRegistry = None
+
+
+def initBatchWorker(args):
+    """Initialize a worker process for parallel batch generation."""
+    global batchArgs, errWarn, diag
+    batchArgs = args
+    if args.errfile:
+        errWarn = open(args.errfile, 'a', encoding='utf-8')
+    else:
+        errWarn = sys.stderr
+    if args.diagfile:
+        diag = open(args.diagfile, 'a', encoding='utf-8')
+    else:
+        diag = None
+
+
+def genBatchTarget(target):
+    """Generate a single target in a worker process.
+
+    Forked workers inherit the registry already loaded by the parent
+    process; otherwise each worker loads it once, for its first target."""
+    global batchRegistry
+    batchRegistry = genTargets(batchArgs, batchRegistry, [target])
+    return target
+
+
+def genBatch(args, targets):
+    """Generate several targets from one parse of the registry, optionally
+    fanning them out over args.jobs worker processes."""
+    first = [t for t in targets if os.path.basename(t) in BATCH_FIRST_TARGETS]
+    rest = [t for t in targets if t not in first]
+
+    if args.jobs <= 1 or len(rest) <= 1:
+        genTargets(args, None, first + rest)
+        return
+
+    # Load the registry in this process, so forked workers start from it
+    global batchRegistry
+    batchRegistry = genTargets(args, None, first or rest[:1])
+    if not first:
+        rest = rest[1:]
+
+    errWarn.flush()
+    if diag:
+        diag.flush()
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(min(args.jobs, len(rest)),
+                      initializer=initBatchWorker,
+                      initargs=(args,)) as pool:
+        pool.map(genBatchTarget, rest, chunksize=1)
+
+
 # -feature name
 # -extension name
 # For both, "name" may be a single name, or a space-separated list
@@ -578,13 +732,19 @@ if __name__ == '__main__':
                         help='Use specified registry file instead of xr.xml')
     parser.add_argument('-time', action='store_true',
                         help='Enable timing')
+    parser.add_argument('-writeIfChanged', action='store_true',
+                        help='Do not rewrite generated files whose contents are unchanged')
+    parser.add_argument('-cachedir', action='store', default=None,
+                        help='Cache the parsed registry and compiled templates in the specified directory, and reuse them while unchanged')
     parser.add_argument('-genpath', action='store', default='generated',
                         help='Path to generated files')
     parser.add_argument('-o', action='store', dest='directory',
                         default='.',
                         help='Create target and related files in specified directory')
-    parser.add_argument('target', metavar='target', nargs='?',
-                        help='Specify target')
+    parser.add_argument('targets', metavar='target', nargs='*',
+                        help='Specify target, or several targets to generate from a single parse of the registry. A target may include a directory relative to -o')
+    parser.add_argument('-jobs', action='store', type=int, default=1,
+                        help='Number of worker processes used to generate several targets')
     parser.add_argument('-quiet', action='store_true', default=False,
                         help='Suppress script output during normal execution.')
     parser.add_argument('-verbose', action='store_false', dest='quiet', default=True,
@@ -611,34 +771,8 @@ if __name__ == '__main__':
         # Log diagnostics and warnings
         setLogFile(setDiag = True, setWarn = True, filename = '-')
 
-    # Create the API generator & generator options
-    (gen, options) = genTarget(args)
-
-    # Create the registry object with the specified generator and generator
-    # options. The options are set before XML loading as they may affect it.
-    reg = Registry(gen, options)
-
-    # Parse the specified registry XML into an ElementTree object
-    startTimer(args.time)
-    tree = etree.parse(args.registry)
-    endTimer(args.time, '* Time to make ElementTree =')
-
-    # Load the XML tree into the registry object
-    startTimer(args.time)
-    reg.loadElementTree(tree)
-    endTimer(args.time, '* Time to parse ElementTree =')
-
-    if args.dump:
-        write('* Dumping registry to regdump.txt', file=sys.stderr)
-        reg.dumpReg(filehandle=open('regdump.txt', 'w', encoding='utf-8'))
-
-    # Finally, use the output generator to create the requested target
-    if args.debug:
-        pdb.run('reg.apiGen()')
-    else:
-        startTimer(args.time)
-        reg.apiGen()
-        endTimer(args.time, f"* Time to generate {options.filename} =")
+    if not args.targets:
+        write('No target specified', file=sys.stderr)
+        sys.exit(1)
 
-    if not args.quiet:
-        logDiag('* Generated', options.filename)
+    genBatch(args, args.targets)
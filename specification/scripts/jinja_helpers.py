@@ -7,11 +7,28 @@
 
 """Provides functionality to use Jinja2 when generating C/C++ code, while eliminating the need to import Jinja2 from any other file."""
 
+import hashlib
 import re
 from pathlib import Path
 
+from spec_tools.cache_file import saveCacheFile
+
 _ADDED_TO_PATH = False
 
+# Options of every environment made by make_jinja_environment(), apart from the loader.
+_ENVIRONMENT_OPTIONS = dict(keep_trailing_newline=True,
+                            trim_blocks=True,
+                            block_start_string="/*%",
+                            block_end_string="%*/",
+                            variable_start_string="/*{",
+                            variable_end_string="}*/",
+                            line_statement_prefix="//#",
+                            line_comment_prefix="//##",
+                            autoescape=False)
+
+# Environments returned by get_jinja_environment(), by arguments.
+_SHARED_ENVIRONMENTS = {}
+
 
 def _add_to_path():
     global _ADDED_TO_PATH
@@ -64,7 +81,36 @@ def _remove_prefix(s: str, prefix: str):
     return s
 
 
-def make_jinja_environment(file_with_templates_as_sibs=None, search_path=None):
+def _bytecode_cache_subdir():
+    """Return the name of the bytecode cache subdirectory for this Jinja2 version and these environment options.
+
+    Jinja2 itself only checks the template source, so bytecode compiled by another Jinja2 version, or with other
+    delimiters, must be kept apart.
+    """
+    import jinja2
+    digest = hashlib.sha256(repr(sorted(_ENVIRONMENT_OPTIONS.items())).encode('utf-8')).hexdigest()
+    return f"jinja2-{jinja2.__version__}-{digest[:16]}"
+
+
+def _make_bytecode_cache(directory):
+    """Return a Jinja2 FileSystemBytecodeCache for directory that writes each cache file atomically.
+
+    Jinja2 writes cache files in place, so generators running in parallel, as with genxr -jobs, could read a
+    half-written one. The file is written to a temporary name and renamed into place instead.
+    """
+    from jinja2 import FileSystemBytecodeCache
+
+    class AtomicFileSystemBytecodeCache(FileSystemBytecodeCache):
+        def dump_bytecode(self, bucket):
+            # The cache is only an optimization: if it cannot be written, the
+            # template is compiled again next time, so failures are not reported.
+            saveCacheFile(self._get_cache_filename(bucket), bucket.write_bytecode,
+                          lambda message: None, 'template cache')
+
+    return AtomicFileSystemBytecodeCache(directory)
+
+
+def make_jinja_environment(file_with_templates_as_sibs=None, search_path=None, cache_dir=None):
     """Create a Jinja2 environment customized to generate C/C++ headers/code for Khronos APIs.
 
     Delimiters have been changed from Jinja2 defaults to permit better interoperability with
@@ -83,6 +129,8 @@ def make_jinja_environment(file_with_templates_as_sibs=None, search_path=None):
     - the loader is a file system loader, building a search path from file_with_templates_as_sibs
       (if your template is a sibling of your source file, just pass file_with_templates_as_sibs=__file__),
       and search_path (an iterable if you want more control)
+    - if cache_dir is given, compiled templates are cached in a subdirectory of it, named for the Jinja2
+      version and the options above, and reused while the template source is unchanged
 
     Provided filters:
 
@@ -103,22 +151,21 @@ def make_jinja_environment(file_with_templates_as_sibs=None, search_path=None):
     _add_to_path()
     from jinja2 import Environment, FileSystemLoader
 
+    bytecode_cache = None
+    if cache_dir:
+        bytecode_dir = Path(cache_dir) / _bytecode_cache_subdir()
+        bytecode_dir.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = _make_bytecode_cache(str(bytecode_dir))
+
     search_paths = []
     if file_with_templates_as_sibs:
         search_paths.append(
             str(Path(file_with_templates_as_sibs).parent))
     if search_path:
         search_paths.extend(search_path)
-    env = Environment(keep_trailing_newline=True,
-                      trim_blocks=True,
-                      block_start_string="/*%",
-                      block_end_string="%*/",
-                      variable_start_string="/*{",
-                      variable_end_string="}*/",
-                      line_statement_prefix="//#",
-                      line_comment_prefix="//##",
-                      autoescape=False,
-                      loader=FileSystemLoader(search_paths))
+    env = Environment(loader=FileSystemLoader(search_paths),
+                      bytecode_cache=bytecode_cache,
+                      **_ENVIRONMENT_OPTIONS)
     env.filters['quote_string'] = _quote_string
     env.filters['undecorate'] = _undecorate
     env.filters['base_name'] = _base_name
@@ -130,6 +177,24 @@ def make_jinja_environment(file_with_templates_as_sibs=None, search_path=None):
     return env
 
 
+def get_jinja_environment(file_with_templates_as_sibs=None, search_path=None, cache_dir=None):
+    """Return an environment made by make_jinja_environment() with the same arguments, shared with earlier callers.
+
+    Templates are loaded and compiled once per environment, so several files rendered in one process, such as the
+    reflection headers generated by one genxr invocation, only compile the templates they have in common once.
+    """
+    if file_with_templates_as_sibs:
+        file_with_templates_as_sibs = str(Path(file_with_templates_as_sibs).resolve())
+    key = (file_with_templates_as_sibs,
+           tuple(search_path) if search_path else None,
+           str(cache_dir) if cache_dir else None)
+    env = _SHARED_ENVIRONMENTS.get(key)
+    if env is None:
+        env = make_jinja_environment(file_with_templates_as_sibs, search_path, cache_dir)
+        _SHARED_ENVIRONMENTS[key] = env
+    return env
+
+
 class JinjaTemplate:
     def __init__(self, env, fn):
         """Load and parse a Jinja2 template given a Jinja2 environment and the template file name.
@@ -12,6 +12,13 @@
 # returning a boolean result. isSupported takes an extension or version name
 # string and returns a boolean.
 #
+# evaluateDependencies(dependencies, isSupported) evaluates several
+# expressions against the same isSupported, returning a list of results.
+#
+# Each distinct expression is parsed once, by parseDependency(), into an
+# immutable tree which is cached and shared by all of these functions.
+# Evaluation uses no global state, so it is reentrant and thread-safe.
+#
 # dependencyLanguage(dependency) returns an English string equivalent
 # to the expression, suitable for header file comments.
 #
@@ -64,9 +71,11 @@ from pyparsing import (
     delimitedList,
     infixNotation,
 )
+import functools
 import math
 import operator
 import re
+import threading
 
 from apiconventions import APIConventions as APIConventions
 conventions = APIConventions()
@@ -115,15 +124,16 @@ def opMarkupC(op):
     return opMarkupCMap[op]
 
 
-# Unfortunately global to be used in pyparsing
-exprStack = []
+# Postfix stack of the expression being parsed, per thread, since it is
+# filled in by pyparsing parse actions
+_parseState = threading.local()
 
 def push_first(toks):
-    """Push a token on the global stack
+    """Push a token on the stack of the expression being parsed
 
        - toks - first element is the token to push"""
 
-    exprStack.append(toks[0])
+    _parseState.exprStack.append(toks[0])
 
 # An identifier (version or extension name)
 dependencyIdent = Word(f"{alphanums}_")
@@ -152,7 +162,8 @@ def dependencyBNF():
         atom = (
             boolop[...]
             + (
-                (dependencyIdent).setParseAction(push_first)
+                # Copied so that parsing dependencyExpr does not push
+                dependencyIdent.copy().setParseAction(push_first)
                 | Group(lpar + expr + rpar)
             )
         )
@@ -168,26 +179,61 @@ _opn = {
     ',': operator.or_,
 }
 
-def evaluateStack(stack, isSupported):
-    """Evaluate an expression stack, returning a boolean result.
+# Maximum number of distinct parsed expressions kept by parseDependency.
+# The XML registry has far fewer distinct 'depends' expressions.
+DEPENDENCY_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize = DEPENDENCY_CACHE_SIZE)
+def parseDependency(dependency):
+    """Parse a dependency expression into a tree, which is cached.
 
-     - stack - the stack
+     The tree is immutable, so it may be shared: a leaf is a version or
+     extension name string, and an operation is a tuple (op, lhs, rhs) of
+     the operator ('+' or ',') and its operand trees.
+
+     - dependency - the expression"""
+
+    stack = _parseState.exprStack = []
+    try:
+        dependencyBNF().parseString(dependency, parseAll=True)
+    finally:
+        _parseState.exprStack = None
+
+    # Note: operands are pushed onto the stack before their operator
+    trees = []
+    for op in stack:
+        if op in '+,':
+            rhs = trees.pop()
+            lhs = trees.pop()
+            trees.append((op, lhs, rhs))
+        else:
+            trees.append(op)
+    tree = trees[-1]
+
+    # Report the first invalid name in evaluation order, right to left
+    names = [tree]
+    while names:
+        name = names.pop()
+        if isinstance(name, tuple):
+            names.extend(name[1:])
+        elif not name[0].isalpha():
+            raise Exception(f'invalid op: {name}')
+    return tree
+
+def evalDependencyTree(tree, isSupported):
+    """Evaluate a dependency expression tree, returning a boolean result.
+
+     - tree - the tree, from parseDependency
      - isSupported - function taking a version or extension name string and
        returning True or False if that name is supported or not."""
 
-    op, num_args = stack.pop(), 0
-    if isinstance(op, tuple):
-        op, num_args = op
-
-    if op in '+,':
-        # Note: operands are pushed onto the stack in reverse order
-        op2 = evaluateStack(stack, isSupported)
-        op1 = evaluateStack(stack, isSupported)
-        return _opn[op](op1, op2)
-    elif op[0].isalpha():
-        return isSupported(op)
-    else:
-        raise Exception(f'invalid op: {op}')
+    if isinstance(tree, str):
+        return isSupported(tree)
+
+    op, lhs, rhs = tree
+    op2 = evalDependencyTree(rhs, isSupported)
+    op1 = evalDependencyTree(lhs, isSupported)
+    return _opn[op](op1, op2)
 
 def evaluateDependency(dependency, isSupported):
     """Evaluate a dependency expression, returning a boolean result.
@@ -196,37 +242,48 @@ def evaluateDependency(dependency, isSupported):
      - isSupported - function taking a version or extension name string and
        returning True or False if that name is supported or not."""
 
-    global exprStack
-    exprStack = []
-    results = dependencyBNF().parseString(dependency, parseAll=True)
-    val = evaluateStack(exprStack[:], isSupported)
-    return val
+    return evalDependencyTree(parseDependency(dependency), isSupported)
 
-def evalDependencyLanguage(stack, leafMarkup, opMarkup, parenthesize, root):
-    """Evaluate an expression stack, returning an English equivalent
+def evaluateDependencies(dependencies, isSupported):
+    """Evaluate dependency expressions against the same set of supported
+       versions and extensions, returning a list of boolean results.
 
-     - stack - the stack
+     - dependencies - iterable of expressions
+     - isSupported - function taking a version or extension name string and
+       returning True or False if that name is supported or not. It is
+       called at most once for each name."""
+
+    supported = {}
+    def isSupportedOnce(name):
+        if name not in supported:
+            supported[name] = isSupported(name)
+        return supported[name]
+
+    return [evalDependencyTree(parseDependency(dependency), isSupportedOnce)
+            for dependency in dependencies]
+
+def evalDependencyLanguage(tree, leafMarkup, opMarkup, parenthesize, root):
+    """Evaluate an expression tree, returning an English equivalent
+
+     - tree - the tree, from parseDependency
      - leafMarkup, opMarkup, parenthesize - same as dependencyLanguage
      - root - True only if this is the outer (root) expression level"""
 
-    op, num_args = stack.pop(), 0
-    if isinstance(op, tuple):
-        op, num_args = op
-    if op in '+,':
-        # Could parenthesize, not needed yet
-        rhs = evalDependencyLanguage(stack, leafMarkup, opMarkup, parenthesize, root = False)
-        opname = opMarkup(op)
-        lhs = evalDependencyLanguage(stack, leafMarkup, opMarkup, parenthesize, root = False)
-        if parenthesize and not root:
-            return f'({lhs} {opname} {rhs})'
-        else:
-            return f'{lhs} {opname} {rhs}'
-    elif op[0].isalpha():
+    if isinstance(tree, str):
         # This is an extension or feature name
-        return leafMarkup(op)
+        return leafMarkup(tree)
+
+    op, lhs, rhs = tree
+    # Could parenthesize, not needed yet
+    rhs = evalDependencyLanguage(rhs, leafMarkup, opMarkup, parenthesize, root = False)
+    opname = opMarkup(op)
+    lhs = evalDependencyLanguage(lhs, leafMarkup, opMarkup, parenthesize, root = False)
+    if parenthesize and not root:
+        return f'({lhs} {opname} {rhs})'
     else:
-        raise Exception(f'invalid op: {op}')
+        return f'{lhs} {opname} {rhs}'
 
+@functools.lru_cache(maxsize = DEPENDENCY_CACHE_SIZE)
 def dependencyLanguage(dependency, leafMarkup, opMarkup, parenthesize):
     """Return an API dependency expression translated to a form suitable for
        asciidoctor conditionals or header file comments.
@@ -239,10 +296,7 @@ def dependencyLanguage(dependency, leafMarkup, opMarkup, parenthesize):
      - parenthesize - True if parentheses should be used in the resulting
                       expression, False otherwise"""
 
-    global exprStack
-    exprStack = []
-    results = dependencyBNF().parseString(dependency, parseAll=True)
-    return evalDependencyLanguage(exprStack, leafMarkup, opMarkup, parenthesize, root = True)
+    return evalDependencyLanguage(parseDependency(dependency), leafMarkup, opMarkup, parenthesize, root = True)
 
 # aka specmacros = False
 def dependencyLanguageComment(dependency):
@@ -263,22 +317,22 @@ def dependencyLanguageC(dependency):
        use in C expressions"""
     return dependencyLanguage(dependency, leafMarkup = leafMarkupC, opMarkup = opMarkupC, parenthesize = True)
 
-def evalDependencyNames(stack):
-    """Evaluate an expression stack, returning the set of extension and
+def evalDependencyNames(tree):
+    """Evaluate an expression tree, returning the set of extension and
        feature names used in the expression.
 
-     - stack - the stack"""
+     - tree - the tree, from parseDependency"""
 
-    op, num_args = stack.pop(), 0
-    if isinstance(op, tuple):
-        op, num_args = op
-    if op in '+,':
-        # Do not evaluate the operation. We only care about the names.
-        return evalDependencyNames(stack) | evalDependencyNames(stack)
-    elif op[0].isalpha():
-        return { op }
-    else:
-        raise Exception(f'invalid op: {op}')
+    if isinstance(tree, str):
+        return { tree }
+
+    # Do not evaluate the operation. We only care about the names.
+    op, lhs, rhs = tree
+    return evalDependencyNames(rhs) | evalDependencyNames(lhs)
+
+@functools.lru_cache(maxsize = DEPENDENCY_CACHE_SIZE)
+def _dependencyNames(dependency):
+    return frozenset(evalDependencyNames(parseDependency(dependency)))
 
 def dependencyNames(dependency):
     """Return a set of the extension and version names in an API dependency
@@ -287,11 +341,8 @@ def dependencyNames(dependency):
 
      - dependency - the expression"""
 
-    global exprStack
-    exprStack = []
-    results = dependencyBNF().parseString(dependency, parseAll=True)
-    # print(f'names(): stack = {exprStack}')
-    return evalDependencyNames(exprStack)
+    # Return a new set, which the caller may modify
+    return set(_dependencyNames(dependency))
 
 def markupTraverse(expr, level = 0, root = True):
     """Recursively process a dependency in infix form, transforming it into
@@ -324,6 +375,7 @@ def markupTraverse(expr, level = 0, root = True):
 
     return str
 
+@functools.lru_cache(maxsize = DEPENDENCY_CACHE_SIZE)
 def dependencyMarkup(dependency):
     """Return asciidoctor markup for a human-readable equivalent of an API
        dependency expression, suitable for use in extension appendix
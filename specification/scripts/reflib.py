@@ -6,6 +6,7 @@
 
 # Utility functions for automatic ref page generation and other script stuff
 
+import contextlib
 import io
 import re
 import sys
@@ -102,6 +103,38 @@ def logErr(*args, **kwargs):
         file.write(strfile.getvalue())
     raise UserWarning(strfile.getvalue())
 
+@contextlib.contextmanager
+def captureLogs():
+    """Capture the diagnostics and warnings logged within a with block.
+
+    Yields a list, which is filled on exit with (name, text) pairs of the
+    log file variable ('diagFile' or 'warnFile') and the text logged to it.
+    Pass the list to replayLogs() to write the text to the log files, for
+    example after logging in a worker process."""
+    global diagFile, warnFile
+
+    savedFiles = (diagFile, warnFile)
+    buffers = {}
+    for name, fp in zip(('diagFile', 'warnFile'), savedFiles):
+        if fp is not None and id(fp) not in buffers:
+            buffers[id(fp)] = (name, io.StringIO())
+    diagFile, warnFile = (None if fp is None else buffers[id(fp)][1]
+                          for fp in savedFiles)
+
+    logs = []
+    try:
+        yield logs
+    finally:
+        diagFile, warnFile = savedFiles
+        logs.extend((name, buf.getvalue()) for name, buf in buffers.values())
+
+def replayLogs(logs):
+    """Write logs captured by captureLogs() to the current log files."""
+    for name, text in logs:
+        fp = globals()[name]
+        if fp is not None and text:
+            fp.write(text)
+
 def isempty(s):
     """Return True if s is nothing but white space, False otherwise"""
     return len(''.join(s.split())) == 0
@@ -13,7 +13,7 @@ somewhat limited.
 
 Also used to insert identifying tags on explicit Valid Usage statements.
 
-Usage: `reflow.py [-noflow] [-tagvu] [-nextvu #] [-overwrite] [-out dir] [-suffix str] files`
+Usage: `reflow.py [-noflow] [-tagvu] [-nextvu #] [-overwrite] [-out dir] [-suffix str] [-jobs #] files`
 
 - `-noflow` acts as a passthrough, instead of reflowing text. Other
   processing may occur.
@@ -29,14 +29,21 @@ Usage: `reflow.py [-noflow] [-tagvu] [-nextvu #] [-overwrite] [-out dir] [-suffi
   scripts enforcing the checks.
 - `-out` specifies directory to create output file in, default 'out'
 - `-suffix` specifies suffix to add to output files, default ''
+- `-jobs #` reflows files in # worker processes, or one per CPU if 0.
+  The output, including VUID tags, is the same as reflowing them one at
+  a time.
+- Output files which already contain the reflowed text are not rewritten.
 - `files` are asciidoc source files from the spec to reflow.
 """
 # For error and file-loading interfaces only
 import argparse
+import io
+import multiprocessing
 import os
 import re
 import sys
-from reflib import loadFile, logDiag, logWarn, logErr, setLogFile, getBranch
+from reflib import (captureLogs, loadFile, logDiag, logWarn, logErr,
+                    replayLogs, setLogFile, getBranch)
 from pathlib import Path
 
 # Vulkan-specific - will consolidate into scripts/ like OpenXR soon
@@ -584,44 +591,65 @@ def apiMatch(oldname, newname):
     upper = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
     return oldname.rstrip(upper) == newname.rstrip(upper)
 
-def reflowFile(filename, args):
-    logDiag('reflow: filename', filename)
-
-    lines, newline_string = loadFile(filename)
-    if lines is None:
-        return
-
-    # Output file handle and reflow object for this file. There are no race
-    # conditions on overwriting the input, but it is not recommended unless
-    # you have backing store such as git.
-
+def reflowOutputFilename(filename, args):
+    """Return the name of the file the reflowed text of filename is written to."""
+    # There are no race conditions on overwriting the input, but it is not
+    # recommended unless you have backing store such as git.
     if args.overwrite:
-        outFilename = filename
-    else:
-        outDir = Path(args.outDir).resolve()
-        # TOCTOU-safe directory creation
-        try:
-            outDir.mkdir()
-        except FileExistsError:
-            pass
-
-        outFilename = str(outDir / (os.path.basename(filename) + args.suffix))
-
-    if args.nowrite:
-        fp = None
-    else:
-        try:
-            fp = open(outFilename, 'w', encoding='utf8', newline=newline_string)
-        except:
-            logWarn('Cannot open output file', outFilename, ':', sys.exc_info()[0])
-            return
-
+        return filename
+
+    outDir = Path(args.outDir).resolve()
+    # TOCTOU-safe directory creation
+    try:
+        outDir.mkdir()
+    except FileExistsError:
+        pass
+
+    return str(outDir / (os.path.basename(filename) + args.suffix))
+
+def writeReflowedFile(outFilename, text, newline_string):
+    """Write reflowed text to outFilename, unless it already contains that text.
+
+    Leaving unchanged files alone preserves their timestamps, so build
+    steps depending on them are not rerun needlessly.
+    Returns False if the file could not be written."""
+    contents = text.replace('\n', newline_string).encode('utf8')
+    try:
+        with open(outFilename, 'rb') as fp:
+            if fp.read() == contents:
+                logDiag('reflow: unchanged', outFilename)
+                return True
+    except OSError:
+        pass
+
+    try:
+        with open(outFilename, 'wb') as fp:
+            fp.write(contents)
+    except:
+        logWarn('Cannot open output file', outFilename, ':', sys.exc_info()[0])
+        return False
+    return True
+
+def reflowLines(filename, lines, args, nextvu, maxvu):
+    """Reflow the lines of a file, without writing them anywhere.
+
+    - filename - name of the file the lines were loaded from
+    - lines - list of lines in the file
+    - args - script arguments
+    - nextvu, maxvu - first and maximum VUID to tag Valid Usage statements
+      with, or None if no tagging should be done
+
+    Returns a tuple of the reflowed text (None if args.nowrite), the next
+    free VUID, a list of (vuid, [filename, line]) for each VUID found, and
+    the number of markup check warnings."""
     state = ReflowState(filename,
                         margin = args.margin,
-                        file = fp,
+                        file = None if args.nowrite else io.StringIO(),
                         reflow = not args.noflow,
-                        nextvu = args.nextvu,
-                        maxvu = args.maxvu)
+                        nextvu = nextvu,
+                        maxvu = maxvu)
+    vuids = []
+    warnCount = 0
 
     for line in lines:
         state.incrLineNumber()
@@ -631,12 +659,9 @@ def reflowFile(filename, args):
 
         matches = vuidPat.search(line)
         if matches is not None:
-            # If we found a VUID pattern, add the (filename,line) it was
-            # found at to a list for that VUID, to find duplicates.
-            vuid = matches.group('vuid')
-            if vuid not in args.vuidDict:
-                args.vuidDict[vuid] = []
-            args.vuidDict[vuid].append([filename, line])
+            # If we found a VUID pattern, record the (filename,line) it was
+            # found at, to find duplicates.
+            vuids.append((matches.group('vuid'), [filename, line]))
 
         # The logic here is broken. If we are in a non-reflowable block and
         # this line *does not* end the block, it should always be
@@ -724,7 +749,7 @@ def reflowFile(filename, args):
                 logWarn('Detected embedded Valid Usage conditional:',
                         f'{filename}:{state.lineNumber - 1}')
                 # Keep track of warning check count
-                args.warnCount = args.warnCount + 1
+                warnCount = warnCount + 1
 
         state.lastTitle = thisTitle
 
@@ -737,28 +762,152 @@ def reflowFile(filename, args):
                 'mismatched asciidoc block delimiters at EOF:',
                 state.blockStack[-1])
 
-    if fp is not None:
-        fp.close()
+    text = None if state.file is None else state.file.getvalue()
+    return text, state.nextvu, vuids, warnCount
+
+def addReflowResults(filename, nextvu, vuids, warnCount, args):
+    """Record the results of reflowing a file in args."""
+    for vuid, found in vuids:
+        if vuid not in args.vuidDict:
+            args.vuidDict[vuid] = []
+        args.vuidDict[vuid].append(found)
+
+    args.warnCount = args.warnCount + warnCount
 
     # Update the 'nextvu' value
-    if args.nextvu != state.nextvu:
-        logWarn('Updated nextvu to', state.nextvu, 'after file', filename)
-        args.nextvu = state.nextvu
+    if args.nextvu != nextvu:
+        logWarn('Updated nextvu to', nextvu, 'after file', filename)
+        args.nextvu = nextvu
 
-def reflowAllAdocFiles(folder_to_reflow, args):
-    for root, subdirs, files in os.walk(folder_to_reflow):
-        for file in files:
-            if file.endswith(conventions.file_suffix):
-                file_path = os.path.join(root, file)
-                reflowFile(file_path, args)
-        for subdir in subdirs:
-            sub_folder = os.path.join(root, subdir)
-            print(f'Sub-folder = {sub_folder}')
-            if subdir.lower() not in conventions.spec_no_reflow_dirs:
-                print(f'   Parsing = {sub_folder}')
-                reflowAllAdocFiles(sub_folder, args)
+def reflowFile(filename, args):
+    logDiag('reflow: filename', filename)
+
+    lines, newline_string = loadFile(filename)
+    if lines is None:
+        return
+
+    outFilename = reflowOutputFilename(filename, args)
+    text, nextvu, vuids, warnCount = reflowLines(filename, lines, args,
+                                                 args.nextvu, args.maxvu)
+    if text is not None and not writeReflowedFile(outFilename, text, newline_string):
+        return
+
+    addReflowResults(filename, nextvu, vuids, warnCount, args)
+
+# Script arguments in a worker process of reflowFilesParallel
+_workerArgs = None
+
+def _initWorker(args):
+    global _workerArgs
+    _workerArgs = args
+
+def _reflowInWorker(task):
+    """Reflow a file in a worker process of reflowFilesParallel.
+
+    task is a tuple (filename, nextvu, maxvu, final). Unless final is True,
+    the reflowed text is only written if no VUIDs were tagged, since the
+    parent process may have to renumber them.
+
+    Returns a tuple of the reflowed text's results (None if the file could
+    not be reflowed) and what was logged, from captureLogs()."""
+    filename, nextvu, maxvu, final = task
+    args = _workerArgs
+
+    # Capture the log, for the parent to replay in file order
+    result = None
+    with captureLogs() as logs:
+        logDiag('reflow: filename', filename)
+
+        lines, newline_string = loadFile(filename)
+        if lines is not None:
+            outFilename = reflowOutputFilename(filename, args)
+            text, newnextvu, vuids, warnCount = reflowLines(filename, lines, args,
+                                                            nextvu, maxvu)
+            if (text is None or (not final and newnextvu != nextvu) or
+                    writeReflowedFile(outFilename, text, newline_string)):
+                result = (newnextvu, vuids, warnCount)
+
+    return result, logs
+
+def reflowFilesParallel(events, args):
+    """Reflow files in a pool of args.jobs worker processes.
+
+    - events - sequence of ('print', message) and ('file', filename) pairs,
+      processed in order as if by print() and reflowFile()
+    - args - script arguments
+
+    Output files, logs, and VUID tags are the same as if the files were
+    reflowed one at a time. VUIDs are numbered in file order: each file is
+    first reflowed counting the Valid Usage statements it would tag, then
+    files with any are reflowed again, starting from the VUID that follows
+    those tagged in preceding files."""
+    events = list(events)
+    filenames = [value for kind, value in events if kind == 'file']
+    firstvu = args.nextvu
+    # Count, rather than assign, VUIDs in the first pass
+    countvu = None if firstvu is None else sys.maxsize
+
+    with multiprocessing.Pool(args.jobs, _initWorker, (args,)) as pool:
+        results = pool.map(_reflowInWorker,
+                           [(filename, firstvu, countvu, False) for filename in filenames],
+                           chunksize=1)
+
+        # Allocate VUIDs in file order and reflow the files tagging them
+        nextvu = firstvu
+        for index, (filename, (result, logs)) in enumerate(zip(filenames, results)):
+            if result is not None and result[0] != firstvu:
+                count = result[0] - firstvu
+                task = (filename, nextvu, args.maxvu, True)
+                results[index] = pool.apply_async(_reflowInWorker, (task,))
+                nextvu = nextvu + max(0, min(count, args.maxvu - nextvu + 1))
+
+        results = iter(results)
+        for kind, value in events:
+            if kind == 'print':
+                print(value)
+                continue
+
+            result = next(results)
+            if isinstance(result, tuple):
+                # Reflowed in the first pass, without tagging VUIDs
+                result, logs = result
+                if result is not None:
+                    result = (args.nextvu,) + result[1:]
             else:
-                print(f'   Skipping = {sub_folder}')
+                result, logs = result.get()
+            replayLogs(logs)
+            if result is not None:
+                addReflowResults(value, *result, args)
+
+def adocFileEvents(folder_to_reflow):
+    """Yield ('print', message) and ('file', filename) pairs for reflowing a folder.
+
+    Files in a folder come before its sub-folders, and folders in
+    conventions.spec_no_reflow_dirs are skipped."""
+    root, subdirs, files = next(os.walk(folder_to_reflow))
+    for file in files:
+        if file.endswith(conventions.file_suffix):
+            yield ('file', os.path.join(root, file))
+    for subdir in subdirs:
+        sub_folder = os.path.join(root, subdir)
+        yield ('print', f'Sub-folder = {sub_folder}')
+        if subdir.lower() not in conventions.spec_no_reflow_dirs:
+            yield ('print', f'   Parsing = {sub_folder}')
+            yield from adocFileEvents(sub_folder)
+        else:
+            yield ('print', f'   Skipping = {sub_folder}')
+
+def reflowAllAdocFiles(folder_to_reflow, args):
+    events = adocFileEvents(folder_to_reflow)
+    if args.jobs > 1:
+        reflowFilesParallel(events, args)
+        return
+
+    for kind, value in events:
+        if kind == 'print':
+            print(value)
+        else:
+            reflowFile(value, args)
 
 # Patterns used to recognize interesting lines in an asciidoc source file.
 # These patterns are only compiled once.
@@ -813,12 +962,18 @@ if __name__ == '__main__':
     parser.add_argument('-suffix', action='store', dest='suffix',
                         default='',
                         help='Set the suffix added to updated file names (default: none)')
+    parser.add_argument('-jobs', action='store', dest='jobs', type=int,
+                        default=1,
+                        help='Reflow files in this many worker processes, or one per CPU if 0 (default: 1)')
     parser.add_argument('files', metavar='filename', nargs='*',
                         help='a filename to reflow text in')
     parser.add_argument('--version', action='version', version='%(prog)s 1.1')
 
     args = parser.parse_args()
 
+    if args.jobs < 1:
+        args.jobs = os.cpu_count() or 1
+
     setLogFile(True,  True, args.logFile)
     setLogFile(True, False, args.diagFile)
     setLogFile(False, True, args.warnFile)
@@ -863,6 +1018,8 @@ if __name__ == '__main__':
         folder_to_reflow = conventions.spec_reflow_path
         logWarn('Reflowing all asciidoc files under', folder_to_reflow)
         reflowAllAdocFiles(folder_to_reflow, args)
+    elif args.jobs > 1:
+        reflowFilesParallel([('file', file) for file in args.files], args)
     else:
         for file in args.files:
             reflowFile(file, args)
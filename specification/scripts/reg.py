@@ -7,13 +7,57 @@
 """Types and classes for manipulating an API registry."""
 
 import copy
+import hashlib
+import pickle
 import re
 import sys
 import xml.etree.ElementTree as etree
 from collections import defaultdict, deque, namedtuple
+from pathlib import Path
 
 from generator import GeneratorOptions, OutputGenerator, noneStr, write
 from apiconventions import APIConventions
+from spec_tools.cache_file import loadCacheFile, saveCacheFile
+
+
+# Bump when the cached registry state changes in a way not reflected in the
+# source of this file.
+REGISTRY_CACHE_VERSION = 1
+
+# Registry attributes which are not part of the parsed registry, and are not
+# saved in the registry cache.
+REGISTRY_CACHE_EXCLUDED = ('gen', 'genOpts', 'commandextensiontuple')
+
+
+class RegistryCachePickler(pickle.Pickler):
+    """Pickler for the registry cache which stores Elements of the registry
+    tree as their index in document order.
+
+    The tree itself is cached as XML, which is much faster to reparse than
+    unpickling Elements one at a time."""
+
+    def __init__(self, file, root):
+        pickle.Pickler.__init__(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.elementIndex = {id(elem): index for index, elem in enumerate(root.iter())}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, etree.Element):
+            # Elements not in the tree, such as copies made for command
+            # aliases, are pickled normally.
+            return self.elementIndex.get(id(obj))
+        return None
+
+
+class RegistryCacheUnpickler(pickle.Unpickler):
+    """Unpickler for the registry cache, resolving Element indices written
+    by RegistryCachePickler against the reparsed registry tree."""
+
+    def __init__(self, file, root):
+        pickle.Unpickler.__init__(self, file)
+        self.elements = list(root.iter())
+
+    def persistent_load(self, pid):
+        return self.elements[pid]
 
 
 def apiNameMatch(str, supported):
@@ -288,14 +332,23 @@ class GroupInfo(BaseInfo):
 class EnumInfo(BaseInfo):
     """Registry information about an enum"""
 
-    def __init__(self, elem):
+    def __init__(self, elem, required = False):
         BaseInfo.__init__(self, elem)
+        self.required = required
+        self.initialRequired = required
+        """required state assigned when the registry is loaded, restored
+        by resetState()"""
+
         self.type = elem.get('type')
         """numeric type of the value of the <enum> tag
         ( '' for GLint, 'u' for GLuint, 'ull' for GLuint64 )"""
         if self.type is None:
             self.type = ''
 
+    def resetState(self):
+        BaseInfo.resetState(self)
+        self.required = self.initialRequired
+
 
 class CmdInfo(BaseInfo):
     """Registry information about a command"""
@@ -492,16 +545,97 @@ class Registry:
 
         self.filename     = None
 
+        self.modifiedAttributes = []
+        """list of (Element, attribute name, original value or None) tuples
+        recording attributes set by apiGen(), so apiReset() can restore them"""
+
+        self.removedElements = []
+        """list of (parent Element, index, Element) tuples recording elements
+        removed by `<remove>` tags during apiGen(), so apiReset() can restore
+        them"""
+
+        self.apiGenerated = False
+        "True once apiGen() has run, so a following apiGen() resets state first"
+
     def loadElementTree(self, tree):
         """Load ElementTree into a Registry object and parse it."""
         self.tree = tree
         self.parseTree()
 
-    def loadFile(self, file):
-        """Load an API registry XML file into a Registry object and parse it"""
+    def loadFile(self, file, cachedir=None):
+        """Load an API registry XML file into a Registry object and parse it
+
+        - file - registry XML file
+        - cachedir - directory holding cached parsed registries, or None.
+          If a registry parsed from the same file contents with the same
+          loading options has been cached there, it is loaded instead of
+          parsing the file. Otherwise the newly parsed registry is cached."""
         self.filename = file
+        if cachedir is not None and self.loadCache(file, cachedir):
+            return
         self.tree = etree.parse(file)
         self.parseTree()
+        if cachedir is not None:
+            self.saveCache(file, cachedir)
+
+    def cachePath(self, file, cachedir):
+        """Return the path of the cached parsed registry for a registry XML
+        file.
+
+        The cache is keyed by a hash of the file contents, the generator
+        options affecting loading, and the source of this module, so any
+        change to them invalidates it."""
+        digest = hashlib.sha256()
+        for key in (REGISTRY_CACHE_VERSION, sys.version,
+                    self.genOpts.apiname, self.genOpts.mergeApiNames):
+            digest.update(str(key).encode('utf-8') + b'\0')
+        for source in (__file__, file):
+            with open(source, 'rb') as fp:
+                digest.update(fp.read())
+        return Path(cachedir) / f'{Path(file).stem}-{digest.hexdigest()}.pickle'
+
+    def loadCache(self, file, cachedir):
+        """Load the cached parsed registry for a registry XML file, if any.
+
+        Returns True on success, or False if there is no usable cache."""
+        def read(fp):
+            root = etree.fromstring(pickle.load(fp))
+            return RegistryCacheUnpickler(fp, root).load()
+
+        path = self.cachePath(file, cachedir)
+        state = loadCacheFile(path, read, self.warnCache, 'registry cache',
+                              errors=(IndexError, etree.ParseError))
+        if state is None:
+            return False
+        if not isinstance(state, dict) or 'typedict' not in state:
+            self.warnCache(f'Ignoring invalid registry cache {path}')
+            return False
+
+        # The elem references of the *Info objects were resolved against the
+        # restored tree, so they still point into it.
+        self.__dict__.update(state)
+        self.filename = file
+        return True
+
+    def saveCache(self, file, cachedir):
+        """Save the parsed registry for a registry XML file to the cache.
+
+        Must be called after parseTree() and before apiGen(), which
+        modifies the registry state."""
+        path = self.cachePath(file, cachedir)
+        state = {key: value for key, value in self.__dict__.items()
+                 if key not in REGISTRY_CACHE_EXCLUDED}
+
+        def write(fp):
+            root = self.tree.getroot()
+            pickle.dump(etree.tostring(root), fp, protocol=pickle.HIGHEST_PROTOCOL)
+            RegistryCachePickler(fp, root).dump(state)
+
+        saveCacheFile(path, write, self.warnCache, 'registry cache')
+
+    def warnCache(self, message):
+        """Report a registry cache that cannot be used."""
+        self.gen.logMsg('warn', message)
 
     def setGenerator(self, gen):
         """Specify output generator object.
@@ -510,6 +644,22 @@ class Registry:
         self.gen = gen
         self.gen.setRegistry(self)
 
+    def setTarget(self, gen, genOpts):
+        """Specify a new output generator and generator options, to generate
+        another target from the already-loaded registry with apiGen().
+
+        Loading the registry depends on the API name and merged API names,
+        so these must match the options the registry was loaded with."""
+        if (genOpts.apiname != self.genOpts.apiname
+                or genOpts.mergeApiNames != self.genOpts.mergeApiNames):
+            raise RuntimeError('Registry.setTarget: options for ' + str(genOpts.filename)
+                               + ' select a different API than the loaded registry')
+        self.gen = gen
+        self.genOpts = genOpts
+        self.gen.registry = self
+        self.gen.genOpts = self.genOpts
+        self.gen.genOpts.registry = self
+
     def addElementInfo(self, elem, info, infoName, dictionary):
         """Add information about an element to the corresponding dictionary.
 
@@ -646,8 +796,7 @@ class Registry:
             # Enum values are defined only for the type that is not aliased to something else.
             assert(type_name not in self.aliasdict)
             for enum in enums.findall('enum'):
-                enumInfo = EnumInfo(enum)
-                enumInfo.required = required
+                enumInfo = EnumInfo(enum, required)
                 self.addElementInfo(enum, enumInfo, 'enum', self.enumdict)
                 self.addEnumValue(enum, type_name)
 
@@ -993,6 +1142,7 @@ class Registry:
                         gienum = gi.elem.find(f"enum[@name='{enumname}']")
                         if gienum is not None:
                             # Remove copy of this enum from the group
+                            self.removedElements.append((gi.elem, list(gi.elem).index(gienum), gienum))
                             gi.elem.remove(gienum)
                         else:
                             self.gen.logMsg('warn', 'markEnumRequired: Cannot remove enum',
@@ -1017,6 +1167,7 @@ class Registry:
                             if thisEnum.get('name') == enumName:
                                 # Actually remove it
                                 count = count + 1
+                                self.removedElements.append((enums, list(enums).index(thisEnum), thisEnum))
                                 enums.remove(thisEnum)
 
                     if count == 0:
@@ -1433,7 +1584,7 @@ class Registry:
                         self.gen.logMsg('diag', '* required =', required, 'for', name)
                         if required:
                             # Mark this element as required (in the element, not the EnumInfo)
-                            elem.set('required', 'true')
+                            self.setElementRequired(elem)
                             # If it is an alias, track that for later use
                             enumAlias = elem.get('alias')
                             if enumAlias:
@@ -1441,7 +1592,7 @@ class Registry:
                     for elem in enums:
                         name = elem.get('name')
                         if name in enumAliases:
-                            elem.set('required', 'true')
+                            self.setElementRequired(elem)
                             self.gen.logMsg('diag', '* also need to require alias', name)
             if f is None:
                 raise RuntimeError("Should not get here")
@@ -1480,6 +1631,13 @@ class Registry:
                             followupFeature)
             self.generateFeature(followupFeature, "type", self.typedict)
 
+    def setElementRequired(self, elem):
+        """Mark an `<enum>` Element as required by setting its 'required'
+        attribute, recording the change so apiReset() can undo it."""
+        if elem.get('required') is None:
+            self.modifiedAttributes.append((elem, 'required', None))
+            elem.set('required', 'true')
+
     def generateRequiredInterface(self, interface):
         """Generate all interfaces required by an API version or extension.
 
@@ -1542,6 +1700,7 @@ class Registry:
                 # Update the attribute after stripping stuff.
                 # Could sort apis before joining, but it is not a clear win
                 if stripped:
+                    self.modifiedAttributes.append((eleminfo.elem, attribute, attribstring))
                     eleminfo.elem.set(attribute, ','.join(apis))
 
     def stripUnsupportedAPIsFromList(self, dictionary, supportedDictionary):
@@ -1621,13 +1780,13 @@ class Registry:
                         'profile:', self.genOpts.profile)
         self.gen.logMsg('diag', '*******************************************')
 
-        # Could reset required/declared flags for all features here.
-        # This has been removed as never used. The initial motivation was
-        # the idea of calling apiGen() repeatedly for different targets, but
-        # this has never been done. The 20% or so build-time speedup that
-        # might result is not worth the effort to make it actually work.
-        #
-        # self.apiReset()
+        # Reset required/declared flags and other per-target state left
+        # over from a previous call, so that one parsed registry can be used
+        # to generate several targets in turn (see the batch mode of
+        # src_genxr.py).
+        if self.apiGenerated:
+            self.apiReset()
+        self.apiGenerated = True
 
         # Compile regexps used to select versions & extensions
         regVersions = re.compile(self.genOpts.versions)
@@ -1837,3 +1996,25 @@ class Registry:
             self.cmddict[cmd].resetState()
         for cmd in self.apidict:
             self.apidict[cmd].resetState()
+        for group in self.groupdict:
+            self.groupdict[group].resetState()
+        for ext in self.extdict:
+            self.extdict[ext].resetState()
+
+        # Restore attributes set and elements removed while generating,
+        # most recent first, since the next target may select different
+        # features.
+        for (elem, attribute, value) in reversed(self.modifiedAttributes):
+            if value is None:
+                del elem.attrib[attribute]
+            else:
+                elem.set(attribute, value)
+        self.modifiedAttributes = []
+        for (parent, index, elem) in reversed(self.removedElements):
+            parent.insert(index, elem)
+        self.removedElements = []
+
+        self.validextensionstructs = defaultdict(list)
+        self.commandextensionsuccesses = []
+        self.commandextensionerrors = []
+        self.requiredextensions = []
@@ -0,0 +1,76 @@
+# Copyright 2025 The Khronos Group Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Writing files atomically, and loading and saving cache files that may be shared between processes."""
+
+import os
+import pickle
+import tempfile
+
+# Errors of reading a cache file that was written by another version of the scripts, or is damaged.
+CACHE_READ_ERRORS = (OSError, EOFError, pickle.UnpicklingError,
+                     AttributeError, ImportError, TypeError, ValueError)
+
+# Errors of writing a cache file, including those of pickling its contents.
+CACHE_WRITE_ERRORS = (OSError, pickle.PicklingError, TypeError, AttributeError)
+
+
+def writeFileAtomically(path, write, mode='wb', encoding=None):
+    """Write a file by calling write(fp) on a temporary file and renaming it into place.
+
+    Concurrent readers, or later runs after an interrupted one, never see a
+    partial file. The directory of the file is created as needed. If
+    writing fails, the temporary file is removed and the exception raised.
+
+    - path - name of the file to write
+    - write - function writing the contents to the open file object it is passed
+    - mode, encoding - how the temporary file is opened"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmpname = None
+    try:
+        with tempfile.NamedTemporaryFile(mode, encoding=encoding, dir=directory,
+                                         suffix='.tmp', delete=False) as fp:
+            tmpname = fp.name
+            write(fp)
+        os.replace(tmpname, path)
+    except BaseException:
+        if tmpname is not None and os.path.exists(tmpname):
+            os.remove(tmpname)
+        raise
+
+
+def loadCacheFile(path, read, warn, description, errors=()):
+    """Return read(fp) for a cache file opened in binary mode, or None if it is missing or unreadable.
+
+    - path - name of the cache file
+    - read - function returning the contents read from the open file object it is passed
+    - warn - function called with a message when the file cannot be read
+    - description - what the file holds, for the message
+    - errors - exception types raised by read() for a bad file, besides CACHE_READ_ERRORS"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as fp:
+            return read(fp)
+    except CACHE_READ_ERRORS + tuple(errors) as e:
+        warn(f'Ignoring unreadable {description} {path}: {e}')
+        return None
+
+
+def saveCacheFile(path, write, warn, description):
+    """Write a cache file atomically, in binary mode, and return True on success.
+
+    Failing to write a cache is not an error: warn is called with a message
+    and False returned.
+
+    - path - name of the cache file
+    - write - function writing the contents to the open file object it is passed
+    - warn - function called with a message when the file cannot be written
+    - description - what the file holds, for the message"""
+    try:
+        writeFileAtomically(path, write)
+    except CACHE_WRITE_ERRORS as e:
+        warn(f'Cannot write {description} {path}: {e}')
+        return False
+    return True
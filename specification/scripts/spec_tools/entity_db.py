@@ -6,7 +6,9 @@
 # Author(s):    Rylie Pavlik <rylie.pavlik@collabora.com>
 """Provides EntityDatabase, a class that keeps track of spec-defined entities and associated macros."""
 
+import hashlib
 from abc import ABC, abstractmethod
+from pathlib import Path
 
 from .shared import (CATEGORIES_WITH_VALIDITY, EXTENSION_CATEGORY,
                      NON_EXISTENT_MACROS, EntityData)
@@ -28,6 +30,11 @@ class EntityDatabase(ABC):
     Must be subclasses for each specific API.
     """
 
+    registry_cache_dir = None
+    """Directory in which makeRegistry() may cache the parsed registry, or None.
+
+    Set by checkerMain() from the --registry_cache argument."""
+
     ###
     # Methods that must be implemented in subclasses.
     ###
@@ -298,6 +305,14 @@ class EntityDatabase(ABC):
              for entity, data in self._byEntity.items()}
         return json.dumps(d, sort_keys=True, indent=4)
 
+    def getDigest(self):
+        """Return a hash of the entity data and of the registry it came from."""
+        digest = hashlib.sha256(self.getEntityJson().encode('utf-8'))
+        filename = getattr(self.registry, 'filename', None)
+        if filename:
+            digest.update(Path(filename).read_bytes())
+        return digest.hexdigest()
+
     def entityHasValidity(self, entity):
         """Estimate if we expect to see a validity include for an entity name.
 
@@ -6,8 +6,19 @@
 # Author(s):    Rylie Pavlik <rylie.pavlik@collabora.com>
 """Provides the MacroChecker class."""
 
+from contextlib import redirect_stdout
 from io import StringIO
+from multiprocessing.reduction import ForkingPickler
+from pathlib import Path
+import copy
+import hashlib
+import multiprocessing
+import os
 import re
+import sys
+
+from .macro_scanner import EntityNameScanner, MacroScanner
+from .shared import reduceMatch
 
 
 class MacroChecker(object):
@@ -71,6 +82,12 @@ class MacroChecker(object):
             ''',
             re.VERBOSE)
 
+        # Linear-time scanners matching exactly what the two regexes above
+        # match, used when checking files. The regexes define their behavior.
+        self.macro_scanner = MacroScanner(self.entity_db.macros)
+        self.entity_name_scanner = EntityNameScanner(
+            self.entity_db.case_insensitive_name_prefix_pattern)
+
     def haveLinkTarget(self, entity):
         """Report if we have parsed an API include (or heading) for an entity.
 
@@ -161,6 +178,111 @@ class MacroChecker(object):
         f.process()
         self.files.append(f)
 
+    def processFiles(self, filenames, jobs=1, cache=None):
+        """Parse and check several .adoc files, optionally in worker processes.
+
+        With jobs > 1 (or 0, meaning one per CPU), files are checked in a
+        process pool sharing this checker's EntityDatabase.
+        With a CheckResultCache, files unchanged since they were cached are
+        not checked again.
+
+        In both cases each file is checked alone and the results are merged
+        back in file order. The merged state and console output match
+        checking the files one at a time: a file whose ref pages or includes
+        were already seen in an earlier file depends on that earlier file,
+        so it is checked again here instead.
+        """
+        filenames = list(filenames)
+        if jobs == 0:
+            jobs = os.cpu_count() or 1
+        if cache is None and (jobs <= 1 or len(filenames) < 2):
+            for filename in filenames:
+                self.processFile(filename)
+            return
+
+        results = [None] * len(filenames)
+        if cache is not None:
+            results = [cache.load(filename) for filename in filenames]
+        pending = [i for i, result in enumerate(results) if result is None]
+        checked = self.checkFilesAlone([filenames[i] for i in pending], jobs)
+        for i, result in zip(pending, checked):
+            results[i] = result
+            if cache is not None:
+                cache.save(filenames[i], result)
+
+        for filename, result in zip(filenames, results):
+            if not self.mergeFileResult(result):
+                self.processFile(filename)
+
+    def checkFilesAlone(self, filenames, jobs=1):
+        """Check each file as if it were the only one, yielding the results in order.
+
+        See checkFileAlone() for the results. With jobs > 1, files are
+        checked in a process pool.
+        """
+        if jobs <= 1 or len(filenames) < 2:
+            for filename in filenames:
+                yield checkFileAlone(self, filename)
+            return
+
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # Workers inherit the already-populated entity database.
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+
+        with context.Pool(min(jobs, len(filenames)),
+                          initializer=_initWorker, initargs=(self,)) as pool:
+            yield from pool.imap(_checkFileInWorker, filenames)
+
+    def mergeFileResult(self, result):
+        """Merge the result of checking one file alone, from checkFileAlone().
+
+        Returns False, merging nothing, if the file saw a ref page or
+        include already seen in an earlier file: checking it alone would
+        have missed the resulting duplicate errors.
+        """
+        f, refpages, links, apiIncludes, validityIncludes, headings, output = result
+        if (not refpages.isdisjoint(self.refpages)
+                or not apiIncludes.keys().isdisjoint(self.apiIncludes)
+                or not validityIncludes.keys().isdisjoint(self.validityIncludes)):
+            return False
+
+        sys.stdout.write(output)
+        f.checker = self
+        self.files.append(f)
+        self.refpages.update(refpages)
+        for entity, contexts in links.items():
+            self.links.setdefault(entity, []).extend(contexts)
+        # Keep the result's lists: duplicate-include messages refer to them
+        # and see later includes appended.
+        self.apiIncludes.update(apiIncludes)
+        self.validityIncludes.update(validityIncludes)
+        self.headings.update(headings)
+        return True
+
+    def getDigest(self):
+        """Return a hash of everything besides file contents that affects check results.
+
+        Covers the entity database, the enabled messages, the root path,
+        and the source of the modules implementing the checks.
+        """
+        digest = hashlib.sha256()
+        for key in (sys.version, str(self.root_path), self.entity_db.getDigest(),
+                    sorted(message_id.name for message_id in self.enabled_messages)):
+            digest.update(str(key).encode('utf-8') + b'\0')
+
+        sources = set(Path(__file__).parent.glob('*.py'))
+        conventions = self.conventions if isinstance(self.conventions, type) else type(self.conventions)
+        for cls in (type(self), type(self.entity_db), self.macro_checker_file_type, conventions):
+            for base in cls.__mro__:
+                source = getattr(sys.modules.get(base.__module__), '__file__', None)
+                if source:
+                    sources.add(Path(source).resolve())
+        for source in sorted(sources):
+            digest.update(source.read_bytes())
+        return digest.hexdigest()
+
     def processString(self, s):
         """Process a string as if it were a spec file.
 
@@ -226,3 +348,47 @@ class MacroChecker(object):
         """
         return (entity for entity in sorted(self.entity_db.generating_entities)
                 if entity not in self.refpages)
+
+
+
+def checkFileAlone(checker, filename):
+    """Check one file with empty cross-file tables, as if it were the only file.
+
+    Returns a tuple of the MacroCheckerFile (detached from the checker), the
+    refpages, links, apiIncludes, validityIncludes and headings it added,
+    and its console output, for MacroChecker.mergeFileResult().
+    """
+    checker = copy.copy(checker)
+    checker.files = []
+    checker.refpages = set()
+    checker.links = {}
+    checker.apiIncludes = {}
+    checker.validityIncludes = {}
+    checker.headings = {}
+
+    output = StringIO()
+    with redirect_stdout(output):
+        checker.processFile(filename)
+
+    f = checker.files[0]
+    # Only the results are kept, and they may be pickled.
+    f.checker = None
+    f.stream_maker = None
+    return (f, checker.refpages, checker.links, checker.apiIncludes,
+            checker.validityIncludes, checker.headings, output.getvalue())
+
+
+# The checker used by a worker process, set by _initWorker().
+_worker_checker = None
+
+
+def _initWorker(checker):
+    """Set up a worker process for MacroChecker.processFiles()."""
+    global _worker_checker
+    _worker_checker = checker
+    ForkingPickler.register(re.Match, reduceMatch)
+
+
+def _checkFileInWorker(filename):
+    """Check one file in a worker process, returning what the parent merges."""
+    return checkFileAlone(_worker_checker, filename)
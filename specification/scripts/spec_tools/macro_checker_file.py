@@ -249,8 +249,8 @@ class MacroCheckerFile:
         # Stack of block-starting delimiters.
         self.block_stack = []
 
-        # Regexes that are members because they depend on the name prefix.
-        self.suspected_missing_macro_re = self.checker.suspected_missing_macro_re
+        # Scanners and regexes that are members because they depend on the name prefix.
+        self.entity_name_scanner = self.checker.entity_name_scanner
         self.heading_command_re = self.checker.heading_command_re
 
     ###
@@ -505,7 +505,7 @@ class MacroCheckerFile:
 
         ###
         # Look for things that seem like a missing macro.
-        for match in self.suspected_missing_macro_re.finditer(line):
+        for match in self.entity_name_scanner.finditer(line):
             if OPEN_LINK.match(line, endpos=match.start()):
                 # this is in a link, skip it.
                 continue
@@ -563,7 +563,7 @@ class MacroCheckerFile:
 
         ###
         # Main operations: detect markup macros
-        for match in self.checker.macro_re.finditer(line):
+        for match in self.checker.macro_scanner.finditer(line):
             self.match = match
             self.macro = match.group('macro')
             self.entity = match.group('entity_name')
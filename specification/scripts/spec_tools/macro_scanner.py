@@ -0,0 +1,193 @@
+# Copyright 2025 The Khronos Group Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Provides MacroScanner and EntityNameScanner, linear-time replacements for
+the macro and suspected-missing-macro regexes of MacroChecker."""
+
+import re
+
+from .shared import SpanMatch
+
+# Runs of the character classes used by the regexes being replaced.
+# These never backtrack, so matching them is linear.
+_WORD_OR_DASH_RUN = re.compile(r'[-\w]*')
+_ENTITY_CHAR_RUN = re.compile(r'[-\w*]*')
+_WORD_OR_STAR_RUN = re.compile(r'[\w*]*')
+
+# Characters that may not precede a suspected missing macro.
+_NOT_BEFORE_ENTITY_NAME = set('-=:/[.`+,')
+
+
+def _isWordChar(c):
+    """Return True if c matches \\w in a str regex."""
+    return c.isalnum() or c == '_'
+
+
+class MacroScanner(object):
+    """Finds macro:entity markup, matching the same text as MacroChecker.macro_re.
+
+    Equivalent to finditer() on the regex
+
+        (?P<formatting>\\**|_*)
+            (?P<macro>macro1|macro2|...):
+            (?P<entity_name>(([-\\w]+[.])*)[-\\w*]+(?P<subscript>\\[([^\\]]*)\\])?)
+        (?P=formatting)
+
+    including its group spans, without trying the macro alternation at
+    every position: only the text before each colon is looked up, in a trie
+    of the reversed macro names, and the backtracking of the entity name
+    against the trailing formatting is resolved directly.
+    """
+
+    groupindex = {'formatting': 1, 'macro': 2, 'entity_name': 3, 'subscript': 6}
+
+    def __init__(self, macros):
+        """Construct a scanner for a collection of macro names."""
+        # Trie of reversed macro names: nested dicts keyed by character,
+        # with the key None marking the end of a macro name.
+        self.trie = {}
+        for macro in macros:
+            if not macro or not all(_isWordChar(c) for c in macro) or macro[0] == '_':
+                raise ValueError(f'Cannot scan for macro name {macro!r}')
+            node = self.trie
+            for c in reversed(macro):
+                node = node.setdefault(c, {})
+            node[None] = True
+
+    def macroStarts(self, string, colon):
+        """Return the start of each macro name ending right before a colon, earliest first."""
+        starts = []
+        node = self.trie
+        i = colon
+        while i > 0:
+            node = node.get(string[i - 1])
+            if node is None:
+                break
+            i -= 1
+            if None in node:
+                starts.append(i)
+        starts.reverse()
+        return starts
+
+    def matchEntity(self, string, start, formatting):
+        """Match the entity name starting at start, followed by formatting.
+
+        Returns the group spans from entity_name on, or None. Tries the
+        same alternatives as the regex, in the same order: fewer and fewer
+        dotted prefixes, shorter and shorter names, subscript before none.
+        """
+        # Greedy ([-\w]+[.])* : only whole runs followed by a dot can match.
+        ends = [start]
+        pos = start
+        while True:
+            end = _WORD_OR_DASH_RUN.match(string, pos).end()
+            if end == pos or not string.startswith('.', end):
+                break
+            pos = end + 1
+            ends.append(pos)
+
+        for count in range(len(ends) - 1, -1, -1):
+            name_start = ends[count]
+            prefix_span = (start, name_start)
+            last_prefix_span = (ends[count - 1], name_start) if count else (-1, -1)
+            name_end = _ENTITY_CHAR_RUN.match(string, name_start).end()
+            if name_end == name_start:
+                continue
+
+            # The longest name can be followed by a subscript.
+            if string.startswith('[', name_end):
+                close = string.find(']', name_end + 1)
+                if close >= 0 and string.startswith(formatting, close + 1):
+                    return [(start, close + 1), prefix_span, last_prefix_span,
+                            (name_end, close + 1), (name_end + 1, close)]
+
+            # Otherwise take the longest name followed by the formatting.
+            if formatting:
+                end = string.rfind(formatting, name_start + 1, name_end + len(formatting))
+            else:
+                end = name_end
+            if end >= 0:
+                return [(start, end), prefix_span, last_prefix_span,
+                        (-1, -1), (-1, -1)]
+        return None
+
+    def candidates(self, string, colon):
+        """Yield (start, formatting end) pairs where a match might start, earliest first."""
+        result = []
+        for macro_start in self.macroStarts(string, colon):
+            result.append((macro_start, macro_start))
+            if macro_start and string[macro_start - 1] in '*_':
+                c = string[macro_start - 1]
+                i = macro_start - 1
+                while i > 0 and string[i - 1] == c:
+                    i -= 1
+                result.extend((p, macro_start) for p in range(i, macro_start))
+        result.sort()
+        return result
+
+    def finditer(self, string):
+        """Yield a SpanMatch for each non-overlapping match in string."""
+        pos = 0
+        colon = string.find(':')
+        while colon >= 0:
+            for start, macro_start in self.candidates(string, colon):
+                if start < pos:
+                    continue
+                formatting = string[start:macro_start]
+                spans = self.matchEntity(string, colon + 1, formatting)
+                if spans is None:
+                    continue
+                end = spans[0][1] + len(formatting)
+                yield SpanMatch(string,
+                                [(start, end), (start, macro_start), (macro_start, colon)] + spans,
+                                self.groupindex)
+                pos = end
+                break
+            colon = string.find(':', max(colon + 1, pos))
+
+
+class EntityNameScanner(object):
+    """Finds apparent entity names, matching the same text as MacroChecker.suspected_missing_macro_re.
+
+    Equivalent to finditer() on the regex
+
+        \\b(?<![-=:/[\\.`+,])(?P<entity_name>prefix[\\w*]+)\\b(?!>>)
+
+    where prefix is matched case-insensitively, scanning only from
+    occurrences of the prefix.
+    """
+
+    groupindex = {'entity_name': 1}
+
+    def __init__(self, name_prefix_pattern):
+        """Construct a scanner for a case-insensitive name prefix pattern, like '[Xx][Rr]'."""
+        self.prefix_re = re.compile(name_prefix_pattern)
+
+    def matchEnd(self, string, start):
+        """Return the end of the match starting at start, or None."""
+        if start:
+            before = string[start - 1]
+            if _isWordChar(before) or before in _NOT_BEFORE_ENTITY_NAME:
+                return None
+        name_start = self.prefix_re.match(string, start).end()
+        name_end = _WORD_OR_STAR_RUN.match(string, name_start).end()
+        # Backtrack [\w*]+ until it ends at a word boundary not followed by >>
+        after_is_word = name_end < len(string) and _isWordChar(string[name_end])
+        for end in range(name_end, name_start, -1):
+            is_word = _isWordChar(string[end - 1])
+            if is_word != after_is_word and not string.startswith('>>', end):
+                return end
+            after_is_word = is_word
+        return None
+
+    def finditer(self, string):
+        """Yield a SpanMatch for each non-overlapping match in string."""
+        prefix = self.prefix_re.search(string)
+        while prefix:
+            start = prefix.start()
+            end = self.matchEnd(string, start)
+            if end is None:
+                prefix = self.prefix_re.search(string, start + 1)
+                continue
+            yield SpanMatch(string, [(start, end), (start, end)], self.groupindex)
+            prefix = self.prefix_re.search(string, end)
@@ -12,6 +12,7 @@ import logging
 import re
 from pathlib import Path
 
+from .entity_db import EntityDatabase
 from .shared import MessageId
 
 
@@ -77,10 +78,22 @@ def checkerMain(default_enabled_messages, make_macro_checker,
     parser.add_argument(
         "--html",
         help="Output messages to the named HTML file instead of stdout.")
+    parser.add_argument(
+        "--registry_cache",
+        help="Cache the parsed registry in the named directory, and reuse it while the registry is unchanged.")
+    parser.add_argument(
+        "--check_cache",
+        help="Cache the results of checking each file in the named directory, and reuse them for files that are unchanged. Output is the same as checking every file.")
     parser.add_argument(
         "file",
         help="Only check the indicated file(s). By default, all chapters and extensions are checked.",
         nargs="*")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Check files using this many worker processes (0 for one per CPU). Output is the same as checking serially.")
     parser.add_argument(
         "--ignore_count",
         type=int,
@@ -126,6 +139,8 @@ def checkerMain(default_enabled_messages, make_macro_checker,
     if args.debug:
         logging.basicConfig(level='DEBUG')
 
+    EntityDatabase.registry_cache_dir = args.registry_cache
+
     checker = make_macro_checker(enabled_messages)
 
     if args.dump_entities:
@@ -138,8 +153,16 @@ def checkerMain(default_enabled_messages, make_macro_checker,
     else:
         files = all_docs
 
-    for fn in files:
-        checker.processFile(fn)
+    cache = None
+    if args.check_cache:
+        from .result_cache import CheckResultCache
+        cache = CheckResultCache(args.check_cache, checker)
+
+    checker.processFiles(files, jobs=args.jobs, cache=cache)
+
+    if cache is not None:
+        logging.info('Reused cached results for %d files, checked %d files',
+                     cache.hits, cache.misses)
 
     if args.html:
         from .html_printer import HTMLPrinter
@@ -0,0 +1,90 @@
+# Copyright 2025 The Khronos Group Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Provides CheckResultCache, a persistent cache of per-file MacroChecker results."""
+
+import copyreg
+import hashlib
+import logging
+import pickle
+import re
+from pathlib import Path
+
+from .cache_file import loadCacheFile, saveCacheFile
+from .shared import reduceMatch
+
+# Increment when the format of cached results changes.
+RESULT_CACHE_VERSION = 2
+
+
+class ResultPickler(pickle.Pickler):
+    """Pickler that stores re.Match objects as SpanMatch snapshots."""
+
+    dispatch_table = copyreg.dispatch_table.copy()
+    dispatch_table[re.Match] = reduceMatch
+
+
+class CheckResultCache(object):
+    """Directory of results of checking single files, from checkFileAlone().
+
+    Each result is keyed by a hash of the file name and contents and of
+    MacroChecker.getDigest(), so editing a file, the registry, the enabled
+    messages, or the checker itself invalidates it.
+    Cross-file checks are not cached: MacroChecker.processFiles() merges
+    the cached results and recomputes them.
+    Saving a result removes the older results of the same file.
+    """
+
+    def __init__(self, cache_dir, checker):
+        """Construct a cache.
+
+        cache_dir -- Directory holding the cached results, created as needed.
+        checker -- The MacroChecker whose results are cached.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.checker_digest = checker.getDigest()
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+
+    def cachePrefix(self, filename):
+        """Return the start of the names of all cached results for a file."""
+        name_digest = hashlib.sha256(str(filename).encode('utf-8')).hexdigest()
+        return f'{Path(filename).stem}-{name_digest[:16]}-'
+
+    def cachePath(self, filename):
+        """Return the path of the cached result for a file."""
+        digest = hashlib.sha256()
+        for key in (RESULT_CACHE_VERSION, self.checker_digest, filename):
+            digest.update(str(key).encode('utf-8') + b'\0')
+        with open(filename, 'rb') as fp:
+            digest.update(fp.read())
+        return self.cache_dir / f'{self.cachePrefix(filename)}{digest.hexdigest()}.pickle'
+
+    def removeStale(self, filename, path):
+        """Remove the cached results for a file other than the one at path."""
+        prefix = self.cachePrefix(filename)
+        for entry in self.cache_dir.iterdir():
+            if entry.name.startswith(prefix) and entry.suffix == '.pickle' and entry != path:
+                try:
+                    entry.unlink()
+                except OSError as e:
+                    self.logger.warning('Cannot remove stale check result cache %s: %s', entry, e)
+
+    def load(self, filename):
+        """Return the cached result for a file, or None if there is no usable one."""
+        path = self.cachePath(filename)
+        result = loadCacheFile(path, pickle.load, self.logger.warning, 'check result cache')
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def save(self, filename, result):
+        """Save the result of checking a file alone."""
+        path = self.cachePath(filename)
+        if saveCacheFile(path,
+                         lambda fp: ResultPickler(fp, protocol=pickle.HIGHEST_PROTOCOL).dump(result),
+                         self.logger.warning, 'check result cache'):
+            self.removeStale(filename, path)
@@ -55,6 +55,63 @@ MessageContext = namedtuple('MessageContext',
                              'match', 'group'])
 
 
+class SpanMatch(object):
+    """Match-like object built from the spans of its groups.
+
+    Produced by the scanners in macro_scanner, and by reduceMatch() in place
+    of re.Match objects, which cannot be pickled. Provides the parts of the
+    re.Match interface used when checking and reporting messages.
+    """
+
+    def __init__(self, string, spans, groupindex):
+        self.string = string
+        self.spans = spans
+        self.groupindex = groupindex
+
+    def index(self, group):
+        """Return the index of a group given by name or index."""
+        if isinstance(group, str):
+            return self.groupindex[group]
+        return group
+
+    def span(self, group=0):
+        return self.spans[self.index(group)]
+
+    def start(self, group=0):
+        return self.span(group)[0]
+
+    def end(self, group=0):
+        return self.span(group)[1]
+
+    def group(self, *groups):
+        if not groups:
+            groups = (0,)
+        values = []
+        for group in groups:
+            start, end = self.span(group)
+            values.append(None if start < 0 else self.string[start:end])
+        if len(values) == 1:
+            return values[0]
+        return tuple(values)
+
+    def __getitem__(self, group):
+        return self.group(group)
+
+    def groups(self, default=None):
+        return tuple(default if value is None else value
+                     for value in (self.group(i) for i in range(1, len(self.spans))))
+
+    def groupdict(self, default=None):
+        return {name: default if self.group(name) is None else self.group(name)
+                for name in self.groupindex}
+
+
+def reduceMatch(match):
+    """Pickle reducer turning a re.Match into a SpanMatch."""
+    spans = [match.span(i) for i in range(len(match.groups()) + 1)]
+    return SpanMatch, (match.string, spans, dict(match.re.groupindex))
+
+
 def getInterestedRange(message_context):
     """Return a (start, end) pair of character index for the match in a MessageContext."""
     if not message_context.match:
@@ -247,7 +304,8 @@ class Message(object):
         elif isinstance(see_also, MessageContext):
             self.see_also = [see_also]
         else:
-            self.see_also = see_also
+            # May be a generator: keep a list so the message can be pickled.
+            self.see_also = list(see_also)
 
         self.script_location = None
         if frame:
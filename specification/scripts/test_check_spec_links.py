@@ -639,3 +639,82 @@ def test_code_block_tracking(ckr):
         ----
         This code happens to include the characters slink:BogusStruct
         ----""").messages
+
+
+def writeCheckFiles(tmp_path):
+    """Write a few spec files for the processFiles() tests, returning their names."""
+    contents = [
+        f"[open,refpage='{PROTO}']\n--\nflink:{PROTO} uses slink:{STRUCT}\n--\n",
+        f"slink:BogusStruct\nflink:{STRUCT}\n[open,refpage='abc']\n",
+        # Duplicate of a refpage in an earlier file
+        f"[open,refpage='{PROTO}']\n--\nflink:{PROTO}\n--\n",
+        f"[open,refpage='{STRUCT}']\n--\nslink:{STRUCT}\n--\n",
+        # Unclosed block, reported with a see_also
+        f"****\nslink:{STRUCT}\n",
+    ]
+    filenames = []
+    for i, content in enumerate(contents):
+        path = tmp_path / f"file{i}.adoc"
+        path.write_text(content, encoding='utf-8')
+        filenames.append(str(path))
+    return filenames
+
+
+def processFilesResults(capsys, filenames, jobs=1, cache_dir=None, cache_hits=None):
+    """Check files with processFiles(), returning the output and a summary of the results.
+
+    If cache_hits is given, also check how many results were loaded from the cache.
+    """
+    from spec_tools.result_cache import CheckResultCache
+    checker = makeMacroChecker(set(MessageId))
+    cache = CheckResultCache(cache_dir, checker) if cache_dir else None
+    checker.processFiles(filenames, jobs=jobs, cache=cache)
+    if cache_hits is not None:
+        assert cache.hits == cache_hits
+    output = capsys.readouterr().out
+    messages = [(f.filename, [(m.message_id, m.message, m.context.lineNum,
+                               m.context.match and m.context.match.span(),
+                               m.see_also and [see.lineNum for see in m.see_also])
+                              for m in f.messages])
+                for f in checker.files]
+    return output, messages, checker.refpages, list(checker.links)
+
+
+def test_process_files_jobs(tmp_path, capsys):
+    """Check that checking files in worker processes matches checking them serially."""
+    filenames = writeCheckFiles(tmp_path)
+    serial = processFilesResults(capsys, filenames)
+    assert any(msg[0] == MessageId.REFPAGE_DUPLICATE
+               for msg in serial[1][2][1])
+    assert any(msg[0] == MessageId.UNCLOSED_BLOCK and msg[4]
+               for msg in serial[1][4][1])
+    assert processFilesResults(capsys, filenames, jobs=2) == serial
+
+
+def test_process_files_cache(tmp_path, capsys):
+    """Check that reusing cached per-file results matches checking every file."""
+    filenames = writeCheckFiles(tmp_path)
+    cache_dir = tmp_path / 'cache'
+    serial = processFilesResults(capsys, filenames)
+    assert any(msg[4] for msg in serial[1][4][1])
+    assert processFilesResults(capsys, filenames, cache_dir=cache_dir,
+                               cache_hits=0) == serial
+    # Every result was saved, including those of messages with a see_also.
+    assert processFilesResults(capsys, filenames, cache_dir=cache_dir,
+                               cache_hits=len(filenames)) == serial
+
+    entries = set(cache_dir.glob('*.pickle'))
+    assert len(entries) == len(filenames)
+
+    # Editing one file only invalidates its own result.
+    with open(filenames[1], 'a', encoding='utf-8') as f:
+        f.write(f"[open,refpage='{PROTO}']\n")
+    serial = processFilesResults(capsys, filenames)
+    assert processFilesResults(capsys, filenames, cache_dir=cache_dir,
+                               cache_hits=len(filenames) - 1) == serial
+
+    # The edited file's old result was replaced, not left behind.
+    new_entries = set(cache_dir.glob('*.pickle'))
+    assert len(new_entries) == len(filenames)
+    old_entry, = entries - new_entries
+    assert old_entry.name.startswith('file1-')
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#
+# Copyright 2025 The Khronos Group Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Purpose:      This file contains differential tests of the spec_tools
+#               macro scanners against the regexes they replace.
+
+import random
+
+import pytest
+
+from check_spec_links import ROOT, makeMacroChecker
+
+# Enough groups to cover every group of MacroChecker.macro_re
+NUM_MACRO_GROUPS = 7
+
+
+@pytest.fixture(scope='module')
+def checker():
+    return makeMacroChecker(set())
+
+
+def assertSameMatches(checker, line):
+    expected = [[m.span(i) for i in range(NUM_MACRO_GROUPS + 1)]
+                for m in checker.macro_re.finditer(line)]
+    actual = [[m.span(i) for i in range(NUM_MACRO_GROUPS + 1)]
+              for m in checker.macro_scanner.finditer(line)]
+    assert actual == expected, line
+
+    expected = [m.span() for m in checker.suspected_missing_macro_re.finditer(line)]
+    actual = [m.span() for m in checker.entity_name_scanner.finditer(line)]
+    assert actual == expected, line
+
+
+def test_groups(checker):
+    assert checker.macro_re.groups == NUM_MACRO_GROUPS
+    assert checker.macro_scanner.groupindex == dict(checker.macro_re.groupindex)
+    assert checker.entity_name_scanner.groupindex == dict(
+        checker.suspected_missing_macro_re.groupindex)
+
+    match = next(checker.macro_scanner.finditer('See **slink:XrFoo[i]**.'))
+    assert match.group() == '**slink:XrFoo[i]**'
+    assert match.group('formatting', 'macro', 'entity_name', 'subscript') == (
+        '**', 'slink', 'XrFoo[i]', '[i]')
+
+
+@pytest.mark.parametrize('line', [
+    '',
+    'flink:xrCreateInstance',
+    'reflink:org.khronos.openxr.permission.ext.HAND_TRACKING.',
+    '**flink:xrFoo*',
+    '*flink:xrFoo**',
+    '__ename:XR_FOO__ and _pname:bar_',
+    'ftext:xrGet*Properties* and ftext:xrGet*',
+    'sname:XrFoo[] slink:XrFoo[ename:XR_BAR] pname:a.b.c[2].d',
+    'pname:a. pname:.b pname:a..b pname:-a-.b*',
+    'flink:flink:xrFoo xrFoo: xrFoo:: elink:',
+    'xrFoo, XrBar* xR_BAZ>> <<xrQux,xrQux>> `xrFoo` xrFoo*bar xrFoo**',
+    'ename:XR_FOO_* and XR_FOO_*',
+])
+def test_lines(checker, line):
+    assertSameMatches(checker, line)
+
+
+def test_random_lines(checker):
+    pieces = ['*', '_', ':', '.', '[', ']', '-', '>>', ' ', ',', '`', 'a', 'X',
+              'xr', 'Xr', 'XR', '1', 'é']
+    pieces += list(checker.entity_db.macros)
+    rng = random.Random(0)
+    for _ in range(20000):
+        assertSameMatches(checker, ''.join(rng.choice(pieces)
+                                           for _ in range(rng.randint(1, 14))))
+
+
+def test_spec_tree(checker):
+    """Compare matches on every line of every .adoc file in the repository."""
+    for filename in sorted(ROOT.glob('**/*.adoc')):
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                assertSameMatches(checker, line.rstrip())
@@ -4,12 +4,13 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import io
 from collections import OrderedDict, namedtuple
 from enum import Enum
 from functools import reduce
 from pathlib import Path
 
-from generator import OutputGenerator, write
+from generator import IncludeWriter, OutputGenerator, write
 from spec_tools.attributes import (ExternSyncEntry, LengthEntry,
                                    has_any_optional_in_param,
                                    parse_optional_from_param)
@@ -237,6 +238,9 @@ class ValidityOutputGenerator(OutputGenerator):
 
         OutputGenerator.beginFile(self, genOpts)
 
+        # The include files are written at the end, and only if changed.
+        self.includeWriter = IncludeWriter(self, genOpts.directory, f'{genOpts.filename}.manifest')
+
     def generateStateValidity(self, validity, command_name):
         begins_states = self.states.get_states(command_name, StateRelationship.BEGIN)
         if begins_states:
@@ -282,7 +286,10 @@ class ValidityOutputGenerator(OutputGenerator):
                 validity += entry
 
     def endFile(self):
+        assert self.genOpts
+        stamp = Path(self.genOpts.directory) / self.genOpts.filename
         OutputGenerator.endFile(self)
+        self.includeWriter.finish(stamp)
 
     def beginFeature(self, interface, emit):
         # Start processing in superclass
@@ -356,7 +363,7 @@ class ValidityOutputGenerator(OutputGenerator):
         filename = directory / (f"{basename}{self.conventions.file_suffix}")
         self.logMsg('diag', '# Generating include file:', str(filename))
 
-        with open(filename, 'w', encoding='utf-8') as fp:
+        with io.StringIO() as fp:
             write(self.conventions.warning_comment, file=fp)
 
             # Valid Usage
@@ -419,6 +426,8 @@ class ValidityOutputGenerator(OutputGenerator):
                 write('****', file=fp)
                 write('', file=fp)
 
+            self.includeWriter.write(filename, fp.getvalue())
+
     def paramIsStaticArray(self, param):
         """Check if the parameter passed in is a static array."""
         tail = param.find('name').tail
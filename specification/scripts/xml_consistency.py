@@ -9,6 +9,7 @@
 #
 # Purpose:      This script checks some "business logic" in the XML registry.
 
+import argparse
 import re
 import sys
 from pathlib import Path
@@ -131,6 +132,7 @@ class EntityDatabase(OrigEntityDatabase):
         # This tries to override and use lxml instead of the built-in etree.
         # lxml isn't suitable for generation, but it's fine for this checking,
         # and it provides file line info which is useful in messages.
+        # Only this fallback uses registry_cache_dir: lxml trees are not cached.
         try:
             import lxml.etree as etree
         except ImportError:
@@ -799,6 +801,12 @@ Other exceptions can be added to xml_consistency.py:EXTENSION_API_NAME_EXCEPTION
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-cachedir', action='store', default=None,
+                        help='Cache the parsed registry in the specified directory, and reuse it while the registry is unchanged (only used without lxml)')
+    args = parser.parse_args()
+    EntityDatabase.registry_cache_dir = args.cachedir
+
     ckr = Checker()
     ckr.check()
 
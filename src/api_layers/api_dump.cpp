@@ -20,6 +20,7 @@
 // Author: Dave Houlton <daveh@lunarg.com>
 //
 
+#include "api_dump_trace.h"
 #include "hex_and_handles.h"
 #include "platform_utils.hpp"
 #include "xr_generated_api_dump.hpp"
@@ -62,6 +63,7 @@ enum ApiDumpRecordType {
     RECORD_TEXT_FILE,
     RECORD_HTML_FILE,
     RECORD_CODE_FILE,
+    RECORD_BINARY_FILE,
 };
 
 struct ApiDumpRecordInfo {
@@ -72,6 +74,7 @@ struct ApiDumpRecordInfo {
 
 static ApiDumpRecordInfo g_record_info = {};
 static std::mutex g_record_mutex = {};
+static ApiDumpTraceWriter g_trace_writer;
 
 // For routing platform_utils.hpp messages.
 void LogPlatformUtilsError(const std::string &message) {
@@ -218,10 +221,23 @@ bool ApiDumpLayerWriteHtmlFooter() {
     }
 }
 
+// Binary trace utilities
+bool ApiDumpLayerStartTrace() { return g_trace_writer.Start(g_record_info.file_name); }
+
+void ApiDumpLayerStopTrace() {
+    g_trace_writer.Stop();
+
+    // Stopping the trace means we're done.
+    if (g_record_info.initialized) {
+        g_record_info.initialized = false;
+        g_record_info.type = RECORD_NONE;
+    }
+}
+
 // Api Dump Utility function to return an instance based on the generated dispatch table
 // pointer.
 XrInstance FindInstanceFromDispatchTable(XrGeneratedDispatchTable *dispatch_table) {
-    std::unique_lock<std::mutex> mlock(g_instance_dispatch_mutex);
+    ApiDumpDispatchReadLock mlock(g_instance_dispatch_mutex);
     XrInstance instance = XR_NULL_HANDLE;
     for (auto it = g_instance_dispatch_map.begin(); it != g_instance_dispatch_map.end();) {
         if (it->second == dispatch_table) {
@@ -233,9 +249,14 @@ XrInstance FindInstanceFromDispatchTable(XrGeneratedDispatchTable *dispatch_tabl
 }
 
 // Function to record all the API dump information
-bool ApiDumpLayerRecordContent(std::vector<std::tuple<std::string, std::string, std::string>> contents) {
+bool ApiDumpLayerRecordContent(const std::vector<std::tuple<std::string, std::string, std::string>> &contents) {
     bool success = false;
     if (g_record_info.initialized) {
+        // The binary trace is written out by a background thread, so it does not
+        // serialize the calling threads on the record mutex.
+        if (g_record_info.type == RECORD_BINARY_FILE) {
+            return g_trace_writer.Record(contents);
+        }
         std::unique_lock<std::mutex> mlock(g_record_mutex);
         uint32_t count = 0;
         switch (g_record_info.type) {
@@ -461,7 +482,7 @@ XRAPI_ATTR XrResult XRAPI_CALL ApiDumpLayerXrGetInstanceProcAddr(XrInstance inst
         // We have not found it, so pass it down to the next layer/runtime
         XrGeneratedDispatchTable *gen_dispatch_table = nullptr;
         {
-            std::unique_lock<std::mutex> mlock(g_instance_dispatch_mutex);
+            ApiDumpDispatchReadLock mlock(g_instance_dispatch_mutex);
             auto map_iter = g_instance_dispatch_map.find(instance);
             if (map_iter == g_instance_dispatch_map.end()) {
                 return XR_ERROR_HANDLE_INVALID;
@@ -504,12 +525,15 @@ XRAPI_ATTR XrResult XRAPI_CALL ApiDumpLayerXrCreateApiLayerInstance(const XrInst
         std::string file_name = PlatformUtilsGetAndroidSystemProperty("debug.api_dump_file_name");
 #endif
 
-        if (!file_name.empty()) {
+        // Instances created while a binary trace is running keep recording into it.
+        bool tracing = g_record_info.type == RECORD_BINARY_FILE;
+
+        if (!file_name.empty() && !tracing) {
             g_record_info.file_name = file_name;
             g_record_info.type = RECORD_TEXT_FILE;
         }
 
-        if (!export_type.empty()) {
+        if (!export_type.empty() && !tracing) {
             std::string export_type_lower = export_type;
             std::transform(export_type.begin(), export_type.end(), export_type_lower.begin(),
                            [](unsigned char c) { return std::tolower(c); });
@@ -527,6 +551,11 @@ XRAPI_ATTR XrResult XRAPI_CALL ApiDumpLayerXrCreateApiLayerInstance(const XrInst
                 }
             } else if (export_type_lower == "code") {
                 g_record_info.type = RECORD_CODE_FILE;
+            } else if (export_type_lower == "binary" && first_time) {
+                g_record_info.type = RECORD_BINARY_FILE;
+                if (!ApiDumpLayerStartTrace()) {
+                    return XR_ERROR_INITIALIZATION_FAILED;
+                }
             }
         }
 
@@ -616,7 +645,7 @@ XRAPI_ATTR XrResult XRAPI_CALL ApiDumpLayerXrCreateApiLayerInstance(const XrInst
         auto *next_dispatch = new XrGeneratedDispatchTable();
         GeneratedXrPopulateDispatchTable(next_dispatch, returned_instance, next_get_instance_proc_addr);
 
-        std::unique_lock<std::mutex> mlock(g_instance_dispatch_mutex);
+        std::unique_lock<ApiDumpDispatchMutex> mlock(g_instance_dispatch_mutex);
         g_instance_dispatch_map[returned_instance] = next_dispatch;
 
         return result;
@@ -634,7 +663,7 @@ XRAPI_ATTR XrResult XRAPI_CALL ApiDumpLayerXrDestroyInstance(XrInstance instance
 
     XrGeneratedDispatchTable *next_dispatch = nullptr;
     {
-        std::unique_lock<std::mutex> mlock(g_instance_dispatch_mutex);
+        ApiDumpDispatchReadLock mlock(g_instance_dispatch_mutex);
         auto map_iter = g_instance_dispatch_map.find(instance);
         if (map_iter != g_instance_dispatch_map.end()) {
             next_dispatch = map_iter->second;
@@ -648,9 +677,11 @@ XRAPI_ATTR XrResult XRAPI_CALL ApiDumpLayerXrDestroyInstance(XrInstance instance
     next_dispatch->DestroyInstance(instance);
     ApiDumpCleanUpMapsForTable(next_dispatch);
 
-    // Write out the HTML footer if we destroy the last instance
+    // Write out the HTML footer, or the rest of the binary trace, if we destroy the last instance
     if (g_instance_dispatch_map.empty() && g_record_info.type == RECORD_HTML_FILE) {
         ApiDumpLayerWriteHtmlFooter();
+    } else if (g_instance_dispatch_map.empty() && g_record_info.type == RECORD_BINARY_FILE) {
+        ApiDumpLayerStopTrace();
     }
     return XR_SUCCESS;
 }
@@ -0,0 +1,258 @@
+// Copyright (c) 2017-2025 The Khronos Group Inc.
+//
+// SPDX-License-Identifier: Apache-2.0
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+//
+
+#ifndef API_DUMP_TRACE_H_
+#define API_DUMP_TRACE_H_ 1
+
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+#include <cstring>
+#include <fstream>
+#include <functional>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <tuple>
+#include <vector>
+
+// Binary trace of the API dump layer, decoded by src/scripts/decode_api_dump_trace.py.
+//
+// The file starts with the 8 byte magic "XRAPIDMP" and a uint32_t format version,
+// followed by records.  All integers are little-endian.  Each record is
+//   uint32_t size        size of the rest of the record
+//   uint8_t  kind        API_DUMP_TRACE_CALL or API_DUMP_TRACE_DROPPED
+//   uint64_t thread      hash of the recording thread's id
+// followed, for a call, by a uint32_t entry count and, for each entry, the type, name
+// and value strings, each as a uint32_t length and its bytes.  A dropped record holds
+// the uint64_t number of calls that thread could not record because its buffer was full.
+#define API_DUMP_TRACE_MAGIC "XRAPIDMP"
+#define API_DUMP_TRACE_VERSION 1
+#define API_DUMP_TRACE_CALL 0
+#define API_DUMP_TRACE_DROPPED 1
+
+// Single producer, single consumer ring of bytes.  The producer only ever publishes whole
+// records, so the consumer never sees a partial one.
+class ApiDumpTraceRing {
+   public:
+    // Capacity must be a power of two.
+    explicit ApiDumpTraceRing(size_t capacity) : buffer_(capacity), mask_(capacity - 1) {}
+
+    // Producer: append a record, or count it as dropped if there is not enough room.
+    bool Push(const uint8_t *data, size_t size) {
+        uint64_t head = head_.load(std::memory_order_relaxed);
+        uint64_t tail = tail_.load(std::memory_order_acquire);
+        if (buffer_.size() - static_cast<size_t>(head - tail) < size) {
+            dropped_.fetch_add(1, std::memory_order_relaxed);
+            return false;
+        }
+        size_t offset = static_cast<size_t>(head) & mask_;
+        size_t first = std::min(size, buffer_.size() - offset);
+        memcpy(&buffer_[offset], data, first);
+        memcpy(&buffer_[0], data + first, size - first);
+        head_.store(head + size, std::memory_order_release);
+        return true;
+    }
+
+    // Consumer: append all published records to out, and return how many bytes that was.
+    size_t Drain(std::vector<uint8_t> &out) {
+        uint64_t tail = tail_.load(std::memory_order_relaxed);
+        uint64_t head = head_.load(std::memory_order_acquire);
+        size_t size = static_cast<size_t>(head - tail);
+        size_t offset = static_cast<size_t>(tail) & mask_;
+        size_t first = std::min(size, buffer_.size() - offset);
+        out.insert(out.end(), buffer_.begin() + offset, buffer_.begin() + offset + first);
+        out.insert(out.end(), buffer_.begin(), buffer_.begin() + (size - first));
+        tail_.store(head, std::memory_order_release);
+        return size;
+    }
+
+    // Consumer: return the number of records dropped since the last call.
+    uint64_t TakeDropped() { return dropped_.exchange(0, std::memory_order_relaxed); }
+
+    uint64_t thread_hash = 0;
+    std::atomic<bool> in_use{false};
+
+   private:
+    std::vector<uint8_t> buffer_;
+    size_t mask_;
+    std::atomic<uint64_t> head_{0};
+    std::atomic<uint64_t> tail_{0};
+    std::atomic<uint64_t> dropped_{0};
+};
+
+// Records calls into a ring per thread, which a background thread writes out to the
+// trace file.  Recording never blocks: when a thread's ring is full the call is dropped
+// and the number of dropped calls is written to the trace instead.
+class ApiDumpTraceWriter {
+   public:
+    static const size_t kRingCapacity = 1 << 20;
+
+    ~ApiDumpTraceWriter() { Stop(); }
+
+    // Open the trace file and start the writer thread.
+    bool Start(const std::string &file_name) {
+        std::unique_lock<std::mutex> lock(control_mutex_);
+        if (running_) {
+            return true;
+        }
+        file_.open(file_name, std::ios::out | std::ios::binary | std::ios::trunc);
+        if (!file_.is_open()) {
+            return false;
+        }
+        file_.write(API_DUMP_TRACE_MAGIC, 8);
+        std::vector<uint8_t> version;
+        PutU32(version, API_DUMP_TRACE_VERSION);
+        file_.write(reinterpret_cast<const char *>(version.data()), version.size());
+        running_ = true;
+        stopping_.store(false, std::memory_order_relaxed);
+        thread_ = std::thread(&ApiDumpTraceWriter::Run, this);
+        return true;
+    }
+
+    // Write out everything recorded so far, stop the writer thread and close the file.
+    void Stop() {
+        std::unique_lock<std::mutex> lock(control_mutex_);
+        if (!running_) {
+            return;
+        }
+        stopping_.store(true, std::memory_order_relaxed);
+        thread_.join();
+        DrainAll();
+        file_.close();
+        running_ = false;
+    }
+
+    // Record a call, given as the (type, name, value) entries of the API dump layer.
+    bool Record(const std::vector<std::tuple<std::string, std::string, std::string>> &contents) {
+        ApiDumpTraceRing *ring = ThreadRing();
+        std::vector<uint8_t> &record = CurrentThreadState().scratch;
+        record.clear();
+        PutU32(record, 0);
+        record.push_back(API_DUMP_TRACE_CALL);
+        PutU64(record, ring->thread_hash);
+        PutU32(record, static_cast<uint32_t>(contents.size()));
+        for (const auto &content : contents) {
+            PutString(record, std::get<0>(content));
+            PutString(record, std::get<1>(content));
+            PutString(record, std::get<2>(content));
+        }
+        uint32_t size = static_cast<uint32_t>(record.size() - 4);
+        for (int i = 0; i < 4; ++i) {
+            record[i] = static_cast<uint8_t>(size >> (8 * i));
+        }
+        return ring->Push(record.data(), record.size());
+    }
+
+   private:
+    // The ring and record buffer of the current thread.  The ring is returned to the pool
+    // when the thread exits, so only threads that are alive at the same time need a ring.
+    struct ThreadState {
+        ApiDumpTraceRing *ring = nullptr;
+        std::vector<uint8_t> scratch;
+        ~ThreadState() {
+            if (ring != nullptr) {
+                ring->in_use.store(false, std::memory_order_release);
+            }
+        }
+    };
+
+    static ThreadState &CurrentThreadState() {
+        static thread_local ThreadState state;
+        return state;
+    }
+
+    ApiDumpTraceRing *ThreadRing() {
+        ThreadState &state = CurrentThreadState();
+        if (state.ring == nullptr) {
+            std::unique_lock<std::mutex> lock(rings_mutex_);
+            for (auto &ring : rings_) {
+                bool expected = false;
+                if (ring->in_use.compare_exchange_strong(expected, true, std::memory_order_acquire)) {
+                    state.ring = ring.get();
+                    break;
+                }
+            }
+            if (state.ring == nullptr) {
+                rings_.emplace_back(new ApiDumpTraceRing(kRingCapacity));
+                state.ring = rings_.back().get();
+                state.ring->in_use.store(true, std::memory_order_relaxed);
+            }
+            state.ring->thread_hash = std::hash<std::thread::id>()(std::this_thread::get_id());
+        }
+        return state.ring;
+    }
+
+    void Run() {
+        while (!stopping_.load(std::memory_order_relaxed)) {
+            if (DrainAll() == 0) {
+                std::this_thread::sleep_for(std::chrono::milliseconds(2));
+            }
+        }
+    }
+
+    size_t DrainAll() {
+        size_t total = 0;
+        pending_.clear();
+        {
+            std::unique_lock<std::mutex> lock(rings_mutex_);
+            for (auto &ring : rings_) {
+                total += ring->Drain(pending_);
+                uint64_t dropped = ring->TakeDropped();
+                if (dropped != 0) {
+                    PutU32(pending_, 1 + 8 + 8);
+                    pending_.push_back(API_DUMP_TRACE_DROPPED);
+                    PutU64(pending_, ring->thread_hash);
+                    PutU64(pending_, dropped);
+                }
+            }
+        }
+        file_.write(reinterpret_cast<const char *>(pending_.data()), pending_.size());
+        return total;
+    }
+
+    static void PutU32(std::vector<uint8_t> &out, uint32_t value) {
+        for (int i = 0; i < 4; ++i) {
+            out.push_back(static_cast<uint8_t>(value >> (8 * i)));
+        }
+    }
+
+    static void PutU64(std::vector<uint8_t> &out, uint64_t value) {
+        for (int i = 0; i < 8; ++i) {
+            out.push_back(static_cast<uint8_t>(value >> (8 * i)));
+        }
+    }
+
+    static void PutString(std::vector<uint8_t> &out, const std::string &value) {
+        PutU32(out, static_cast<uint32_t>(value.size()));
+        out.insert(out.end(), value.begin(), value.end());
+    }
+
+    std::mutex control_mutex_;
+    bool running_ = false;
+    std::atomic<bool> stopping_{false};
+    std::thread thread_;
+    std::ofstream file_;
+
+    std::mutex rings_mutex_;
+    std::vector<std::unique_ptr<ApiDumpTraceRing>> rings_;
+    std::vector<uint8_t> pending_;
+};
+
+#endif  // API_DUMP_TRACE_H_
@@ -32,10 +32,12 @@
 #include <openxr/openxr.h>
 #include <openxr/openxr_platform.h>
 
+#include <array>
 #include <vector>
 #include <unordered_map>
 #include <string>
 #include <mutex>
+#include <shared_mutex>
 #include <memory>
 
 /// Prints a message to stderr then throws an exception.
@@ -133,13 +135,31 @@ enum GenValidUsageDebugSeverity {
 void EraseAllInstanceTableMapElements(GenValidUsageXrInstanceInfo *search_value);
 
 typedef std::unique_lock<std::mutex> UniqueLock;
-template <typename HandleType, typename InfoType>
+
+/// Locking policy for handle info maps: every access locks a single mutex.
+struct MutexLocking {
+    typedef std::mutex mutex_t;
+    typedef std::unique_lock<std::mutex> read_lock_t;
+    typedef std::unique_lock<std::mutex> write_lock_t;
+};
+
+/// Locking policy for handle info maps: lookups share a reader-writer lock,
+/// so only inserting and removing handles serializes calls.
+struct SharedLocking {
+    typedef std::shared_timed_mutex mutex_t;
+    typedef std::shared_lock<std::shared_timed_mutex> read_lock_t;
+    typedef std::unique_lock<std::shared_timed_mutex> write_lock_t;
+};
+
+template <typename HandleType, typename InfoType, typename Locking = MutexLocking>
 class HandleInfoBase {
    public:
     typedef InfoType info_t;
     typedef HandleType handle_t;
     typedef std::unordered_map<HandleType, std::unique_ptr<InfoType>> map_t;
     typedef typename map_t::value_type value_t;
+    typedef typename Locking::read_lock_t read_lock_t;
+    typedef typename Locking::write_lock_t write_lock_t;
 
     /// Validate a handle.
     ///
@@ -150,8 +170,8 @@ class HandleInfoBase {
     /// Throws if not found.
     InfoType *get(HandleType handle);
 
-    /// Lookup a handle, returning a pointer (if found) as well as a lock for this object's dispatch mutex.
-    std::pair<UniqueLock, InfoType *> getWithLock(HandleType handle);
+    /// Lookup a handle, returning a pointer (if found) as well as an exclusive lock for this object's dispatch mutex.
+    std::pair<write_lock_t, InfoType *> getWithLock(HandleType handle);
 
     bool empty() const { return info_map_.empty(); }
 
@@ -164,29 +184,32 @@ class HandleInfoBase {
     void erase(HandleType handle);
 
     /// Get a constant reference to the whole map as well as a lock for this object's dispatch mutex.
-    std::pair<UniqueLock, map_t const &> lockMapConst();
+    std::pair<read_lock_t, map_t const &> lockMapConst();
 
-    /// Get a  reference to the whole map as well as a lock for this object's dispatch mutex.
-    std::pair<UniqueLock, map_t &> lockMap();
+    /// Get a  reference to the whole map as well as an exclusive lock for this object's dispatch mutex.
+    std::pair<write_lock_t, map_t &> lockMap();
 
    protected:
     map_t info_map_;
-    std::mutex dispatch_mutex_;
+    typename Locking::mutex_t dispatch_mutex_;
 };
 
 /// Subclass used exclusively for instances.
-class InstanceHandleInfo : public HandleInfoBase<XrInstance, GenValidUsageXrInstanceInfo> {
+template <typename Locking>
+class BasicInstanceHandleInfo : public HandleInfoBase<XrInstance, GenValidUsageXrInstanceInfo, Locking> {
    public:
-    typedef HandleInfoBase<XrInstance, GenValidUsageXrInstanceInfo> base_t;
+    typedef HandleInfoBase<XrInstance, GenValidUsageXrInstanceInfo, Locking> base_t;
     typedef typename base_t::info_t info_t;
     typedef typename base_t::handle_t handle_t;
 };
 
+typedef BasicInstanceHandleInfo<MutexLocking> InstanceHandleInfo;
+
 /// Generic handle info for everything-except-instance handles.
-template <typename HandleType>
-class HandleInfo : public HandleInfoBase<HandleType, GenValidUsageXrHandleInfo> {
+template <typename HandleType, typename Locking = MutexLocking>
+class HandleInfo : public HandleInfoBase<HandleType, GenValidUsageXrHandleInfo, Locking> {
    public:
-    typedef HandleInfoBase<HandleType, GenValidUsageXrHandleInfo> base_t;
+    typedef HandleInfoBase<HandleType, GenValidUsageXrHandleInfo, Locking> base_t;
     typedef typename base_t::info_t info_t;
     typedef typename base_t::handle_t handle_t;
 
@@ -198,6 +221,48 @@ class HandleInfo : public HandleInfoBase<HandleType, GenValidUsageXrHandleInfo>
     void removeHandlesForInstance(GenValidUsageXrInstanceInfo *search_value);
 };
 
+/// Handle info for everything-except-instance handles, split into shards that each have their own map and mutex.
+///
+/// Calls on different handles usually lock different shards, so they do not contend.
+/// Has the same interface as HandleInfo, except for access to the whole map.
+template <typename HandleType, typename Locking = MutexLocking, size_t ShardCount = 16>
+class ShardedHandleInfo {
+   public:
+    typedef HandleInfo<HandleType, Locking> shard_t;
+    typedef typename shard_t::info_t info_t;
+    typedef typename shard_t::handle_t handle_t;
+    typedef typename shard_t::write_lock_t write_lock_t;
+
+    ValidateXrHandleResult verifyHandle(HandleType const *handle_to_check) {
+        if (nullptr == handle_to_check) {
+            return VALIDATE_XR_HANDLE_INVALID;
+        }
+        return shardFor(*handle_to_check).verifyHandle(handle_to_check);
+    }
+
+    info_t *get(HandleType handle) { return shardFor(handle).get(handle); }
+
+    std::pair<write_lock_t, info_t *> getWithLock(HandleType handle) { return shardFor(handle).getWithLock(handle); }
+
+    bool empty() const;
+
+    void insert(HandleType handle, std::unique_ptr<info_t> &&info) { shardFor(handle).insert(handle, std::move(info)); }
+
+    void erase(HandleType handle) { shardFor(handle).erase(handle); }
+
+    std::pair<GenValidUsageXrHandleInfo *, GenValidUsageXrInstanceInfo *> getWithInstanceInfo(HandleType handle) {
+        return shardFor(handle).getWithInstanceInfo(handle);
+    }
+
+    /// Removes handles associated with an instance, one shard at a time.
+    void removeHandlesForInstance(GenValidUsageXrInstanceInfo *search_value);
+
+   private:
+    shard_t &shardFor(HandleType handle);
+
+    std::array<shard_t, ShardCount> shards_;
+};
+
 /// Function to record all the core validation information
 void CoreValidLogMessage(GenValidUsageXrInstanceInfo *instance_info, const std::string &message_id,
                          GenValidUsageDebugSeverity message_severity, const std::string &command_name,
@@ -212,18 +277,20 @@ std::string StructTypesToString(GenValidUsageXrInstanceInfo *instance_info, cons
 
 // -- Only implementations of templates follow --//
 
-template <typename HT, typename IT>
-inline std::pair<UniqueLock, typename HandleInfoBase<HT, IT>::map_t const &> HandleInfoBase<HT, IT>::lockMapConst() {
-    return {UniqueLock(dispatch_mutex_), info_map_};
+template <typename HT, typename IT, typename L>
+inline std::pair<typename HandleInfoBase<HT, IT, L>::read_lock_t, typename HandleInfoBase<HT, IT, L>::map_t const &>
+HandleInfoBase<HT, IT, L>::lockMapConst() {
+    return {read_lock_t(dispatch_mutex_), info_map_};
 }
 
-template <typename HT, typename IT>
-inline std::pair<UniqueLock, typename HandleInfoBase<HT, IT>::map_t &> HandleInfoBase<HT, IT>::lockMap() {
-    return {UniqueLock(dispatch_mutex_), info_map_};
+template <typename HT, typename IT, typename L>
+inline std::pair<typename HandleInfoBase<HT, IT, L>::write_lock_t, typename HandleInfoBase<HT, IT, L>::map_t &>
+HandleInfoBase<HT, IT, L>::lockMap() {
+    return {write_lock_t(dispatch_mutex_), info_map_};
 }
 
-template <typename HandleType, typename InfoType>
-inline ValidateXrHandleResult HandleInfoBase<HandleType, InfoType>::verifyHandle(HandleType const *handle_to_check) {
+template <typename HandleType, typename InfoType, typename Locking>
+inline ValidateXrHandleResult HandleInfoBase<HandleType, InfoType, Locking>::verifyHandle(HandleType const *handle_to_check) {
     try {
         if (nullptr == handle_to_check) {
             return VALIDATE_XR_HANDLE_INVALID;
@@ -235,7 +302,7 @@ inline ValidateXrHandleResult HandleInfoBase<HandleType, InfoType>::verifyHandle
         }
 
         // Try to find the handle in the appropriate map
-        UniqueLock lock(dispatch_mutex_);
+        read_lock_t lock(dispatch_mutex_);
         auto entry_returned = info_map_.find(*handle_to_check);
         // If it is not a valid handle, it should return the end of the map.
         if (info_map_.end() == entry_returned) {
@@ -247,13 +314,13 @@ inline ValidateXrHandleResult HandleInfoBase<HandleType, InfoType>::verifyHandle
     }
 }
 
-template <typename HandleType, typename InfoType>
-inline InfoType *HandleInfoBase<HandleType, InfoType>::get(HandleType handle) {
+template <typename HandleType, typename InfoType, typename Locking>
+inline InfoType *HandleInfoBase<HandleType, InfoType, Locking>::get(HandleType handle) {
     if (handle == XR_NULL_HANDLE) {
         reportInternalError("Null handle passed to HandleInfoBase::get()");
     }
     // Try to find the handle in the appropriate map
-    UniqueLock lock(dispatch_mutex_);
+    read_lock_t lock(dispatch_mutex_);
     auto entry_returned = info_map_.find(handle);
     if (entry_returned == info_map_.end()) {
         reportInternalError("Handle passed to HandleInfoBase::insert() not inserted");
@@ -261,13 +328,14 @@ inline InfoType *HandleInfoBase<HandleType, InfoType>::get(HandleType handle) {
     return entry_returned->second.get();
 }
 
-template <typename HandleType, typename InfoType>
-inline std::pair<UniqueLock, InfoType *> HandleInfoBase<HandleType, InfoType>::getWithLock(HandleType handle) {
+template <typename HandleType, typename InfoType, typename Locking>
+inline std::pair<typename HandleInfoBase<HandleType, InfoType, Locking>::write_lock_t, InfoType *>
+HandleInfoBase<HandleType, InfoType, Locking>::getWithLock(HandleType handle) {
     if (handle == XR_NULL_HANDLE) {
         reportInternalError("Null handle passed to HandleInfoBase::getWithLock()");
     }
     // Try to find the handle in the appropriate map
-    UniqueLock lock(dispatch_mutex_);
+    write_lock_t lock(dispatch_mutex_);
     auto it = info_map_.find(handle);
     // If it is not a valid handle, it should return the end of the map.
     if (info_map_.end() == it) {
@@ -276,12 +344,12 @@ inline std::pair<UniqueLock, InfoType *> HandleInfoBase<HandleType, InfoType>::g
     return {std::move(lock), it->second.get()};
 }
 
-template <typename HandleType, typename InfoType>
-inline void HandleInfoBase<HandleType, InfoType>::insert(HandleType handle, std::unique_ptr<InfoType> &&info) {
+template <typename HandleType, typename InfoType, typename Locking>
+inline void HandleInfoBase<HandleType, InfoType, Locking>::insert(HandleType handle, std::unique_ptr<InfoType> &&info) {
     if (handle == XR_NULL_HANDLE) {
         reportInternalError("Null handle passed to HandleInfoBase::insert()");
     }
-    UniqueLock lock(dispatch_mutex_);
+    write_lock_t lock(dispatch_mutex_);
     auto entry_returned = info_map_.find(handle);
     if (entry_returned != info_map_.end()) {
         reportInternalError("Handle passed to HandleInfoBase::insert() already inserted");
@@ -289,12 +357,12 @@ inline void HandleInfoBase<HandleType, InfoType>::insert(HandleType handle, std:
     info_map_[handle] = std::move(info);
 }
 
-template <typename HandleType, typename InfoType>
-inline void HandleInfoBase<HandleType, InfoType>::erase(HandleType handle) {
+template <typename HandleType, typename InfoType, typename Locking>
+inline void HandleInfoBase<HandleType, InfoType, Locking>::erase(HandleType handle) {
     if (handle == XR_NULL_HANDLE) {
         reportInternalError("Null handle passed to HandleInfoBase::erase()");
     }
-    UniqueLock lock(dispatch_mutex_);
+    write_lock_t lock(dispatch_mutex_);
     auto entry_returned = info_map_.find(handle);
     if (entry_returned == info_map_.end()) {
         reportInternalError("Handle passed to HandleInfoBase::insert() not inserted");
@@ -302,14 +370,14 @@ inline void HandleInfoBase<HandleType, InfoType>::erase(HandleType handle) {
     info_map_.erase(handle);
 }
 
-template <typename HandleType>
-inline std::pair<GenValidUsageXrHandleInfo *, GenValidUsageXrInstanceInfo *> HandleInfo<HandleType>::getWithInstanceInfo(
+template <typename HandleType, typename Locking>
+inline std::pair<GenValidUsageXrHandleInfo *, GenValidUsageXrInstanceInfo *> HandleInfo<HandleType, Locking>::getWithInstanceInfo(
     HandleType handle) {
     if (handle == XR_NULL_HANDLE) {
         reportInternalError("Null handle passed to HandleInfoBase::getWithInstanceInfo()");
     }
     // Try to find the handle in the appropriate map
-    UniqueLock lock(this->dispatch_mutex_);
+    typename base_t::read_lock_t lock(this->dispatch_mutex_);
     auto entry_returned = this->info_map_.find(handle);
     if (entry_returned == this->info_map_.end()) {
         reportInternalError("Handle passed to HandleInfoBase::getWithInstanceInfo() not inserted");
@@ -319,11 +387,39 @@ inline std::pair<GenValidUsageXrHandleInfo *, GenValidUsageXrInstanceInfo *> Han
     return {info, instance_info};
 }
 
-template <typename HandleType>
-inline void HandleInfo<HandleType>::removeHandlesForInstance(GenValidUsageXrInstanceInfo *search_value) {
+template <typename HandleType, typename Locking>
+inline void HandleInfo<HandleType, Locking>::removeHandlesForInstance(GenValidUsageXrInstanceInfo *search_value) {
     typedef typename base_t::value_t value_t;
-    UniqueLock lock(this->dispatch_mutex_);
+    typename base_t::write_lock_t lock(this->dispatch_mutex_);
     map_erase_if(this->info_map_, [=](value_t const &data) { return data.second && data.second->instance_info == search_value; });
 }
 
+template <typename HandleType, typename Locking, size_t ShardCount>
+inline bool ShardedHandleInfo<HandleType, Locking, ShardCount>::empty() const {
+    for (auto const &shard : shards_) {
+        if (!shard.empty()) {
+            return false;
+        }
+    }
+    return true;
+}
+
+template <typename HandleType, typename Locking, size_t ShardCount>
+inline void ShardedHandleInfo<HandleType, Locking, ShardCount>::removeHandlesForInstance(GenValidUsageXrInstanceInfo *search_value) {
+    for (auto &shard : shards_) {
+        shard.removeHandlesForInstance(search_value);
+    }
+}
+
+template <typename HandleType, typename Locking, size_t ShardCount>
+inline typename ShardedHandleInfo<HandleType, Locking, ShardCount>::shard_t &ShardedHandleInfo<HandleType, Locking, ShardCount>::shardFor(
+    HandleType handle) {
+    // Handles are often aligned pointers, so mix the high bits into the low ones before picking a shard.
+    uint64_t bits = MakeHandleGeneric(handle);
+    bits ^= bits >> 33;
+    bits *= 0xff51afd7ed558ccdULL;
+    bits ^= bits >> 33;
+    return shards_[bits % ShardCount];
+}
+
 #endif  // VALIDATION_UTILS_H_
@@ -26,8 +26,8 @@
 
 import dataclasses
 
-from automatic_source_generator import (AutomaticSourceOutputGenerator, CurrentExtensionTracker,
-                                        undecorate)
+from automatic_source_generator import (AutomaticSourceGeneratorOptions, AutomaticSourceOutputGenerator,
+                                        CurrentExtensionTracker, undecorate)
 from generator import write
 
 # The following commands should not be generated for the layer
@@ -48,6 +48,33 @@ LOADER_STRUCTS = [
     'XrNegotiateApiLayerRequest',
 ]
 
+# The mutex type guarding each dispatch map, and the lock taken to look up a
+# dispatch table in it, for each choice of ApiDumpGeneratorOptions.dispatchMapLocking.
+# Inserting and erasing always take a std::unique_lock.
+DISPATCH_MAP_LOCKING = {
+    # One mutex per map.
+    'mutex': ('std::mutex', 'std::unique_lock'),
+    # One reader-writer lock per map, so that lookups run concurrently.
+    'shared': ('std::shared_timed_mutex', 'std::shared_lock'),
+}
+
+
+class ApiDumpGeneratorOptions(AutomaticSourceGeneratorOptions):
+    """ApiDumpGeneratorOptions - subclass of AutomaticSourceGeneratorOptions."""
+
+    def __init__(self, dispatchMapLocking='mutex', **kwargs):
+        """Constructor.
+
+        - dispatchMapLocking - how the generated dispatch maps are locked,
+          one of the keys of DISPATCH_MAP_LOCKING.
+
+        Other arguments are passed to AutomaticSourceGeneratorOptions."""
+        AutomaticSourceGeneratorOptions.__init__(self, **kwargs)
+        if dispatchMapLocking not in DISPATCH_MAP_LOCKING:
+            raise ValueError(f'Unknown dispatch map locking {dispatchMapLocking}, expected one of {", ".join(DISPATCH_MAP_LOCKING)}')
+        self.dispatchMapLocking = dispatchMapLocking
+
+
 # ApiDumpOutputGenerator - subclass of AutomaticSourceOutputGenerator.
 
 
@@ -63,12 +90,19 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
         generated_warning += '// ************************************************************\n'
         write(generated_warning, file=self.outFile)
 
+    # Return the mutex type guarding the dispatch maps, and the lock template used
+    # to look up a dispatch table in them.
+    #   self            the ApiDumpOutputGenerator object
+    def dispatchMapLocking(self):
+        return DISPATCH_MAP_LOCKING[getattr(self.genOpts, 'dispatchMapLocking', 'mutex')]
+
     # Call the base class to properly begin the file, and then add
     # the file-specific header information.
     #   self            the ApiDumpOutputGenerator object
     #   gen_opts        the ApiDumpGeneratorOptions object
     def beginFile(self, genOpts):
         AutomaticSourceOutputGenerator.beginFile(self, genOpts)
+        mutex_type, _ = self.dispatchMapLocking()
         preamble = ''
         if self.genOpts.filename == 'xr_generated_api_dump.hpp':
             preamble += '#pragma once\n\n'
@@ -76,6 +110,8 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
             preamble += '#include <openxr/openxr.h>\n'
             preamble += '#include <openxr/openxr_platform.h>\n\n'
             preamble += '#include <mutex>\n'
+            if mutex_type == 'std::shared_timed_mutex':
+                preamble += '#include <shared_mutex>\n'
             preamble += '#include <string>\n'
             preamble += '#include <tuple>\n'
             preamble += '#include <unordered_map>\n'
@@ -87,6 +123,8 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
             preamble += '#include "hex_and_handles.h"\n\n'
             preamble += '#include <cstring>\n'
             preamble += '#include <mutex>\n'
+            if mutex_type == 'std::shared_timed_mutex':
+                preamble += '#include <shared_mutex>\n'
             preamble += '#include <sstream>\n'
             preamble += '#include <iomanip>\n'
             preamble += '#include <unordered_map>\n\n'
@@ -96,17 +134,22 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
     # and then call down to the base class to wrap everything up.
     #   self            the ApiDumpOutputGenerator object
     def endFile(self):
-        file_data = ''
+        out = self.makeSourceEmitter()
         if self.genOpts.filename == 'xr_generated_api_dump.hpp':
-            file_data += self.outputLayerHeaderPrototypes()
-            file_data += self.outputApiDumpExterns()
+            with out.section('prototypes and externs'):
+                out += self.outputLayerHeaderPrototypes()
+                out += self.outputApiDumpExterns()
 
         elif self.genOpts.filename == 'xr_generated_api_dump.cpp':
-            file_data += self.outputApiDumpMapMutexItems()
-            file_data += self.writeApiDumpUnionStructFuncs()
-            file_data += self.outputLayerCommands()
+            with out.section('maps and mutexes'):
+                out += self.outputApiDumpMapMutexItems()
+            with out.section('unions and structs'):
+                self.writeApiDumpUnionStructFuncs(out)
+            with out.section('commands'):
+                self.outputLayerCommands(out)
 
-        write(file_data, file=self.outFile)
+        out += '\n'
+        self.finishSourceEmitter(out)
 
         # Finish processing in superclass
         AutomaticSourceOutputGenerator.endFile(self)
@@ -115,14 +158,17 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
     # generated code.
     #   self            the ApiDumpOutputGenerator object
     def outputApiDumpExterns(self):
+        mutex_type, read_lock = self.dispatchMapLocking()
         externs = '\n// Externs for API dump\n'
+        externs += f'typedef {mutex_type} ApiDumpDispatchMutex;\n'
+        externs += f'typedef {read_lock}<ApiDumpDispatchMutex> ApiDumpDispatchReadLock;\n'
         for handle in self.api_handles:
             base_handle_name = undecorate(handle.name)
             if handle.protect_value is not None:
                 externs += f'#if {handle.protect_string}\n'
             externs += 'extern std::unordered_map<%s, XrGeneratedDispatchTable*> g_%s_dispatch_map;\n' % (
                 handle.name, base_handle_name)
-            externs += f'extern std::mutex g_{base_handle_name}_dispatch_mutex;\n'
+            externs += f'extern {mutex_type} g_{base_handle_name}_dispatch_mutex;\n'
             if handle.protect_value is not None:
                 externs += f'#endif // {handle.protect_string}\n'
         externs += 'void ApiDumpCleanUpMapsForTable(XrGeneratedDispatchTable *table);\n'
@@ -138,7 +184,7 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
         generated_prototypes += '// Api Dump Inner inner xrGetInstanceProcAddr helper\n'
         generated_prototypes += 'PFN_xrVoidFunction ApiDumpLayerInnerGetInstanceProcAddr(const char* name);\n\n'
         generated_prototypes += '// Api Dump Log Command\n'
-        generated_prototypes += 'bool ApiDumpLayerRecordContent(std::vector<std::tuple<std::string, std::string, std::string>> contents);\n\n'
+        generated_prototypes += 'bool ApiDumpLayerRecordContent(const std::vector<std::tuple<std::string, std::string, std::string>> &contents);\n\n'
         generated_prototypes += '// Api Dump Manual Functions\n'
         generated_prototypes += 'XrInstance FindInstanceFromDispatchTable(XrGeneratedDispatchTable* dispatch_table);\n'
         generated_prototypes += 'XRAPI_ATTR XrResult XRAPI_CALL ApiDumpLayerXrCreateInstance(const XrInstanceCreateInfo *info,\n'
@@ -175,6 +221,7 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
     # been deleted.
     #   self            the ApiDumpOutputGenerator object
     def outputApiDumpMapMutexItems(self):
+        mutex_type, _ = self.dispatchMapLocking()
         maps_mutexes = ''
         for handle in self.api_handles:
             base_handle_name = undecorate(handle.name)
@@ -182,14 +229,14 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
                 maps_mutexes += f'#if {handle.protect_string}\n'
             maps_mutexes += 'std::unordered_map<%s, XrGeneratedDispatchTable*> g_%s_dispatch_map;\n' % (
                 handle.name, base_handle_name)
-            maps_mutexes += f'std::mutex g_{base_handle_name}_dispatch_mutex;\n'
+            maps_mutexes += f'{mutex_type} g_{base_handle_name}_dispatch_mutex;\n'
             if handle.protect_value:
                 maps_mutexes += f'#endif // {handle.protect_string}\n'
         maps_mutexes += '\n'
         maps_mutexes += '// Template function to reduce duplicating the map locking, searching, and deleting.`\n'
         maps_mutexes += 'template <typename MapType>\n'
-        maps_mutexes += 'void eraseAllTableMapElements(MapType &search_map, std::mutex &mutex, XrGeneratedDispatchTable *search_value) {\n'
-        maps_mutexes += '    std::unique_lock<std::mutex> lock(mutex);\n'
+        maps_mutexes += f'void eraseAllTableMapElements(MapType &search_map, {mutex_type} &mutex, XrGeneratedDispatchTable *search_value) {{\n'
+        maps_mutexes += f'    std::unique_lock<{mutex_type}> lock(mutex);\n'
         maps_mutexes += '    for (auto it = search_map.begin(); it != search_map.end();) {\n'
         maps_mutexes += '        if (it->second == search_value) {\n'
         maps_mutexes += '            search_map.erase(it++);\n'
@@ -865,56 +912,57 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
 
     # Write the C++ Api Dump function for every union and structure we know about.
     #   self            the ApiDumpOutputGenerator object
-    def writeApiDumpUnionStructFuncs(self):
-        struct_union_check = '\n// Union/Structure Output Helper functions\n'
+    #   out             the SourceEmitter to write to
+    def writeApiDumpUnionStructFuncs(self, out):
+        out += '\n// Union/Structure Output Helper functions\n'
         for xr_union in self.api_unions:
             if xr_union.protect_value:
-                struct_union_check += f'#if {xr_union.protect_string}\n'
-            struct_union_check += f'bool ApiDumpOutputXrUnion(XrGeneratedDispatchTable* gen_dispatch_table, const {xr_union.name}* value,\n'
-            struct_union_check += '                          std::string prefix, std::string type_string, bool is_pointer,\n'
-            struct_union_check += '                          std::vector<std::tuple<std::string, std::string, std::string>> &contents) {\n'
-            struct_union_check += self.writeIndent(1)
-            struct_union_check += '(void)gen_dispatch_table;  // silence warning\n'
-            struct_union_check += self.writeIndent(1)
-            struct_union_check += 'try {\n'
-            struct_union_check += self.writeIndent(2)
-            struct_union_check += 'contents.emplace_back(type_string, prefix, PointerToHexString(value));\n'
-            struct_union_check += self.writeIndent(2)
-            struct_union_check += 'if (is_pointer) {\n'
-            struct_union_check += self.writeIndent(3)
-            struct_union_check += 'prefix += "->";\n'
-            struct_union_check += self.writeIndent(2)
-            struct_union_check += '} else {\n'
-            struct_union_check += self.writeIndent(3)
-            struct_union_check += 'prefix += ".";\n'
-            struct_union_check += self.writeIndent(2)
-            struct_union_check += '}\n'
-            struct_union_check += self.writeUnionStructMembers(xr_union, 2)
-            struct_union_check += self.writeIndent(2)
-            struct_union_check += 'return true;\n'
-            struct_union_check += self.writeIndent(1)
-            struct_union_check += '} catch(...) {\n'
-            struct_union_check += self.writeIndent(1)
-            struct_union_check += '}\n'
-            struct_union_check += self.writeIndent(1)
-            struct_union_check += 'return false;\n'
-            struct_union_check += '}\n\n'
+                out += f'#if {xr_union.protect_string}\n'
+            out += f'bool ApiDumpOutputXrUnion(XrGeneratedDispatchTable* gen_dispatch_table, const {xr_union.name}* value,\n'
+            out += '                          std::string prefix, std::string type_string, bool is_pointer,\n'
+            out += '                          std::vector<std::tuple<std::string, std::string, std::string>> &contents) {\n'
+            out += self.writeIndent(1)
+            out += '(void)gen_dispatch_table;  // silence warning\n'
+            out += self.writeIndent(1)
+            out += 'try {\n'
+            out += self.writeIndent(2)
+            out += 'contents.emplace_back(type_string, prefix, PointerToHexString(value));\n'
+            out += self.writeIndent(2)
+            out += 'if (is_pointer) {\n'
+            out += self.writeIndent(3)
+            out += 'prefix += "->";\n'
+            out += self.writeIndent(2)
+            out += '} else {\n'
+            out += self.writeIndent(3)
+            out += 'prefix += ".";\n'
+            out += self.writeIndent(2)
+            out += '}\n'
+            out += self.writeUnionStructMembers(xr_union, 2)
+            out += self.writeIndent(2)
+            out += 'return true;\n'
+            out += self.writeIndent(1)
+            out += '} catch(...) {\n'
+            out += self.writeIndent(1)
+            out += '}\n'
+            out += self.writeIndent(1)
+            out += 'return false;\n'
+            out += '}\n\n'
             if xr_union.protect_value:
-                struct_union_check += f'#endif // {xr_union.protect_string}\n'
+                out += f'#endif // {xr_union.protect_string}\n'
         for xr_struct in self.api_structures:
             if xr_struct.name in LOADER_STRUCTS:
                 continue
 
             if xr_struct.protect_value:
-                struct_union_check += f'#if {xr_struct.protect_string}\n'
-            struct_union_check += f'bool ApiDumpOutputXrStruct(XrGeneratedDispatchTable* gen_dispatch_table, const {xr_struct.name}* value,\n'
-            struct_union_check += '                           std::string prefix, std::string type_string, bool is_pointer,\n'
-            struct_union_check += '                           std::vector<std::tuple<std::string, std::string, std::string>> &contents) {\n'
+                out += f'#if {xr_struct.protect_string}\n'
+            out += f'bool ApiDumpOutputXrStruct(XrGeneratedDispatchTable* gen_dispatch_table, const {xr_struct.name}* value,\n'
+            out += '                           std::string prefix, std::string type_string, bool is_pointer,\n'
+            out += '                           std::vector<std::tuple<std::string, std::string, std::string>> &contents) {\n'
             indent = 1
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += '(void)gen_dispatch_table;  // silence warning\n'
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += 'try {\n'
+            out += self.writeIndent(indent)
+            out += '(void)gen_dispatch_table;  // silence warning\n'
+            out += self.writeIndent(indent)
+            out += 'try {\n'
             indent = indent + 1
 
             # Check to see if this struct is the base of a relation group
@@ -926,61 +974,61 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
                 for child in relation_group.child_struct_names:
                     child_struct = self.getStruct(child)
                     if child_struct.protect_value:
-                        struct_union_check += f'#if {child_struct.protect_string}\n'
-                    struct_union_check += self.writeIndent(indent)
-                    struct_union_check += 'if (value->type == %s) {\n' % self.genXrStructureType(
+                        out += f'#if {child_struct.protect_string}\n'
+                    out += self.writeIndent(indent)
+                    out += 'if (value->type == %s) {\n' % self.genXrStructureType(
                         child)
-                    struct_union_check += self.writeIndent(indent + 1)
-                    struct_union_check += f'const {child}* new_value = reinterpret_cast<const {child}*>(value);\n'
-                    struct_union_check += self.writeIndent(indent + 1)
-                    struct_union_check += 'return ApiDumpOutputXrStruct(gen_dispatch_table, new_value, prefix, type_string, is_pointer, contents);\n'
-                    struct_union_check += self.writeIndent(indent)
-                    struct_union_check += '}\n'
+                    out += self.writeIndent(indent + 1)
+                    out += f'const {child}* new_value = reinterpret_cast<const {child}*>(value);\n'
+                    out += self.writeIndent(indent + 1)
+                    out += 'return ApiDumpOutputXrStruct(gen_dispatch_table, new_value, prefix, type_string, is_pointer, contents);\n'
+                    out += self.writeIndent(indent)
+                    out += '}\n'
                     if child_struct.protect_value:
-                        struct_union_check += f'#endif // {child_struct.protect_string}\n'
-                struct_union_check += self.writeIndent(indent)
-                struct_union_check += '// Fallback path - Just output generic information about the base struct\n'
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += 'contents.emplace_back(type_string, prefix, PointerToHexString(value));\n'
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += 'if (is_pointer) {\n'
-            struct_union_check += self.writeIndent(indent + 1)
-            struct_union_check += 'prefix += "->";\n'
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += '} else {\n'
-            struct_union_check += self.writeIndent(indent + 1)
-            struct_union_check += 'prefix += ".";\n'
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += '}\n'
-            struct_union_check += self.writeUnionStructMembers(
+                        out += f'#endif // {child_struct.protect_string}\n'
+                out += self.writeIndent(indent)
+                out += '// Fallback path - Just output generic information about the base struct\n'
+            out += self.writeIndent(indent)
+            out += 'contents.emplace_back(type_string, prefix, PointerToHexString(value));\n'
+            out += self.writeIndent(indent)
+            out += 'if (is_pointer) {\n'
+            out += self.writeIndent(indent + 1)
+            out += 'prefix += "->";\n'
+            out += self.writeIndent(indent)
+            out += '} else {\n'
+            out += self.writeIndent(indent + 1)
+            out += 'prefix += ".";\n'
+            out += self.writeIndent(indent)
+            out += '}\n'
+            out += self.writeUnionStructMembers(
                 xr_struct, indent)
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += 'return true;\n'
+            out += self.writeIndent(indent)
+            out += 'return true;\n'
             indent = indent - 1
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += '} catch(...) {\n'
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += '}\n'
-            struct_union_check += self.writeIndent(indent)
-            struct_union_check += 'return false;\n'
-            struct_union_check += '}\n'
+            out += self.writeIndent(indent)
+            out += '} catch(...) {\n'
+            out += self.writeIndent(indent)
+            out += '}\n'
+            out += self.writeIndent(indent)
+            out += 'return false;\n'
+            out += '}\n'
             if xr_struct.protect_value:
-                struct_union_check += f'#endif // {xr_struct.protect_string}\n'
-            struct_union_check += '\n'
-        struct_union_check += 'bool ApiDumpDecodeNextChain(XrGeneratedDispatchTable* gen_dispatch_table, const void* value, std::string prefix,\n'
-        struct_union_check += '                            std::vector<std::tuple<std::string, std::string, std::string>> &contents) {\n'
-        struct_union_check += self.writeIndent(1)
-        struct_union_check += '(void)gen_dispatch_table;  // silence warning\n'
-        struct_union_check += '    try {\n'
-        struct_union_check += '        contents.emplace_back("const void *", prefix, PointerToHexString(value));\n'
-        struct_union_check += '        if (nullptr == value) {\n'
-        struct_union_check += '            return true;\n'
-        struct_union_check += '        }\n'
-        struct_union_check += self.writeIndent(2)
-        struct_union_check += 'const XrBaseInStructure* next_header = reinterpret_cast<const XrBaseInStructure*>(value);\n'
+                out += f'#endif // {xr_struct.protect_string}\n'
+            out += '\n'
+        out += 'bool ApiDumpDecodeNextChain(XrGeneratedDispatchTable* gen_dispatch_table, const void* value, std::string prefix,\n'
+        out += '                            std::vector<std::tuple<std::string, std::string, std::string>> &contents) {\n'
+        out += self.writeIndent(1)
+        out += '(void)gen_dispatch_table;  // silence warning\n'
+        out += '    try {\n'
+        out += '        contents.emplace_back("const void *", prefix, PointerToHexString(value));\n'
+        out += '        if (nullptr == value) {\n'
+        out += '            return true;\n'
+        out += '        }\n'
+        out += self.writeIndent(2)
+        out += 'const XrBaseInStructure* next_header = reinterpret_cast<const XrBaseInStructure*>(value);\n'
         # Validate the rest of this struct
-        struct_union_check += self.writeIndent(2)
-        struct_union_check += 'switch (next_header->type) {\n'
+        out += self.writeIndent(2)
+        out += 'switch (next_header->type) {\n'
         enum_tuple = [x for x in self.api_enums if x.name == 'XrStructureType'][0]
         for cur_value in enum_tuple.values:
             struct_define_name = self.genXrStructureName(
@@ -993,44 +1041,45 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
                     aliased_value = aliased[0]
                     if aliased_value.protect_value and aliased_value.protect_value != cur_value.protect_value and aliased_value.protect_value != enum_tuple.protect_value:
                         avoid_dupe = aliased_value.protect_string
-                        struct_union_check += f'#if !({avoid_dupe})\n'
+                        out += f'#if !({avoid_dupe})\n'
                     else:
                         # This would unconditionally cause a duplicate case
                         continue
                 if cur_struct.protect_value:
-                    struct_union_check += f'#if {cur_struct.protect_string}\n'
-                struct_union_check += self.writeIndent(3)
-                struct_union_check += f'case {cur_value.name}:\n'
-                struct_union_check += self.writeIndent(4)
-                struct_union_check += 'if (!ApiDumpOutputXrStruct(gen_dispatch_table, reinterpret_cast<const %s*>(value), prefix, "const %s*", true, contents)) {\n' % (
+                    out += f'#if {cur_struct.protect_string}\n'
+                out += self.writeIndent(3)
+                out += f'case {cur_value.name}:\n'
+                out += self.writeIndent(4)
+                out += 'if (!ApiDumpOutputXrStruct(gen_dispatch_table, reinterpret_cast<const %s*>(value), prefix, "const %s*", true, contents)) {\n' % (
                     struct_define_name, struct_define_name)
-                struct_union_check += self.writeIndent(5)
-                struct_union_check += 'return false;\n'
-                struct_union_check += self.writeIndent(4)
-                struct_union_check += '}\n'
-                struct_union_check += self.writeIndent(4)
-                struct_union_check += 'return true;\n'
+                out += self.writeIndent(5)
+                out += 'return false;\n'
+                out += self.writeIndent(4)
+                out += '}\n'
+                out += self.writeIndent(4)
+                out += 'return true;\n'
                 if cur_struct.protect_value:
-                    struct_union_check += f'#endif // {cur_struct.protect_string}\n'
+                    out += f'#endif // {cur_struct.protect_string}\n'
                 if avoid_dupe:
-                    struct_union_check += f'#endif // !({avoid_dupe})\n'
-        struct_union_check += self.writeIndent(3)
-        struct_union_check += 'default:\n'
-        struct_union_check += self.writeIndent(4)
-        struct_union_check += 'return false;\n'
-        struct_union_check += self.writeIndent(2)
-        struct_union_check += '}\n'
-        struct_union_check += '    } catch(...) {\n'
-        struct_union_check += '    }\n'
-        struct_union_check += '    return false;\n'
-        struct_union_check += '}\n\n'
-        return struct_union_check
+                    out += f'#endif // !({avoid_dupe})\n'
+        out += self.writeIndent(3)
+        out += 'default:\n'
+        out += self.writeIndent(4)
+        out += 'return false;\n'
+        out += self.writeIndent(2)
+        out += '}\n'
+        out += '    } catch(...) {\n'
+        out += '    }\n'
+        out += '    return false;\n'
+        out += '}\n\n'
 
     # Write the C++ Api Dump function for every command we know about
     #   self            the ApiDumpOutputGenerator object
-    def outputLayerCommands(self):
+    #   out             the SourceEmitter to write to
+    def outputLayerCommands(self, out):
+        mutex_type, read_lock = self.dispatchMapLocking()
         cur_extension = CurrentExtensionTracker(self.conventions.api_version_prefix)
-        generated_commands = '\n// Automatically generated api_dump layer commands\n'
+        out += '\n// Automatically generated api_dump layer commands\n'
         for x in range(0, 2):
             if x == 0:
                 commands = self.core_commands
@@ -1039,7 +1088,7 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
 
             for cur_cmd in commands:
                 assert cur_cmd.ext_name
-                generated_commands += cur_extension.format_if_extension_changed(cur_cmd.ext_name, "\n// ---- {} commands\n")
+                out += cur_extension.format_if_extension_changed(cur_cmd.ext_name, "\n// ---- {} commands\n")
 
                 if cur_cmd.name in self.no_trampoline_or_terminator or cur_cmd.name in MANUALLY_DEFINED_IN_LAYER:
                     continue
@@ -1077,11 +1126,11 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
                 base_name = cur_cmd.name[2:]
 
                 if cur_cmd.protect_value:
-                    generated_commands += f'#if {cur_cmd.protect_string}\n'
+                    out += f'#if {cur_cmd.protect_string}\n'
 
                 prototype = cur_cmd.cdecl.replace(" xr", " ApiDumpLayerXr")
                 prototype = prototype.replace(";", " {\n")
-                generated_commands += prototype
+                out += prototype
 
                 if has_return:
                     if cur_cmd.return_type is None or not cur_cmd.return_type.text:
@@ -1093,11 +1142,11 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
                         return_prefix += ' = XR_SUCCESS;\n'
                     else:
                         return_prefix += ';\n'
-                    generated_commands += return_prefix
+                    out += return_prefix
 
-                generated_commands += '    try {\n'
-                generated_commands += '        // Generate output for this command\n'
-                generated_commands += '        std::vector<std::tuple<std::string, std::string, std::string>> contents;\n'
+                out += '    try {\n'
+                out += '        // Generate output for this command\n'
+                out += '        std::vector<std::tuple<std::string, std::string, std::string>> contents;\n'
 
                 # Next, we have to call down to the next implementation of this command in the call chain.
                 # Before we can do that, we have to figure out what the dispatch table is
@@ -1105,25 +1154,25 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
                     handle_param = cur_cmd.params[0]
                     base_handle_name = undecorate(handle_param.type)
                     first_handle_name = self.getFirstHandleName(handle_param)
-                    generated_commands += f'        XrGeneratedDispatchTable *gen_dispatch_table = nullptr;\n\n'
-                    generated_commands += f'        {{\n'
-                    generated_commands += f'            std::unique_lock<std::mutex> mlock(g_{base_handle_name}_dispatch_mutex);\n'
-                    generated_commands += f'            auto map_iter = g_{base_handle_name}_dispatch_map.find({first_handle_name});\n'
-                    generated_commands += f'            if (map_iter == g_{base_handle_name}_dispatch_map.end()) {{\n'
-                    generated_commands += f'                return XR_ERROR_VALIDATION_FAILURE;\n'
-                    generated_commands += f'            }}\n';
-                    generated_commands += f'            gen_dispatch_table = map_iter->second;\n'
-                    generated_commands += f'        }}\n\n';
+                    out += f'        XrGeneratedDispatchTable *gen_dispatch_table = nullptr;\n\n'
+                    out += f'        {{\n'
+                    out += f'            {read_lock}<{mutex_type}> mlock(g_{base_handle_name}_dispatch_mutex);\n'
+                    out += f'            auto map_iter = g_{base_handle_name}_dispatch_map.find({first_handle_name});\n'
+                    out += f'            if (map_iter == g_{base_handle_name}_dispatch_map.end()) {{\n'
+                    out += f'                return XR_ERROR_VALIDATION_FAILURE;\n'
+                    out += f'            }}\n';
+                    out += f'            gen_dispatch_table = map_iter->second;\n'
+                    out += f'        }}\n\n';
                 else:
-                    generated_commands += self.printCodeGenErrorMessage(
+                    out += self.printCodeGenErrorMessage(
                         f'Command {cur_cmd.name} does not have an OpenXR Object handle as the first parameter.')
 
                 # Print out a tuple for the header
                 if has_return:
-                    generated_commands += '        contents.emplace_back("%s", "%s", "");\n' % (
+                    out += '        contents.emplace_back("%s", "%s", "");\n' % (
                         cur_cmd.return_type.text, cur_cmd.name)
                 else:
-                    generated_commands += f'        contents.emplace_back("void", "{cur_cmd.name}", "");\n'
+                    out += f'        contents.emplace_back("void", "{cur_cmd.name}", "");\n'
                 # Print out information for each parameter
                 for param in cur_cmd.params:
                     can_expand = False
@@ -1131,25 +1180,25 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
                     if ((self.isStruct(param.type) or self.isUnion(param.type)) and
                             (param.is_const or param.pointer_count == 0)):
                         can_expand = True
-                    generated_commands += self.writeParamMember(
+                    out += self.writeParamMember(
                         param, False, can_expand, 2)
 
                 # Now record the information
-                generated_commands += '        ApiDumpLayerRecordContent(contents);\n\n'
+                out += '        ApiDumpLayerRecordContent(contents);\n\n'
 
                 # Call down, looking for the returned result if required.
-                generated_commands += '        '
+                out += '        '
                 if has_return:
-                    generated_commands += 'result = '
-                generated_commands += f'gen_dispatch_table->{base_name}('
+                    out += 'result = '
+                out += f'gen_dispatch_table->{base_name}('
 
                 count = 0
                 for param in cur_cmd.params:
                     if count > 0:
-                        generated_commands += ', '
-                    generated_commands += param.name
+                        out += ', '
+                    out += param.name
                     count = count + 1
-                generated_commands += ');\n'
+                out += ');\n'
 
                 # If this is a create command, we have to create an entry in the appropriate
                 # unordered_map pointing to the correct dispatch table for the newly created
@@ -1159,41 +1208,41 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
                 if cur_cmd.params[-1].is_handle and (is_create or is_destroy):
                     second_base_handle_name = undecorate(cur_cmd.params[-1].type)
                     if is_create:
-                        generated_commands += '        if (XR_SUCCESS == result && nullptr != %s) {\n' % cur_cmd.params[-1].name
-                        generated_commands += '            auto exists = g_%s_dispatch_map.find(*%s);\n' % (
+                        out += '        if (XR_SUCCESS == result && nullptr != %s) {\n' % cur_cmd.params[-1].name
+                        out += '            auto exists = g_%s_dispatch_map.find(*%s);\n' % (
                             second_base_handle_name, cur_cmd.params[-1].name)
-                        generated_commands += '            if (exists == g_%s_dispatch_map.end()) {\n' % second_base_handle_name
-                        generated_commands += f'                std::unique_lock<std::mutex> lock(g_{second_base_handle_name}_dispatch_mutex);\n'
-                        generated_commands += '                g_%s_dispatch_map[*%s] = gen_dispatch_table;\n' % (
+                        out += '            if (exists == g_%s_dispatch_map.end()) {\n' % second_base_handle_name
+                        out += f'                std::unique_lock<{mutex_type}> lock(g_{second_base_handle_name}_dispatch_mutex);\n'
+                        out += '                g_%s_dispatch_map[*%s] = gen_dispatch_table;\n' % (
                             second_base_handle_name, cur_cmd.params[-1].name)
-                        generated_commands += '            }\n'
-                        generated_commands += '        }\n'
+                        out += '            }\n'
+                        out += '        }\n'
                     elif is_destroy:
-                        generated_commands += '        auto exists = g_%s_dispatch_map.find(%s);\n' % (
+                        out += '        auto exists = g_%s_dispatch_map.find(%s);\n' % (
                             second_base_handle_name, cur_cmd.params[-1].name)
-                        generated_commands += '        if (exists != g_%s_dispatch_map.end()) {\n' % second_base_handle_name
-                        generated_commands += f'            std::unique_lock<std::mutex> lock(g_{second_base_handle_name}_dispatch_mutex);\n'
-                        generated_commands += '            g_%s_dispatch_map.erase(%s);\n' % (
+                        out += '        if (exists != g_%s_dispatch_map.end()) {\n' % second_base_handle_name
+                        out += f'            std::unique_lock<{mutex_type}> lock(g_{second_base_handle_name}_dispatch_mutex);\n'
+                        out += '            g_%s_dispatch_map.erase(%s);\n' % (
                             second_base_handle_name, cur_cmd.params[-1].name)
-                        generated_commands += '        }\n'
+                        out += '        }\n'
 
                 # Catch any exceptions that may have occurred.  If any occurred between any of the
                 # valid mutex lock/unlock statements, perform the unlock now.
-                generated_commands += '    } catch (...) {\n'
+                out += '    } catch (...) {\n'
                 if has_return:
-                    generated_commands += '        return XR_ERROR_VALIDATION_FAILURE;\n'
-                generated_commands += '    }\n'
+                    out += '        return XR_ERROR_VALIDATION_FAILURE;\n'
+                out += '    }\n'
 
                 if has_return:
-                    generated_commands += '    return result;\n'
+                    out += '    return result;\n'
 
-                generated_commands += '}\n\n'
+                out += '}\n\n'
                 if cur_cmd.protect_value:
-                    generated_commands += f'#endif // {cur_cmd.protect_string}\n'
+                    out += f'#endif // {cur_cmd.protect_string}\n'
 
-        generated_commands += 'PFN_xrVoidFunction ApiDumpLayerInnerGetInstanceProcAddr(\n'
-        generated_commands += '    const char*                                 name) {\n'
-        generated_commands += '        std::string func_name = name;\n\n'
+        out += 'PFN_xrVoidFunction ApiDumpLayerInnerGetInstanceProcAddr(\n'
+        out += '    const char*                                 name) {\n'
+        out += '        std::string func_name = name;\n\n'
 
         # reset the state
         cur_extension = CurrentExtensionTracker(self.conventions.api_version_prefix)
@@ -1206,7 +1255,7 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
 
             for cur_cmd in commands:
                 assert cur_cmd.ext_name
-                generated_commands += cur_extension.format_if_extension_changed(cur_cmd.ext_name, "\n        // ---- {} commands\n")
+                out += cur_extension.format_if_extension_changed(cur_cmd.ext_name, "\n        // ---- {} commands\n")
 
                 if cur_cmd.name in self.no_trampoline_or_terminator:
                     continue
@@ -1219,16 +1268,10 @@ class ApiDumpOutputGenerator(AutomaticSourceOutputGenerator):
                 layer_command_name = cur_cmd.name.replace(
                     "xr", "ApiDumpLayerXr")
 
-                if cur_cmd.protect_value:
-                    generated_commands += f'#if {cur_cmd.protect_string}\n'
-
-                generated_commands += '        if (func_name == "%s") {\n' % cur_cmd.name
-                generated_commands += f'            return reinterpret_cast<PFN_xrVoidFunction>({layer_command_name});\n'
-                generated_commands += '        }\n'
-                if cur_cmd.protect_value:
-                    generated_commands += f'#endif // {cur_cmd.protect_string}\n'
-
-        generated_commands += '        return nullptr;\n'
-        generated_commands += '    }\n'
+                with out.protect(cur_cmd.protect_value, cur_cmd.protect_string):
+                    out += '        if (func_name == "%s") {\n' % cur_cmd.name
+                    out += f'            return reinterpret_cast<PFN_xrVoidFunction>({layer_command_name});\n'
+                    out += '        }\n'
 
-        return generated_commands
+        out += '        return nullptr;\n'
+        out += '    }\n'
@@ -25,9 +25,11 @@
 #               way for the rest of the automatic source generation scripts.
 
 import re
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 from inspect import currentframe, getframeinfo
-from typing import List, Optional, Tuple, Union
+from typing import List, Optional, TextIO, Tuple, Union
 from xml.etree import ElementTree as et
 
 from generator import (GeneratorOptions, MissingRegistryError, OutputGenerator,
@@ -1862,6 +1864,20 @@ class AutomaticSourceOutputGenerator(OutputGenerator):
             struct_name, type_name))
         return ''
 
+    # Create an emitter that streams generated source to the output file
+    #   self            the AutomaticSourceOutputGenerator object
+    def makeSourceEmitter(self) -> 'SourceEmitter':
+        return SourceEmitter(self.outFile)
+
+    # Write out everything left in an emitter, and log the time spent
+    # generating each of its sections as a diagnostic.
+    #   self            the AutomaticSourceOutputGenerator object
+    #   out             the SourceEmitter to finish
+    def finishSourceEmitter(self, out: 'SourceEmitter'):
+        out.flush()
+        for name, elapsed in out.timings:
+            self.logMsg('diag', f'{self.genOpts.filename}: {name}: {elapsed:.3f}s')
+
     # Write the indent for the appropriate number of tab spaces
     #   self            the AutomaticSourceOutputGenerator object
     #   indent_cnt      the number of indents to return a string of
@@ -1926,3 +1942,66 @@ class CurrentExtensionTracker:
         else:
             desc = f"{ext_name} extension"
         return fmt_str.format(desc)
+
+
+class SourceEmitter:
+    """
+    Streams fragments of generated source to a file.
+
+    Generators write each fragment as they produce it, instead of building the
+    whole file as one string and writing it at the end.
+    `out += text` is the same as `out.write(text)`, so code that builds a string
+    with `+=` can stream by using the emitter as its accumulator.
+
+    Fragments are buffered in a chunk list, which is joined and written to the
+    file once it holds `chunk_limit` fragments, and by flush().
+    """
+
+    def __init__(self, file: TextIO, chunk_limit: int = 4096):
+        """Initialize state."""
+        self.file = file
+        self.chunk_limit = chunk_limit
+        self.chunks: List[str] = []
+        self.timings: List[Tuple[str, float]] = []
+        """Name and time in seconds of each section, in the order written."""
+
+    def write(self, text: str):
+        """Write a fragment of source."""
+        self.chunks.append(text)
+        if len(self.chunks) >= self.chunk_limit:
+            self.flush()
+
+    def __iadd__(self, text: str) -> 'SourceEmitter':
+        self.write(text)
+        return self
+
+    def line(self, text: str = '', indent: int = 0):
+        """Write a line of source, indented by the given number of tab stops."""
+        self.write(f"{'    ' * indent}{text}\n")
+
+    @contextmanager
+    def protect(self, protect_value: Optional[str], protect_string: str):
+        """
+        Wrap everything written in the block in #if/#endif protection.
+
+        Nothing is added if protect_value is empty, like the protect_value and
+        protect_string pairs of the registry data classes.
+        """
+        if protect_value:
+            self.write(f'#if {protect_string}\n')
+        yield self
+        if protect_value:
+            self.write(f'#endif // {protect_string}\n')
+
+    @contextmanager
+    def section(self, name: str):
+        """Record the time spent generating everything written in the block."""
+        start = time.perf_counter()
+        yield self
+        self.timings.append((name, time.perf_counter() - start))
+
+    def flush(self):
+        """Write all buffered fragments to the file."""
+        if self.chunks:
+            self.file.write(''.join(self.chunks))
+            self.chunks.clear()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017-2025 The Khronos Group Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Purpose:      This script decodes the binary trace written by the API Dump
+#               layer (XR_API_DUMP_EXPORT_TYPE=binary) into the same text or
+#               HTML output the layer writes directly.  The trace format is
+#               described in src/api_layers/api_dump_trace.h.
+
+import argparse
+import struct
+import sys
+
+TRACE_MAGIC = b'XRAPIDMP'
+TRACE_VERSION = 1
+TRACE_CALL = 0
+TRACE_DROPPED = 1
+
+HTML_HEADER = '''<!doctype html>
+<html>
+    <head>
+        <title>OpenXR API Dump</title>
+        <style type='text/css'>
+        html {
+            background-color: #0b1e48;
+            background-image: url('https://vulkan.lunarg.com/img/bg-starfield.jpg');
+            background-position: center;
+            -webkit-background-size: cover;
+            -moz-background-size: cover;
+            -o-background-size: cover;
+            background-size: cover;
+            background-attachment: fixed;
+            background-repeat: no-repeat;
+            height: 100%;
+        }
+        #header {
+            z-index: -1;
+        }
+        #header>img {
+            position: absolute;
+            width: 160px;
+            margin-left: -280px;
+            top: -10px;
+            left: 50%;
+        }
+        #header>h1 {
+            font-family: Arial, 'Helvetica Neue', Helvetica, sans-serif;
+            font-size: 44px;
+            font-weight: 200;
+            text-shadow: 4px 4px 5px #000;
+            color: #eee;
+            position: absolute;
+            width: 400px;
+            margin-left: -80px;
+            top: 8px;
+            left: 50%;
+        }
+        body {
+            font-family: Consolas, monaco, monospace;
+            font-size: 14px;
+            line-height: 20px;
+            color: #eee;
+            height: 100%;
+            margin: 0;
+            overflow: hidden;
+        }
+        #wrapper {
+            background-color: rgba(0, 0, 0, 0.7);
+            border: 1px solid #446;
+            box-shadow: 0px 0px 10px #000;
+            padding: 8px 12px;
+            display: inline-block;
+            position: absolute;
+            top: 80px;
+            bottom: 25px;
+            left: 50px;
+            right: 50px;
+            overflow: auto;
+        }
+        details>*:not(summary) {
+            margin-left: 22px;
+        }
+        summary:only-child {
+            display: block;
+            padding-left: 15px;
+        }
+        details>summary:only-child::-webkit-details-marker {
+            display: none;
+            padding-left: 15px;
+        }
+        .headervar, .headertype, .headerval {
+            display: inline;
+            margin: 0 9px;
+        }
+        .var, .type, .val {
+            display: inline;
+            margin: 0 6px;
+        }
+        .headertype, .type {
+            color: #acf;
+        }
+        .headerval, .val {
+            color: #afa;
+            text-align: right;
+        }
+        .thd {
+            color: #888;
+        }
+        </style>
+    </head>
+    <body>
+        <div id='header'>
+            <img src='https://lunarg.com/wp-content/uploads/2016/02/LunarG-wReg-150.png' />
+            <h1>OpenXR API Dump</h1>
+        </div>
+        <div id='wrapper'>
+'''
+
+HTML_FOOTER = '''        </div>
+    </body>
+</html>'''
+
+
+class TraceFormatError(Exception):
+    """Raised when a file is not a valid API Dump binary trace."""
+
+
+class TraceCall:
+    """A call recorded in the trace: the thread hash, and the (type, name, value) entries."""
+
+    def __init__(self, thread, contents):
+        self.thread = thread
+        self.contents = contents
+
+
+class TraceDropped:
+    """Calls a thread could not record because its buffer was full."""
+
+    def __init__(self, thread, count):
+        self.thread = thread
+        self.count = count
+
+
+# Unpack a struct from data at offset, which must fit before end.
+#   fmt             the struct format
+#   data            the bytes of the trace file
+#   offset          where the struct starts
+#   end             the end of the record (or header) it belongs to
+def unpackField(fmt, data, offset, end):
+    if offset + struct.calcsize(fmt) > end:
+        raise TraceFormatError(f'Truncated record at offset {offset}')
+    return struct.unpack_from(fmt, data, offset)
+
+
+# Yield a TraceCall or TraceDropped for each record of a trace.
+#   data            the bytes of the trace file
+def readTrace(data):
+    if data[:8] != TRACE_MAGIC:
+        raise TraceFormatError('Not an API Dump binary trace')
+    version, = unpackField('<I', data, 8, len(data))
+    if version != TRACE_VERSION:
+        raise TraceFormatError(f'Unsupported trace version {version}')
+    offset = 12
+    while offset < len(data):
+        size, = unpackField('<I', data, offset, len(data))
+        end = offset + 4 + size
+        if end > len(data):
+            raise TraceFormatError(f'Truncated record at offset {offset}')
+        kind, thread = unpackField('<BQ', data, offset + 4, end)
+        pos = offset + 13
+        if kind == TRACE_CALL:
+            count, = unpackField('<I', data, pos, end)
+            pos += 4
+            contents = []
+            for _ in range(count):
+                entry = []
+                for _ in range(3):
+                    length, = unpackField('<I', data, pos, end)
+                    pos += 4
+                    if pos + length > end:
+                        raise TraceFormatError(f'Truncated record at offset {offset}')
+                    entry.append(data[pos:pos + length].decode('utf-8', 'replace'))
+                    pos += length
+                contents.append(tuple(entry))
+            yield TraceCall(thread, contents)
+        elif kind == TRACE_DROPPED:
+            count, = unpackField('<Q', data, pos, end)
+            yield TraceDropped(thread, count)
+        else:
+            raise TraceFormatError(f'Unknown record kind {kind} at offset {offset}')
+        offset = end
+
+
+# Format a call the way the layer writes it to a text file.
+#   contents        the (type, name, value) entries of the call
+def formatText(contents):
+    lines = []
+    for index, (content_type, content_name, content_value) in enumerate(contents):
+        indent = '    ' if index != 0 else ''
+        if content_value:
+            lines.append(f'{indent}{content_type} {content_name} = {content_value}\n')
+        else:
+            lines.append(f'{indent}{content_type} {content_name}\n')
+    return ''.join(lines)
+
+
+# Count the structure, pointer and array dereferences in a name.
+#   name            the name of an entry, like "info->applicationInfo.apiVersion"
+def derefCount(name):
+    return name.count('.') + name.count('->') + name.count('[')
+
+
+# Format a call the way the layer writes it to an HTML file.
+#   contents        the (type, name, value) entries of the call
+def formatHtml(contents):
+    out = ["<details class='data'>\n"]
+    prefixes = []
+    last_deref_count = 0
+    for index, (content_type, content_name, content_value) in enumerate(contents):
+        if index == 0:
+            out.append('   <summary>\n'
+                       f"      <div class='headertype'>{content_type}</div>\n"
+                       f"      <div class='headervar'>{content_name}</div>\n"
+                       '   </summary>\n')
+            continue
+
+        cur_deref_count = derefCount(content_name)
+        next_deref_count = 0
+        if index < len(contents) - 1:
+            next_deref_count = derefCount(contents[index + 1][1])
+
+        # Close the detail sections of the dereferences this entry no longer has.
+        while last_deref_count > cur_deref_count:
+            out.append('   </details>\n')
+            if prefixes:
+                prefixes.pop()
+            last_deref_count -= 1
+
+        # Strip the most recent prefix this entry starts with.
+        short_name = content_name
+        if cur_deref_count > 0:
+            for prefix in reversed(prefixes):
+                if content_name.startswith(prefix):
+                    additional_offset = len(prefix) + 1
+                    separator = content_name[additional_offset - 1:additional_offset]
+                    if separator == '-':
+                        additional_offset += 1
+                    elif separator == '[':
+                        additional_offset -= 1
+                    short_name = content_name[additional_offset:]
+                    break
+
+        writing_summary = cur_deref_count < next_deref_count
+        if writing_summary:
+            out.append("   <details class='data'>\n"
+                       '      <summary>\n')
+            prefixes.append(content_name)
+        else:
+            out.append("      <div class='data'>\n")
+
+        out.append(f"         <div class='type'>{content_type}</div>\n"
+                   f"         <div class='var'>{short_name}</div>\n")
+        value_needs_printing = True
+        if 'char' in content_type and content_type.count('*') + content_type.count('[') < 2:
+            out.append(f"         <div class='val'>\"{content_value}\"</div>")
+            value_needs_printing = False
+        if content_value and value_needs_printing:
+            out.append(f"         <div class='val'>{content_value}</div>")
+        out.append('\n')
+
+        if writing_summary:
+            out.append('      </summary>\n')
+        else:
+            out.append('      </div>\n')
+        last_deref_count = cur_deref_count
+
+    out.append('   </details>\n' * last_deref_count)
+    out.append('</details>\n')
+    return ''.join(out)
+
+
+# Decode a trace, writing it out as text or HTML.
+#   data            the bytes of the trace file
+#   output          the file object to write to
+#   html            True to write HTML, False to write text
+#   thread          if not None, only write the calls of the thread with this hash
+def decodeTrace(data, output, html=False, thread=None):
+    if html:
+        output.write(HTML_HEADER)
+    for record in readTrace(data):
+        if thread is not None and record.thread != thread:
+            continue
+        if isinstance(record, TraceDropped):
+            print(f'Thread {record.thread:#x} dropped {record.count} calls',
+                  file=sys.stderr)
+        elif html:
+            output.write(formatHtml(record.contents))
+        else:
+            output.write(formatText(record.contents))
+    if html:
+        output.write(HTML_FOOTER)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Decode a binary trace of the API Dump layer into text or HTML.')
+    parser.add_argument('trace', help='Binary trace file written by the layer')
+    parser.add_argument('-o', dest='output', default=None,
+                        help='Output file, instead of stdout')
+    parser.add_argument('-html', action='store_true', default=False,
+                        help='Write HTML instead of text')
+    parser.add_argument('-thread', type=lambda value: int(value, 0), default=None,
+                        help='Only write the calls of the thread with this hash')
+    args = parser.parse_args()
+
+    with open(args.trace, 'rb') as trace_file:
+        data = trace_file.read()
+    try:
+        if args.output is None:
+            decodeTrace(data, sys.stdout, args.html, args.thread)
+        else:
+            with open(args.output, 'w', encoding='utf-8', newline='\n') as output:
+                decodeTrace(data, output, args.html, args.thread)
+    except TraceFormatError as e:
+        print(f'{args.trace}: {e}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,8 +12,6 @@ from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 from xml.etree import ElementTree as et
 from dataclasses import dataclass, field
 
-from copy import deepcopy
-
 _VERBOSE_INTERACTION_PROFILE_PROCESSING = False
 
 
@@ -32,11 +30,63 @@ def _repr_conjunction(and_terms):
 FrozenAvailability = Tuple[Tuple[str, ...], ...]
 
 
+class _FeatureBits:
+    """
+    Interns feature names as bit positions, so that a set of features is an int mask.
+
+    >>> bits = _FeatureBits()
+    >>> bits.mask(['a', 'b'])
+    3
+    >>> sorted(bits.features(bits.mask(['b'])))
+    ['b']
+    >>> bits.known_mask(['b', 'c'])
+    2
+    """
+
+    def __init__(self):
+        self.bits: Dict[str, int] = dict()
+        """Maps each feature name to its bit."""
+
+        self.features_of_mask: Dict[int, FrozenSet[str]] = dict()
+        """Cache of the feature set for each mask."""
+
+    def mask(self, features: Iterable[str]) -> int:
+        """Return the mask of a set of features, interning any new names."""
+        ret = 0
+        for feature in features:
+            bit = self.bits.get(feature)
+            if bit is None:
+                bit = 1 << len(self.bits)
+                self.bits[feature] = bit
+            ret |= bit
+        return ret
+
+    def known_mask(self, features: Iterable[str]) -> int:
+        """Return the mask of a set of features, ignoring names never interned."""
+        ret = 0
+        for feature in features:
+            ret |= self.bits.get(feature, 0)
+        return ret
+
+    def features(self, mask: int) -> FrozenSet[str]:
+        """Return the set of features in a mask."""
+        ret = self.features_of_mask.get(mask)
+        if ret is None:
+            ret = frozenset(feature for feature, bit in self.bits.items() if mask & bit)
+            self.features_of_mask[mask] = ret
+        return ret
+
+
+_FEATURE_BITS = _FeatureBits()
+
+
 class Availability:
     """
     Information on when something is available.
 
     In 'disjunctive normal form' - an OR of ANDs.
+    Each AND term is stored as a mask of interned feature bits,
+    so absorption, AND, and OR are bitwise operations.
 
     >>> Availability([{'a'}, {'b'}])
     [{'a'}, {'b'}]
@@ -49,16 +99,25 @@ class Availability:
     """
 
     def __init__(self, conjunctions: Iterable[Set[str]]):
-        self.conjunctions: List[FrozenSet[str]] = list()
+        self.masks: List[int] = list()
         """
-        A list of possible ways to make something available.
+        A list of possible ways to make something available, as feature masks.
 
-        Satisfy all features in any of the sets.
+        Satisfy all features in any of the masks.
         """
 
         for c in conjunctions:
             self.add(c)
 
+    @property
+    def conjunctions(self) -> List[FrozenSet[str]]:
+        """
+        A list of possible ways to make something available.
+
+        Satisfy all features in any of the sets.
+        """
+        return [_FEATURE_BITS.features(mask) for mask in self.masks]
+
     def add(self, features: Set[str]) -> bool:
         """
         Add a new set of features that would make this available.
@@ -89,11 +148,11 @@ class Availability:
         >>> a
         [{'a'}]
         """
-        return self._add_impl(frozenset(features))
+        return self._add_impl(_FEATURE_BITS.mask(features))
 
     def merge(self, other: 'Availability') -> bool:
         """Merge two availabilities (by OR)."""
-        redundant = [self._add_impl(condition) for condition in other.conjunctions]
+        redundant = [self._add_impl(mask) for mask in other.masks]
         return all(redundant)
 
     def merged(self, other: 'Availability') -> 'Availability':
@@ -110,7 +169,8 @@ class Availability:
         >>> Availability([{'a'}, {'b', 'c'}]).merged(Availability([{'a', 'b'}]))
         [{'a'}, {'b', 'c'}]
         """
-        clone = deepcopy(self)
+        clone = Availability([])
+        clone.masks = list(self.masks)
         clone.merge(other)
         return clone
 
@@ -146,9 +206,9 @@ class Availability:
         """
         ret = Availability([])
 
-        for self_term in self.conjunctions:
-            for other_term in other.conjunctions:
-                ret._add_impl(self_term.union(other_term))
+        for self_mask in self.masks:
+            for other_mask in other.masks:
+                ret._add_impl(self_mask | other_mask)
 
         return ret
 
@@ -165,20 +225,21 @@ class Availability:
         >>> Availability([]).test({'a'})
         False
         """
-        for condition in self.conjunctions:
-            if condition.issubset(present_features):
+        present = _FEATURE_BITS.known_mask(present_features)
+        for mask in self.masks:
+            if mask & present == mask:
                 return True
         return False
 
     def is_consistent(self) -> bool:
-        if any(not c for c in self.conjunctions):
+        if any(not mask for mask in self.masks):
             # got an empty one
             return False
-        if len(set(self.conjunctions)) < len(self.conjunctions):
+        if len(set(self.masks)) < len(self.masks):
             # got a dupe
             return False
-        for a, b in itertools.permutations(self.conjunctions, 2):
-            if a.issubset(b):
+        for a, b in itertools.permutations(self.masks, 2):
+            if a & b == a:
                 # One condition is a subset of another
                 return False
         return True
@@ -202,19 +263,17 @@ class Availability:
             ret.add(set(cleaner(term)))
         return ret
 
-    def _add_impl(self, features: FrozenSet[str]) -> bool:
-        if features in self.conjunctions:
-            return True
-
-        # Do not add this term if we are a superset of any existing term
+    def _add_impl(self, mask: int) -> bool:
+        # Do not add this term if it is the same as, or a superset of, any existing term
         # e.g. A, A+B -> A
-        if any(features.issuperset(c) for c in self.conjunctions):
-            return True
+        for m in self.masks:
+            if mask & m == m:
+                return True
 
         # Drop any terms that are a superset of the new term
-        remaining = [term for term in self.conjunctions if not term.issuperset(features)]
-        remaining.append(features)
-        self.conjunctions = remaining
+        remaining = [m for m in self.masks if m & mask != mask]
+        remaining.append(mask)
+        self.masks = remaining
         return False
 
     def __str__(self):
@@ -147,21 +147,24 @@ class LoaderSourceOutputGenerator(AutomaticSourceOutputGenerator):
     # and then call down to the base class to wrap everything up.
     #   self            the LoaderSourceOutputGenerator object
     def endFile(self):
-        file_data = ''
+        out = self.makeSourceEmitter()
 
         if self.genOpts.filename == 'xr_generated_loader.hpp':
-            file_data += '#ifdef __cplusplus\n'
-            file_data += 'extern "C" { \n'
-            file_data += '#endif\n'
-            file_data += self.outputLoaderManualFuncs()
-            file_data += '#ifdef __cplusplus\n'
-            file_data += '} // extern "C"\n'
-            file_data += '#endif\n'
+            out += '#ifdef __cplusplus\n'
+            out += 'extern "C" { \n'
+            out += '#endif\n'
+            with out.section('manual function prototypes'):
+                self.outputLoaderManualFuncs(out)
+            out += '#ifdef __cplusplus\n'
+            out += '} // extern "C"\n'
+            out += '#endif\n'
 
         elif self.genOpts.filename == 'xr_generated_loader.cpp':
-            file_data += self.outputLoaderGeneratedFuncs()
+            with out.section('trampolines'):
+                self.outputLoaderGeneratedFuncs(out)
 
-        write(file_data, file=self.outFile)
+        out += '\n'
+        self.finishSourceEmitter(out)
 
         # Finish processing in superclass
         AutomaticSourceOutputGenerator.endFile(self)
@@ -169,31 +172,26 @@ class LoaderSourceOutputGenerator(AutomaticSourceOutputGenerator):
     # Create prototypes for the loader's manually generated functions
     # so the generated code can call them.
     #   self            the LoaderSourceOutputGenerator object
-    def outputLoaderManualFuncs(self):
-        manual_funcs = '\n// Loader manually generated function prototypes\n\n'
+    #   out             the SourceEmitter to write to
+    def outputLoaderManualFuncs(self, out):
+        out += '\n// Loader manually generated function prototypes\n\n'
 
         for cur_cmd in self.core_commands:
             if not cur_cmd.name in MANUAL_LOADER_FUNCS:
-                if cur_cmd.protect_value:
-                    manual_funcs += f'#if {cur_cmd.protect_string}\n'
+                with out.protect(cur_cmd.protect_value, cur_cmd.protect_string):
+                    func_proto = self.getProto(cur_cmd)
 
-                func_proto = self.getProto(cur_cmd)
-
-                # Output the standard API form of the command
-                manual_funcs += func_proto
-                manual_funcs += '\n'
-
-                if cur_cmd.protect_value:
-                    manual_funcs += f'#endif // {cur_cmd.protect_string}\n'
-
-        return manual_funcs
+                    # Output the standard API form of the command
+                    out += func_proto
+                    out += '\n'
 
    # Output loader generated functions.  This has special cases for create and destroy commands
     # since we have to associate the created objects with the original instance during the create,
     # and then remove that association in the delete.
     #   self            the LoaderSourceOutputGenerator object
-    def outputLoaderGeneratedFuncs(self):
-        generated_funcs = '\n// Automatically generated instance trampolines and terminators\n'
+    #   out             the SourceEmitter to write to
+    def outputLoaderGeneratedFuncs(self, out):
+        out += '\n// Automatically generated instance trampolines and terminators\n'
 
         for cur_cmd in self.core_commands:
 
@@ -259,36 +257,35 @@ class LoaderSourceOutputGenerator(AutomaticSourceOutputGenerator):
                 count = count + 1
 
             if cur_cmd.protect_value:
-                generated_funcs += f'#if {cur_cmd.protect_string}\n'
+                out += f'#if {cur_cmd.protect_string}\n'
             decl = self.getProto(cur_cmd).replace(";", " XRLOADER_ABI_TRY {\n")
 
-            generated_funcs += decl
-            generated_funcs += tramp_variable_defines
+            out += decl
+            out += tramp_variable_defines
 
             if has_return:
-                generated_funcs += '        result = '
+                out += '        result = '
             else:
-                generated_funcs += '        '
+                out += '        '
 
-            generated_funcs += 'loader_instance->DispatchTable()->'
-            generated_funcs += base_name
-            generated_funcs += '('
+            out += 'loader_instance->DispatchTable()->'
+            out += base_name
+            out += '('
             count = 0
             for param in tramp_param_replace:
                 if count > 0:
-                    generated_funcs += ', '
-                generated_funcs += param.name
+                    out += ', '
+                out += param.name
                 count = count + 1
-            generated_funcs += ');\n'
+            out += ');\n'
 
-            generated_funcs += '    }\n'
+            out += '    }\n'
 
             if has_return:
-                generated_funcs += '    return result;\n'
+                out += '    return result;\n'
 
-            generated_funcs += '}\nXRLOADER_ABI_CATCH_FALLBACK\n'
+            out += '}\nXRLOADER_ABI_CATCH_FALLBACK\n'
 
             if cur_cmd.protect_value:
-                generated_funcs += f'#endif // {cur_cmd.protect_string}\n'
-            generated_funcs += '\n'
-        return generated_funcs
+                out += f'#endif // {cur_cmd.protect_string}\n'
+            out += '\n'
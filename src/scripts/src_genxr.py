@@ -27,14 +27,15 @@ base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(os.path.join(base_dir, 'src', 'scripts'))
 sys.path.append(os.path.join(base_dir, 'specification', 'scripts'))
 
-from api_dump_generator import ApiDumpOutputGenerator
+from api_dump_generator import DISPATCH_MAP_LOCKING, ApiDumpGeneratorOptions, ApiDumpOutputGenerator
 from automatic_source_generator import AutomaticSourceGeneratorOptions
 from generator import write
 from loader_source_generator import LoaderSourceOutputGenerator
 from reflib import logDiag, logWarn, logErr, setLogFile
 from reg import Registry
 from utility_source_generator import UtilitySourceOutputGenerator
-from validation_layer_generator import ValidationSourceOutputGenerator
+from validation_layer_generator import (HANDLE_MAP_LOCKING, ValidationSourceGeneratorOptions,
+                                        ValidationSourceOutputGenerator)
 from apiconventions import APIConventions
 try:
     from conformance_generator import ConformanceGenerator
@@ -286,7 +287,8 @@ def makeGenOpts(args):
     # Source files generated for the api_dump layer
     genOpts['xr_generated_api_dump.cpp'] = [
         ApiDumpOutputGenerator,
-        AutomaticSourceGeneratorOptions(
+        ApiDumpGeneratorOptions(
+            dispatchMapLocking=args.dispatchMapLocking,
             conventions=conventions,
             filename='xr_generated_api_dump.cpp',
             directory=directory,
@@ -305,7 +307,8 @@ def makeGenOpts(args):
 
     genOpts['xr_generated_api_dump.hpp'] = [
         ApiDumpOutputGenerator,
-        AutomaticSourceGeneratorOptions(
+        ApiDumpGeneratorOptions(
+            dispatchMapLocking=args.dispatchMapLocking,
             conventions=conventions,
             filename='xr_generated_api_dump.hpp',
             directory=directory,
@@ -325,7 +328,8 @@ def makeGenOpts(args):
     # Source files generated for the core validation layer
     genOpts['xr_generated_core_validation.hpp'] = [
         ValidationSourceOutputGenerator,
-        AutomaticSourceGeneratorOptions(
+        ValidationSourceGeneratorOptions(
+            handleMapLocking=args.handleMapLocking,
             conventions=conventions,
             filename='xr_generated_core_validation.hpp',
             directory=directory,
@@ -344,7 +348,8 @@ def makeGenOpts(args):
 
     genOpts['xr_generated_core_validation.cpp'] = [
         ValidationSourceOutputGenerator,
-        AutomaticSourceGeneratorOptions(
+        ValidationSourceGeneratorOptions(
+            handleMapLocking=args.handleMapLocking,
             conventions=conventions,
             filename='xr_generated_core_validation.cpp',
             directory=directory,
@@ -382,6 +387,7 @@ def genTarget(args):
     if args.target in genOpts.keys():
         createGenerator = genOpts[args.target][0]
         options = genOpts[args.target][1]
+        options.writeIfChanged = args.writeIfChanged
 
         if not args.quiet:
             write('* Building', options.filename, file=sys.stderr)
@@ -442,13 +448,23 @@ if __name__ == '__main__':
                         help='Use specified registry file instead of xr.xml')
     parser.add_argument('-time', action='store_true',
                         help='Enable timing')
+    parser.add_argument('-writeIfChanged', action='store_true',
+                        help='Do not rewrite generated files whose contents are unchanged')
+    parser.add_argument('-cachedir', action='store', default=None,
+                        help='Cache the parsed registry in the specified directory, and reuse it while the registry is unchanged')
+    parser.add_argument('-handleMapLocking', action='store', default='mutex',
+                        choices=sorted(HANDLE_MAP_LOCKING),
+                        help='Locking of the handle info maps in the generated validation layer')
+    parser.add_argument('-dispatchMapLocking', action='store', default='mutex',
+                        choices=sorted(DISPATCH_MAP_LOCKING),
+                        help='Locking of the dispatch maps in the generated api_dump layer')
     parser.add_argument('-genpath', action='store', default='gen',
                         help='Path to generated files')
     parser.add_argument('-o', action='store', dest='directory',
                         default='.',
                         help='Create target and related files in specified directory')
-    parser.add_argument('target', metavar='target', nargs='?',
-                        help='Specify target')
+    parser.add_argument('targets', metavar='target', nargs='*',
+                        help='Specify target, or several targets to generate from a single parse of the registry')
     parser.add_argument('-quiet', action='store_true', default=False,
                         help='Suppress script output during normal execution.')
     parser.add_argument('-verbose', action='store_false', dest='quiet', default=True,
@@ -475,30 +491,53 @@ if __name__ == '__main__':
         # Log diagnostics and warnings
         setLogFile(setDiag=True, setWarn=True, filename='-')
 
-    # Create the API generator & generator options
-    (gen, options) = genTarget(args)
-
-    # Create the registry object with the specified generator and generator
-    # options. The options are set before XML loading as they may affect it.
-    reg = Registry(gen, options)
-
-    # Parse the specified registry XML into an ElementTree object
-    startTimer(args.time)
-    tree = etree.parse(args.registry)
-    endTimer(args.time, '* Time to make ElementTree =')
+    if not args.targets:
+        write('No target specified', file=sys.stderr)
+        sys.exit(1)
 
-    # Load the XML tree into the registry object
-    startTimer(args.time)
-    reg.loadElementTree(tree)
-    endTimer(args.time, '* Time to parse ElementTree =')
+    reg = None
+    for target in args.targets:
+        args.target = target
+
+        # Create the API generator & generator options
+        (gen, options) = genTarget(args)
+
+        if reg is None:
+            # Create the registry object with the specified generator and
+            # generator options. The options are set before XML loading as
+            # they may affect it.
+            reg = Registry(gen, options)
+
+            if args.cachedir:
+                # Load the registry from the cache, or parse and cache it
+                startTimer(args.time)
+                reg.loadFile(args.registry, cachedir=args.cachedir)
+                endTimer(args.time, '* Time to load registry =')
+            else:
+                # Parse the specified registry XML into an ElementTree object
+                startTimer(args.time)
+                tree = etree.parse(args.registry)
+                endTimer(args.time, '* Time to make ElementTree =')
+
+                # Load the XML tree into the registry object
+                startTimer(args.time)
+                reg.loadElementTree(tree)
+                endTimer(args.time, '* Time to parse ElementTree =')
+        else:
+            # Reuse the already-parsed registry for the following targets.
+            # apiGen() resets the state left over from the previous target.
+            reg.setTarget(gen, options)
+
+        # Finally, use the output generator to create the requested target
+        if args.debug:
+            pdb.run('reg.apiGen()')
+        else:
+            startTimer(args.time)
+            reg.apiGen()
+            endTimer(args.time, f"* Time to generate {options.filename} =")
 
-    # Finally, use the output generator to create the requested target
-    if args.debug:
-        pdb.run('reg.apiGen()')
-    else:
-        startTimer(args.time)
-        reg.apiGen()
-        endTimer(args.time, f"* Time to generate {options.filename} =")
-
-    if not args.quiet:
-        logDiag('* Generated', options.filename)
+        if not args.quiet:
+            logDiag('* Generated', options.filename)
+            if args.writeIfChanged:
+                write(f'* {options.filename}: wrote {gen.filesWritten} files, skipped {gen.filesUnchanged} unchanged files',
+                      file=sys.stderr)
@@ -84,28 +84,31 @@ class UtilitySourceOutputGenerator(AutomaticSourceOutputGenerator):
         assert self.genOpts
         assert self.genOpts.filename
 
-        file_data = ''
+        if not self.genOpts.filename.endswith(('.h', '.c')):
+            raise RuntimeError(f"Unknown filename extension! {self.genOpts.filename}")
 
-        file_data += '#ifdef __cplusplus\n'
-        file_data += 'extern "C" { \n'
-        file_data += '#endif\n'
+        out = self.makeSourceEmitter()
 
-        if self.genOpts.filename.endswith('.h'):
-            file_data += self.outputDispatchTable()
-            file_data += self.outputDispatchPrototypes()
+        out += '#ifdef __cplusplus\n'
+        out += 'extern "C" { \n'
+        out += '#endif\n'
 
-        elif self.genOpts.filename.endswith('.c'):
-            file_data += self.outputDispatchTableHelper()
+        if self.genOpts.filename.endswith('.h'):
+            with out.section('dispatch table'):
+                self.outputDispatchTable(out)
+                out += self.outputDispatchPrototypes()
 
         else:
-            raise RuntimeError(f"Unknown filename extension! {self.genOpts.filename}")
+            with out.section('dispatch table helper'):
+                self.outputDispatchTableHelper(out)
 
-        file_data += '\n'
-        file_data += '#ifdef __cplusplus\n'
-        file_data += '} // extern "C"\n'
-        file_data += '#endif\n'
+        out += '\n'
+        out += '#ifdef __cplusplus\n'
+        out += '} // extern "C"\n'
+        out += '#endif\n'
+        out += '\n'
 
-        write(file_data, file=self.outFile)
+        self.finishSourceEmitter(out)
 
         # Finish processing in superclass
         AutomaticSourceOutputGenerator.endFile(self)
@@ -130,17 +133,17 @@ class UtilitySourceOutputGenerator(AutomaticSourceOutputGenerator):
 
     # Write out a C-style structure used to store the Dispatch table information
     #   self            the ApiDumpOutputGenerator object
-    def outputDispatchTable(self):
+    #   out             the SourceEmitter to write to
+    def outputDispatchTable(self, out):
         assert self.genOpts
         commands = []
-        table = ''
         cur_extension = CurrentExtensionTracker(self.conventions.api_version_prefix)
 
-        table += '// Generated dispatch table\n'
+        out += '// Generated dispatch table\n'
         if self.genOpts.filename == 'xr_generated_dispatch_table_core.h':
-            table += 'struct XrGeneratedDispatchTableCore {\n'
+            out += 'struct XrGeneratedDispatchTableCore {\n'
         else:
-            table += 'struct XrGeneratedDispatchTable {\n'
+            out += 'struct XrGeneratedDispatchTable {\n'
 
         # functions implemented for the loader are different
         LOADER_FUNCTIONS = [
@@ -174,40 +177,33 @@ class UtilitySourceOutputGenerator(AutomaticSourceOutputGenerator):
                 # If we've switched to a new "feature" print out a comment on what it is.  Usually,
                 # this is a group of core commands or a group of commands in an extension.
                 assert cur_cmd.ext_name
-                table += cur_extension.format_if_extension_changed(cur_cmd.ext_name, "\n    // ---- {} commands\n")
+                out += cur_extension.format_if_extension_changed(cur_cmd.ext_name, "\n    // ---- {} commands\n")
 
                 # Remove 'xr' from proto name
                 base_name = cur_cmd.name[2:]
 
                 # If a protect statement exists, use it.
-                if cur_cmd.protect_value:
-                    table += f'#if {cur_cmd.protect_string}\n'
-
-                # Write out each command using it's function pointer for each command
-                table += f'    PFN_{cur_cmd.name} {base_name};\n'
-
-                # If a protect statement exists, wrap it up.
-                if cur_cmd.protect_value:
-                    table += f'#endif // {cur_cmd.protect_string}\n'
-        table += '};\n\n'
-        return table
+                with out.protect(cur_cmd.protect_value, cur_cmd.protect_string):
+                    # Write out each command using it's function pointer for each command
+                    out.line(f'PFN_{cur_cmd.name} {base_name};', indent=1)
+        out += '};\n\n'
 
     # Write out the helper function that will populate a dispatch table using
     # an instance handle and a corresponding xrGetInstanceProcAddr command.
     #   self            the ApiDumpOutputGenerator object
-    def outputDispatchTableHelper(self):
+    #   out             the SourceEmitter to write to
+    def outputDispatchTableHelper(self, out):
         assert self.genOpts
         commands = []
-        table_helper = ''
         cur_extension = CurrentExtensionTracker(self.conventions.api_version_prefix)
 
-        table_helper += '// Helper function to populate an instance dispatch table\n'
+        out += '// Helper function to populate an instance dispatch table\n'
         if self.genOpts.filename == 'xr_generated_dispatch_table_core.c':
-            table_helper += 'void GeneratedXrPopulateDispatchTableCore(struct XrGeneratedDispatchTableCore *table,\n'
+            out += 'void GeneratedXrPopulateDispatchTableCore(struct XrGeneratedDispatchTableCore *table,\n'
         else:
-            table_helper += 'void GeneratedXrPopulateDispatchTable(struct XrGeneratedDispatchTable *table,\n'
-        table_helper += '                                      XrInstance instance,\n'
-        table_helper += '                                      PFN_xrGetInstanceProcAddr get_inst_proc_addr) {\n'
+            out += 'void GeneratedXrPopulateDispatchTable(struct XrGeneratedDispatchTable *table,\n'
+        out += '                                      XrInstance instance,\n'
+        out += '                                      PFN_xrGetInstanceProcAddr get_inst_proc_addr) {\n'
 
         # Loop through both core commands, and extension commands
         # Outputting the core commands first, and then the extension commands.
@@ -236,25 +232,19 @@ class UtilitySourceOutputGenerator(AutomaticSourceOutputGenerator):
                 # If we've switched to a new "feature" print out a comment on what it is.  Usually,
                 # this is a group of core commands or a group of commands in an extension.
                 assert cur_cmd.ext_name
-                table_helper += cur_extension.format_if_extension_changed(cur_cmd.ext_name, "\n    // ---- {} commands\n")
+                out += cur_extension.format_if_extension_changed(cur_cmd.ext_name, "\n    // ---- {} commands\n")
 
                 # Remove 'xr' from proto name
                 base_name = cur_cmd.name[2:]
 
-                if cur_cmd.protect_value:
-                    table_helper += f'#if {cur_cmd.protect_string}\n'
-
-                if cur_cmd.name == 'xrGetInstanceProcAddr':
-                    # If the command we're filling in is the xrGetInstanceProcAddr command, use
-                    # the one passed into this helper function.
-                    table_helper += '    table->GetInstanceProcAddr = get_inst_proc_addr;\n'
-                else:
-                    # Otherwise, fill in the dispatch table with an xrGetInstanceProcAddr call
-                    # to the appropriate command.
-                    table_helper += '    (get_inst_proc_addr(instance, "%s", (PFN_xrVoidFunction*)&table->%s));\n' % (
-                        cur_cmd.name, base_name)
-
-                if cur_cmd.protect_value:
-                    table_helper += f'#endif // {cur_cmd.protect_string}\n'
-        table_helper += '}\n\n'
-        return table_helper
+                with out.protect(cur_cmd.protect_value, cur_cmd.protect_string):
+                    if cur_cmd.name == 'xrGetInstanceProcAddr':
+                        # If the command we're filling in is the xrGetInstanceProcAddr command, use
+                        # the one passed into this helper function.
+                        out.line('table->GetInstanceProcAddr = get_inst_proc_addr;', indent=1)
+                    else:
+                        # Otherwise, fill in the dispatch table with an xrGetInstanceProcAddr call
+                        # to the appropriate command.
+                        out.line(f'(get_inst_proc_addr(instance, "{cur_cmd.name}", (PFN_xrVoidFunction*)&table->{base_name}));',
+                                 indent=1)
+        out += '}\n\n'
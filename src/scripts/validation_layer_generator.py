@@ -23,8 +23,8 @@
 
 import re
 
-from automatic_source_generator import (AutomaticSourceOutputGenerator, CurrentExtensionTracker,
-                                        undecorate, MemberOrParam)
+from automatic_source_generator import (AutomaticSourceGeneratorOptions, AutomaticSourceOutputGenerator,
+                                        CurrentExtensionTracker, undecorate, MemberOrParam)
 from generator import write
 
 # The following commands have a manually defined component to them.
@@ -56,6 +56,34 @@ LOADER_ENUMS = [
 
 _CHAR_RE = re.compile(r"\bchar\b")
 
+# The types (from validation_utils.h) declared for the instance info map and the
+# other handle info maps, for each choice of ValidationSourceGeneratorOptions.handleMapLocking.
+# The instance map is never sharded, because the layer locks it as a whole.
+HANDLE_MAP_LOCKING = {
+    # One mutex per map.
+    'mutex': ('InstanceHandleInfo', 'HandleInfo<{}>'),
+    # One reader-writer lock per map, so that lookups run concurrently.
+    'shared': ('BasicInstanceHandleInfo<SharedLocking>', 'HandleInfo<{}, SharedLocking>'),
+    # Handle maps split into shards with a mutex each, so calls on different handles rarely contend.
+    'sharded': ('BasicInstanceHandleInfo<SharedLocking>', 'ShardedHandleInfo<{}>'),
+}
+
+
+class ValidationSourceGeneratorOptions(AutomaticSourceGeneratorOptions):
+    """ValidationSourceGeneratorOptions - subclass of AutomaticSourceGeneratorOptions."""
+
+    def __init__(self, handleMapLocking='mutex', **kwargs):
+        """Constructor.
+
+        - handleMapLocking - how the generated handle info maps are locked,
+          one of the keys of HANDLE_MAP_LOCKING.
+
+        Other arguments are passed to AutomaticSourceGeneratorOptions."""
+        AutomaticSourceGeneratorOptions.__init__(self, **kwargs)
+        if handleMapLocking not in HANDLE_MAP_LOCKING:
+            raise ValueError(f'Unknown handle map locking {handleMapLocking}, expected one of {", ".join(HANDLE_MAP_LOCKING)}')
+        self.handleMapLocking = handleMapLocking
+
 
 # ValidationSourceOutputGenerator - subclass of AutomaticSourceOutputGenerator.
 
@@ -129,13 +157,16 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
     #   self            the ValidationSourceOutputGenerator object
     def endFile(self):
         assert self.genOpts
-        file_data = ''
+        out = self.makeSourceEmitter()
         if self.genOpts.filename == 'xr_generated_core_validation.hpp':
-            file_data += self.outputValidationHeaderInfo()
+            with out.section('header info'):
+                out += self.outputValidationHeaderInfo()
         elif self.genOpts.filename == 'xr_generated_core_validation.cpp':
-            file_data += self.outputCommonTypesForValidation()
-            file_data += self.outputValidationSourceFuncs()
-        write(file_data, file=self.outFile)
+            with out.section('common types'):
+                out += self.outputCommonTypesForValidation()
+            self.outputValidationSourceFuncs(out)
+        out += '\n'
+        self.finishSourceEmitter(out)
 
         # Finish processing in superclass
         AutomaticSourceOutputGenerator.endFile(self)
@@ -150,14 +181,16 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
     def outputInfoMapDeclarations(self, extern):
         lines = []
         extern_keyword = 'extern ' if extern else ''
+        locking = getattr(self.genOpts, 'handleMapLocking', 'mutex')
+        instance_info_type, handle_info_type = HANDLE_MAP_LOCKING[locking]
         for handle in self.api_handles:
             handle_name = handle.name
             if handle.protect_value:
                 lines.append(f'#if {handle.protect_string}')
             if handle.name == 'XrInstance':
-                info_type = "InstanceHandleInfo"
+                info_type = instance_info_type
             else:
-                info_type = f'HandleInfo<{handle_name}>'
+                info_type = handle_info_type.format(handle_name)
 
             lines.append(f'{extern_keyword}{info_type} {self.makeInfoName(handle)};')
             if handle.protect_value:
@@ -269,67 +302,67 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
 
     # Generate C++ functions for validating enums.
     #   self            the ValidationSourceOutputGenerator object
-    def outputValidationSourceEnumValues(self):
-        enum_value_validate = ''
+    #   out             the SourceEmitter to write to
+    def outputValidationSourceEnumValues(self, out):
         for enum_tuple in self.api_enums:
             if enum_tuple.name in LOADER_ENUMS:
                 continue
 
             if enum_tuple.protect_value:
-                enum_value_validate += f'#if {enum_tuple.protect_string}\n'
-            enum_value_validate += f'// Function to validate {enum_tuple.name} enum\n'
-            enum_value_validate += 'bool ValidateXrEnum(GenValidUsageXrInstanceInfo *instance_info,\n'
-            enum_value_validate += '                    const std::string &command_name,\n'
-            enum_value_validate += '                    const std::string &validation_name,\n'
-            enum_value_validate += '                    const std::string &item_name,\n'
-            enum_value_validate += '                    std::vector<GenValidUsageXrObjectInfo>& objects_info,\n'
-            enum_value_validate += '                    const %s value) {\n' % enum_tuple.name
+                out += f'#if {enum_tuple.protect_string}\n'
+            out += f'// Function to validate {enum_tuple.name} enum\n'
+            out += 'bool ValidateXrEnum(GenValidUsageXrInstanceInfo *instance_info,\n'
+            out += '                    const std::string &command_name,\n'
+            out += '                    const std::string &validation_name,\n'
+            out += '                    const std::string &item_name,\n'
+            out += '                    std::vector<GenValidUsageXrObjectInfo>& objects_info,\n'
+            out += '                    const %s value) {\n' % enum_tuple.name
             indent = 1
-            enum_value_validate += self.writeIndent(indent)
-            enum_value_validate += '(void)instance_info;  // quiet warnings\n'
-            enum_value_validate += self.writeIndent(indent)
-            enum_value_validate += '(void)command_name;  // quiet warnings\n'
-            enum_value_validate += self.writeIndent(indent)
-            enum_value_validate += '(void)validation_name;  // quiet warnings\n'
-            enum_value_validate += self.writeIndent(indent)
-            enum_value_validate += '(void)item_name;  // quiet warnings\n'
-            enum_value_validate += self.writeIndent(indent)
-            enum_value_validate += '(void)objects_info;  // quiet warnings\n'
+            out += self.writeIndent(indent)
+            out += '(void)instance_info;  // quiet warnings\n'
+            out += self.writeIndent(indent)
+            out += '(void)command_name;  // quiet warnings\n'
+            out += self.writeIndent(indent)
+            out += '(void)validation_name;  // quiet warnings\n'
+            out += self.writeIndent(indent)
+            out += '(void)item_name;  // quiet warnings\n'
+            out += self.writeIndent(indent)
+            out += '(void)objects_info;  // quiet warnings\n'
             checked_extension = ''
             if enum_tuple.ext_name and not self.isCoreExtensionName(enum_tuple.ext_name):
                 checked_extension = enum_tuple.ext_name
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += f'// Enum requires extension {enum_tuple.ext_name}, so check that it is enabled\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += 'if (nullptr != instance_info && !ExtensionEnabled(instance_info->enabled_extensions, "%s")) {\n' % enum_tuple.ext_name
+                out += self.writeIndent(indent)
+                out += f'// Enum requires extension {enum_tuple.ext_name}, so check that it is enabled\n'
+                out += self.writeIndent(indent)
+                out += 'if (nullptr != instance_info && !ExtensionEnabled(instance_info->enabled_extensions, "%s")) {\n' % enum_tuple.ext_name
                 indent += 1
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += 'std::string vuid = "VUID-";\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += 'vuid += validation_name;\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += 'vuid += "-";\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += 'vuid += item_name;\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += 'vuid += "-parameter";\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += f'std::string error_str = "{enum_tuple.name} requires extension ";\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += f'error_str += " \\"{enum_tuple.ext_name}\\" to be enabled, but it is not enabled";\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += 'CoreValidLogMessage(instance_info, vuid,\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += '                    VALID_USAGE_DEBUG_SEVERITY_ERROR, command_name,\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += '                    objects_info, error_str);\n'
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += 'return false;\n'
+                out += self.writeIndent(indent)
+                out += 'std::string vuid = "VUID-";\n'
+                out += self.writeIndent(indent)
+                out += 'vuid += validation_name;\n'
+                out += self.writeIndent(indent)
+                out += 'vuid += "-";\n'
+                out += self.writeIndent(indent)
+                out += 'vuid += item_name;\n'
+                out += self.writeIndent(indent)
+                out += 'vuid += "-parameter";\n'
+                out += self.writeIndent(indent)
+                out += f'std::string error_str = "{enum_tuple.name} requires extension ";\n'
+                out += self.writeIndent(indent)
+                out += f'error_str += " \\"{enum_tuple.ext_name}\\" to be enabled, but it is not enabled";\n'
+                out += self.writeIndent(indent)
+                out += 'CoreValidLogMessage(instance_info, vuid,\n'
+                out += self.writeIndent(indent)
+                out += '                    VALID_USAGE_DEBUG_SEVERITY_ERROR, command_name,\n'
+                out += self.writeIndent(indent)
+                out += '                    objects_info, error_str);\n'
+                out += self.writeIndent(indent)
+                out += 'return false;\n'
                 indent -= 1
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += '}\n'
-            enum_value_validate += self.writeIndent(indent)
-            enum_value_validate += 'switch (value) {\n'
+                out += self.writeIndent(indent)
+                out += '}\n'
+            out += self.writeIndent(indent)
+            out += 'switch (value) {\n'
             indent += 1
             for cur_value in enum_tuple.values:
                 avoid_dupe = None
@@ -338,77 +371,76 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
                     aliased_value = aliased[0]
                     if aliased_value.protect_value and aliased_value.protect_value != cur_value.protect_value and aliased_value.protect_value != enum_tuple.protect_value:
                         avoid_dupe = aliased_value.protect_string
-                        enum_value_validate += f'#if !({avoid_dupe})\n'
+                        out += f'#if !({avoid_dupe})\n'
                     else:
                         # This would unconditionally cause a duplicate case
                         continue
                 value_protect = None
                 if cur_value.protect_value and enum_tuple.protect_value != cur_value.protect_value:
                     value_protect = cur_value.protect_string
-                    enum_value_validate += f'#if {value_protect}\n'
+                    out += f'#if {value_protect}\n'
 
-                enum_value_validate += self.writeIndent(indent)
-                enum_value_validate += f'case {cur_value.name}:\n'
+                out += self.writeIndent(indent)
+                out += f'case {cur_value.name}:\n'
                 if cur_value.ext_name and cur_value.ext_name != checked_extension and not self.isCoreExtensionName(cur_value.ext_name):
                     indent += 1
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += '// Enum value %s requires extension %s, so check that it is enabled\n' % (
+                    out += self.writeIndent(indent)
+                    out += '// Enum value %s requires extension %s, so check that it is enabled\n' % (
                         cur_value.name, cur_value.ext_name)
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'if (nullptr != instance_info && !ExtensionEnabled(instance_info->enabled_extensions, "%s")) {\n' % cur_value.ext_name
+                    out += self.writeIndent(indent)
+                    out += 'if (nullptr != instance_info && !ExtensionEnabled(instance_info->enabled_extensions, "%s")) {\n' % cur_value.ext_name
                     indent += 1
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'std::string vuid = "VUID-";\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'vuid += validation_name;\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'vuid += "-";\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'vuid += item_name;\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'vuid += "-parameter";\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'std::string error_str = "%s value \\"%s\\"";\n' % (
+                    out += self.writeIndent(indent)
+                    out += 'std::string vuid = "VUID-";\n'
+                    out += self.writeIndent(indent)
+                    out += 'vuid += validation_name;\n'
+                    out += self.writeIndent(indent)
+                    out += 'vuid += "-";\n'
+                    out += self.writeIndent(indent)
+                    out += 'vuid += item_name;\n'
+                    out += self.writeIndent(indent)
+                    out += 'vuid += "-parameter";\n'
+                    out += self.writeIndent(indent)
+                    out += 'std::string error_str = "%s value \\"%s\\"";\n' % (
                         enum_tuple.name, cur_value.name)
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'error_str += " being used, which requires extension ";\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += f'error_str += " \\"{cur_value.ext_name}\\" to be enabled, but it is not enabled";\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'CoreValidLogMessage(instance_info, vuid,\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += '                    VALID_USAGE_DEBUG_SEVERITY_ERROR, command_name,\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += '                    objects_info, error_str);\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'return false;\n'
+                    out += self.writeIndent(indent)
+                    out += 'error_str += " being used, which requires extension ";\n'
+                    out += self.writeIndent(indent)
+                    out += f'error_str += " \\"{cur_value.ext_name}\\" to be enabled, but it is not enabled";\n'
+                    out += self.writeIndent(indent)
+                    out += 'CoreValidLogMessage(instance_info, vuid,\n'
+                    out += self.writeIndent(indent)
+                    out += '                    VALID_USAGE_DEBUG_SEVERITY_ERROR, command_name,\n'
+                    out += self.writeIndent(indent)
+                    out += '                    objects_info, error_str);\n'
+                    out += self.writeIndent(indent)
+                    out += 'return false;\n'
                     indent -= 1
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += '}\n'
-                    enum_value_validate += self.writeIndent(indent)
-                    enum_value_validate += 'return true;\n'
+                    out += self.writeIndent(indent)
+                    out += '}\n'
+                    out += self.writeIndent(indent)
+                    out += 'return true;\n'
                     indent -= 1
                 elif cur_value.name == 'XR_TYPE_UNKNOWN':
-                    enum_value_validate += self.writeIndent(indent + 1)
-                    enum_value_validate += 'return false; // Invalid XrStructureType \n'
+                    out += self.writeIndent(indent + 1)
+                    out += 'return false; // Invalid XrStructureType \n'
                 else:
-                    enum_value_validate += self.writeIndent(indent + 1)
-                    enum_value_validate += 'return true;\n'
+                    out += self.writeIndent(indent + 1)
+                    out += 'return true;\n'
                 if value_protect:
-                    enum_value_validate += f'#endif // {value_protect}\n'
+                    out += f'#endif // {value_protect}\n'
                 if avoid_dupe:
-                    enum_value_validate += f'#endif // !({avoid_dupe})\n'
+                    out += f'#endif // !({avoid_dupe})\n'
             indent -= 1
-            enum_value_validate += self.writeIndent(indent)
-            enum_value_validate += 'default:\n'
-            enum_value_validate += self.writeIndent(indent + 1)
-            enum_value_validate += 'return false;\n'
+            out += self.writeIndent(indent)
+            out += 'default:\n'
+            out += self.writeIndent(indent + 1)
+            out += 'return false;\n'
             indent -= 1
-            enum_value_validate += '}\n'
-            enum_value_validate += '}\n\n'
+            out += '}\n'
+            out += '}\n\n'
             if enum_tuple.protect_value:
-                enum_value_validate += f'#endif // {enum_tuple.protect_string}\n'
-        return enum_value_validate
+                out += f'#endif // {enum_tuple.protect_string}\n'
 
     # Generate prototypes for functions used internal to the source file so other functions can use them
     #   self            the ValidationSourceOutputGenerator object
@@ -1939,9 +1971,8 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
 
     # Write the validation function for every struct we know about.
     #   self            the ValidationSourceOutputGenerator object
-
-    def writeValidateStructFuncs(self):
-        struct_check = ''
+    #   out             the SourceEmitter to write to
+    def writeValidateStructFuncs(self, out):
         # Now write out the actual functions
         for xr_struct in self.api_structures:
             if xr_struct.name in LOADER_STRUCTS:
@@ -1955,17 +1986,17 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
             relation_group = None
 
             if xr_struct.protect_value:
-                struct_check += f'#if {xr_struct.protect_string}\n'
-            struct_check += 'XrResult ValidateXrStruct(GenValidUsageXrInstanceInfo *instance_info, const std::string &command_name,\n'
-            struct_check += '                          std::vector<GenValidUsageXrObjectInfo>& objects_info, bool check_members, bool check_pnext,\n'
-            struct_check += '                          const %s* value) {\n' % xr_struct.name
+                out += f'#if {xr_struct.protect_string}\n'
+            out += 'XrResult ValidateXrStruct(GenValidUsageXrInstanceInfo *instance_info, const std::string &command_name,\n'
+            out += '                          std::vector<GenValidUsageXrObjectInfo>& objects_info, bool check_members, bool check_pnext,\n'
+            out += '                          const %s* value) {\n' % xr_struct.name
             setup_bail = False
-            struct_check += '    XrResult xr_result = XR_SUCCESS;\n'
-            struct_check += '    (void)xr_result;\n'
+            out += '    XrResult xr_result = XR_SUCCESS;\n'
+            out += '    (void)xr_result;\n'
 
             for arg in ('instance_info', 'command_name', 'objects_info', 'check_members', 'value'):
-                struct_check += self.writeIndent(indent)
-                struct_check += f'(void){arg};\n'
+                out += self.writeIndent(indent)
+                out += f'(void){arg};\n'
             # Check to see if this struct is the base of a relation group
             relation_group = self.getRelationGroupForBaseStruct(xr_struct.name)
             if relation_group is not None:
@@ -1977,60 +2008,60 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
                 assert relation_group
                 for member in xr_struct.members:
                     if member.name == 'next':
-                        struct_check += self.writeIndent(indent)
-                        struct_check += f'// NOTE: Can\'t validate "VUID-{xr_struct.name}-next-next" because it is a base structure\n'
+                        out += self.writeIndent(indent)
+                        out += f'// NOTE: Can\'t validate "VUID-{xr_struct.name}-next-next" because it is a base structure\n'
                     else:
-                        struct_check += self.writeIndent(indent)
-                        struct_check += '// NOTE: Can\'t validate "VUID-%s-%s-parameter" because it is a base structure\n' % (
+                        out += self.writeIndent(indent)
+                        out += '// NOTE: Can\'t validate "VUID-%s-%s-parameter" because it is a base structure\n' % (
                             xr_struct.name, member.name)
                 for child in relation_group.child_struct_names:
                     child_struct = self.getStruct(child)
                     if child_struct and child_struct.protect_value:
-                        struct_check += f'#if {child_struct.protect_string}\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += 'if (value->type == %s) {\n' % self.genXrStructureType(
+                        out += f'#if {child_struct.protect_string}\n'
+                    out += self.writeIndent(indent)
+                    out += 'if (value->type == %s) {\n' % self.genXrStructureType(
                         child)
                     indent += 1
-                    struct_check += self.writeIndent(indent)
-                    struct_check += f'const {child}* new_value = reinterpret_cast<const {child}*>(value);\n'
+                    out += self.writeIndent(indent)
+                    out += f'const {child}* new_value = reinterpret_cast<const {child}*>(value);\n'
                     if child_struct and child_struct.ext_name and not self.isCoreExtensionName(child_struct.ext_name):
-                        struct_check += self.writeIndent(indent)
-                        struct_check += 'if (nullptr != instance_info && !ExtensionEnabled(instance_info->enabled_extensions, "%s")) {\n' % child_struct.ext_name
+                        out += self.writeIndent(indent)
+                        out += 'if (nullptr != instance_info && !ExtensionEnabled(instance_info->enabled_extensions, "%s")) {\n' % child_struct.ext_name
                         indent += 1
-                        struct_check += self.writeIndent(indent)
-                        struct_check += f'std::string error_str = "{xr_struct.name} being used with child struct type ";\n'
-                        struct_check += self.writeIndent(indent)
-                        struct_check += f'error_str += "\\"{self.genXrStructureType(child)}\\"";\n'
-                        struct_check += self.writeIndent(indent)
-                        struct_check += f'error_str += " which requires extension \\"{child_struct.ext_name}\\" to be enabled, but it is not enabled";\n'
-                        struct_check += self.writeIndent(indent)
-                        struct_check += f'CoreValidLogMessage(instance_info, "VUID-{xr_struct.name}-type-type",\n'
-                        struct_check += self.writeIndent(indent)
-                        struct_check += '                    VALID_USAGE_DEBUG_SEVERITY_ERROR, command_name,\n'
-                        struct_check += self.writeIndent(indent)
-                        struct_check += '                    objects_info, error_str);\n'
-                        struct_check += self.writeIndent(indent)
-                        struct_check += 'return XR_ERROR_VALIDATION_FAILURE;\n'
+                        out += self.writeIndent(indent)
+                        out += f'std::string error_str = "{xr_struct.name} being used with child struct type ";\n'
+                        out += self.writeIndent(indent)
+                        out += f'error_str += "\\"{self.genXrStructureType(child)}\\"";\n'
+                        out += self.writeIndent(indent)
+                        out += f'error_str += " which requires extension \\"{child_struct.ext_name}\\" to be enabled, but it is not enabled";\n'
+                        out += self.writeIndent(indent)
+                        out += f'CoreValidLogMessage(instance_info, "VUID-{xr_struct.name}-type-type",\n'
+                        out += self.writeIndent(indent)
+                        out += '                    VALID_USAGE_DEBUG_SEVERITY_ERROR, command_name,\n'
+                        out += self.writeIndent(indent)
+                        out += '                    objects_info, error_str);\n'
+                        out += self.writeIndent(indent)
+                        out += 'return XR_ERROR_VALIDATION_FAILURE;\n'
                         indent -= 1
-                        struct_check += self.writeIndent(indent)
-                        struct_check += '}\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += 'return ValidateXrStruct(instance_info, command_name, objects_info, check_members, false, new_value);\n'
+                        out += self.writeIndent(indent)
+                        out += '}\n'
+                    out += self.writeIndent(indent)
+                    out += 'return ValidateXrStruct(instance_info, command_name, objects_info, check_members, false, new_value);\n'
                     indent -= 1
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '}\n'
+                    out += self.writeIndent(indent)
+                    out += '}\n'
                     if child_struct and child_struct.protect_value:
-                        struct_check += f'#endif // {child_struct.protect_string}\n'
-
-                struct_check += self.writeIndent(indent)
-                struct_check += f'InvalidStructureType(instance_info, command_name, objects_info, "{xr_struct.name}",\n'
-                struct_check += self.writeIndent(indent)
-                struct_check += f'                     value->type, "VUID-{xr_struct.name}-type-type");\n'
-                struct_check += self.writeIndent(indent)
-                struct_check += 'return XR_ERROR_VALIDATION_FAILURE;\n'
-                struct_check += '}\n\n'
+                        out += f'#endif // {child_struct.protect_string}\n'
+
+                out += self.writeIndent(indent)
+                out += f'InvalidStructureType(instance_info, command_name, objects_info, "{xr_struct.name}",\n'
+                out += self.writeIndent(indent)
+                out += f'                     value->type, "VUID-{xr_struct.name}-type-type");\n'
+                out += self.writeIndent(indent)
+                out += 'return XR_ERROR_VALIDATION_FAILURE;\n'
+                out += '}\n\n'
                 if xr_struct.protect_value:
-                    struct_check += f'#endif // {xr_struct.protect_string}\n'
+                    out += f'#endif // {xr_struct.protect_string}\n'
                 continue
 
             first_member_handle_tuple = None
@@ -2044,42 +2075,42 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
                 if member.no_auto_validity:
                     continue
                 if member.name == 'type':
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '// Make sure the structure type is correct\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += 'if (value->type != %s) {\n' % self.genXrStructureType(
+                    out += self.writeIndent(indent)
+                    out += '// Make sure the structure type is correct\n'
+                    out += self.writeIndent(indent)
+                    out += 'if (value->type != %s) {\n' % self.genXrStructureType(
                         xr_struct.name)
                     indent = indent + 1
                     expected = self.genXrStructureType(xr_struct.name)
-                    struct_check += self.writeIndent(indent)
-                    struct_check += f'InvalidStructureType(instance_info, command_name, objects_info, "{xr_struct.name}",\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '                     value->type, "VUID-%s-type-type", %s, "%s");\n' % (
+                    out += self.writeIndent(indent)
+                    out += f'InvalidStructureType(instance_info, command_name, objects_info, "{xr_struct.name}",\n'
+                    out += self.writeIndent(indent)
+                    out += '                     value->type, "VUID-%s-type-type", %s, "%s");\n' % (
                         xr_struct.name, expected, expected)
-                    struct_check += self.writeIndent(indent)
-                    struct_check += 'xr_result = XR_ERROR_VALIDATION_FAILURE;\n'
+                    out += self.writeIndent(indent)
+                    out += 'xr_result = XR_ERROR_VALIDATION_FAILURE;\n'
                     indent = indent - 1
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '}\n'
+                    out += self.writeIndent(indent)
+                    out += '}\n'
                     continue
                 elif member.name == 'next':
-                    struct_check += self.writeValidateStructNextCheck(
+                    out += self.writeValidateStructNextCheck(
                         xr_struct.name, 'value', member, indent)
                 elif member.name == 'enabledExtensionCount':
                     has_enable_extension_count = True
                 elif member.name == 'enabledExtensionNames':
                     has_enable_extension_names = True
                 elif not setup_bail:
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '// If we are not to check the rest of the members, just return here.\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += 'if (!check_members || XR_SUCCESS != xr_result) {\n'
-                    struct_check += self.writeIndent(indent + 1)
-                    struct_check += 'return xr_result;\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '}\n'
+                    out += self.writeIndent(indent)
+                    out += '// If we are not to check the rest of the members, just return here.\n'
+                    out += self.writeIndent(indent)
+                    out += 'if (!check_members || XR_SUCCESS != xr_result) {\n'
+                    out += self.writeIndent(indent + 1)
+                    out += 'return xr_result;\n'
+                    out += self.writeIndent(indent)
+                    out += '}\n'
                     setup_bail = True
-                struct_check += self.outputParamMemberContents(False, xr_struct.name, member, 'value->',
+                out += self.outputParamMemberContents(False, xr_struct.name, member, 'value->',
                                                                "instance_info", "command_name",
                                                                count == 0,
                                                                first_member_handle,
@@ -2094,41 +2125,40 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
             # We only have extensions to check if both the count and enable fields are there
             if has_enable_extension_count and has_enable_extension_names:
                 # This is create instance, so check all instance extensions
-                struct_check += self.writeIndent(indent)
-                struct_check += 'std::vector<std::string> enabled_extension_vec;\n'
-                struct_check += self.writeIndent(indent)
-                struct_check += 'for (uint32_t extension = 0; extension < value->enabledExtensionCount; ++extension) {\n'
-                struct_check += self.writeIndent(indent + 1)
-                struct_check += 'enabled_extension_vec.push_back(value->enabledExtensionNames[extension]);\n'
-                struct_check += self.writeIndent(indent)
-                struct_check += '}\n'
+                out += self.writeIndent(indent)
+                out += 'std::vector<std::string> enabled_extension_vec;\n'
+                out += self.writeIndent(indent)
+                out += 'for (uint32_t extension = 0; extension < value->enabledExtensionCount; ++extension) {\n'
+                out += self.writeIndent(indent + 1)
+                out += 'enabled_extension_vec.push_back(value->enabledExtensionNames[extension]);\n'
+                out += self.writeIndent(indent)
+                out += '}\n'
                 if xr_struct.name == 'XrInstanceCreateInfo':
-                    struct_check += self.writeIndent(indent)
-                    struct_check += f'if (!ValidateInstanceExtensionDependencies(nullptr, command_name, "{xr_struct.name}",\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '                                           objects_info, enabled_extension_vec)) {\n'
-                    struct_check += self.writeIndent(indent + 1)
-                    struct_check += 'return XR_ERROR_VALIDATION_FAILURE;\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '}\n'
+                    out += self.writeIndent(indent)
+                    out += f'if (!ValidateInstanceExtensionDependencies(nullptr, command_name, "{xr_struct.name}",\n'
+                    out += self.writeIndent(indent)
+                    out += '                                           objects_info, enabled_extension_vec)) {\n'
+                    out += self.writeIndent(indent + 1)
+                    out += 'return XR_ERROR_VALIDATION_FAILURE;\n'
+                    out += self.writeIndent(indent)
+                    out += '}\n'
                 else:
-                    struct_check += self.writeIndent(indent)
-                    struct_check += f'if (!ValidateSystemExtensionDependencies(instance_info, command_name, "{xr_struct.name}",\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '                                         objects_info, enabled_extension_vec)) {\n'
-                    struct_check += self.writeIndent(indent + 1)
-                    struct_check += 'return XR_ERROR_VALIDATION_FAILURE;\n'
-                    struct_check += self.writeIndent(indent)
-                    struct_check += '}\n'
-            struct_check += self.writeIndent(indent)
-            struct_check += '// Everything checked out properly\n'
-            struct_check += self.writeIndent(indent)
-            struct_check += 'return xr_result;\n'
-            struct_check += '}\n\n'
+                    out += self.writeIndent(indent)
+                    out += f'if (!ValidateSystemExtensionDependencies(instance_info, command_name, "{xr_struct.name}",\n'
+                    out += self.writeIndent(indent)
+                    out += '                                         objects_info, enabled_extension_vec)) {\n'
+                    out += self.writeIndent(indent + 1)
+                    out += 'return XR_ERROR_VALIDATION_FAILURE;\n'
+                    out += self.writeIndent(indent)
+                    out += '}\n'
+            out += self.writeIndent(indent)
+            out += '// Everything checked out properly\n'
+            out += self.writeIndent(indent)
+            out += 'return xr_result;\n'
+            out += '}\n\n'
             if xr_struct.protect_value:
-                struct_check += f'#endif // {xr_struct.protect_string}\n'
-        struct_check += '\n'
-        return struct_check
+                out += f'#endif // {xr_struct.protect_string}\n'
+        out += '\n'
 
     # Write an inline validation check for handle parents
     #   self                    the ValidationSourceOutputGenerator object
@@ -2669,73 +2699,84 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
 
     # Implementation for generated validation commands
     #   self                the ValidationSourceOutputGenerator object
-    def outputValidationSourceFuncs(self):
-        commands = []
-        validation_source_funcs = ''
+    #   out                 the SourceEmitter to write to
+    def outputValidationSourceFuncs(self, out):
         cur_extension_name = ''
 
         # First, output the mapping and mutex items
-        validation_source_funcs += '// Unordered Map associating pointer to a vector of session label information to a session\'s handle\n'
-        validation_source_funcs += 'std::unordered_map<XrSession, std::vector<GenValidUsageXrInternalSessionLabel*>*> g_xr_session_labels;\n\n'
-        validation_source_funcs += self.outputInfoMapDeclarations(extern=False)
-        validation_source_funcs += '\n'
-        validation_source_funcs += self.outputValidationInternalProtos()
-        validation_source_funcs += '// Function used to clean up any residual map values that point to an instance prior to that\n'
-        validation_source_funcs += '// instance being deleted.\n'
-        validation_source_funcs += 'void GenValidUsageCleanUpMaps(GenValidUsageXrInstanceInfo *instance_info) {\n'
+        out += '// Unordered Map associating pointer to a vector of session label information to a session\'s handle\n'
+        out += 'std::unordered_map<XrSession, std::vector<GenValidUsageXrInternalSessionLabel*>*> g_xr_session_labels;\n\n'
+        with out.section('info maps and internal prototypes'):
+            out += self.outputInfoMapDeclarations(extern=False)
+            out += '\n'
+            out += self.outputValidationInternalProtos()
+        out += '// Function used to clean up any residual map values that point to an instance prior to that\n'
+        out += '// instance being deleted.\n'
+        out += 'void GenValidUsageCleanUpMaps(GenValidUsageXrInstanceInfo *instance_info) {\n'
         for handle in self.api_handles:
-            if handle.protect_value:
-                validation_source_funcs += f'#if {handle.protect_string}\n'
-            if handle.name == 'XrInstance':
-                validation_source_funcs += '    EraseAllInstanceTableMapElements(instance_info);\n'
-            else:
-                validation_source_funcs += f'    {self.makeInfoName(handle_type=handle)}.removeHandlesForInstance(instance_info);\n'
-            if handle.protect_value:
-                validation_source_funcs += f'#endif // {handle.protect_string}\n'
-        validation_source_funcs += '}\n'
-        validation_source_funcs += '\n'
-        validation_source_funcs += '// Function to convert XrObjectType to string\n'
-        validation_source_funcs += 'std::string GenValidUsageXrObjectTypeToString(const XrObjectType& type) {\n'
-        validation_source_funcs += '    std::string object_string;\n'
+            with out.protect(handle.protect_value, handle.protect_string):
+                if handle.name == 'XrInstance':
+                    out.line('EraseAllInstanceTableMapElements(instance_info);', indent=1)
+                else:
+                    out.line(f'{self.makeInfoName(handle_type=handle)}.removeHandlesForInstance(instance_info);', indent=1)
+        out += '}\n'
+        out += '\n'
+        out += '// Function to convert XrObjectType to string\n'
+        out += 'std::string GenValidUsageXrObjectTypeToString(const XrObjectType& type) {\n'
+        out += '    std::string object_string;\n'
         count = 0
         for object_type in self.api_object_types:
             object_string = object_type.name.replace("XR_OBJECT_TYPE_", "").replace("_", "")
             if object_string == "UNKNOWN":
                 if count == 0:
-                    validation_source_funcs += '    if '
+                    out += '    if '
                 else:
-                    validation_source_funcs += '    } else if '
-                validation_source_funcs += '(type == XR_OBJECT_TYPE_UNKNOWN) {\n'
-                validation_source_funcs += '        object_string = "Unknown XR Object";\n'
+                    out += '    } else if '
+                out += '(type == XR_OBJECT_TYPE_UNKNOWN) {\n'
+                out += '        object_string = "Unknown XR Object";\n'
             else:
                 for handle in self.api_handles:
                     handle_name = handle.name[2:].upper()
                     if handle_name != object_string:
                         continue
                     if object_type.protect_value:
-                        validation_source_funcs += f'#if {object_type.protect_string}\n'
+                        out += f'#if {object_type.protect_string}\n'
                     if count == 0:
-                        validation_source_funcs += '    if '
+                        out += '    if '
                     else:
-                        validation_source_funcs += '    } else if '
-                    validation_source_funcs += '(type == %s) {\n' % object_type.name
-                    validation_source_funcs += f'        object_string = "{handle.name}";\n'
+                        out += '    } else if '
+                    out += '(type == %s) {\n' % object_type.name
+                    out += f'        object_string = "{handle.name}";\n'
                     if object_type.protect_value:
-                        validation_source_funcs += f'#endif // {object_type.protect_string}\n'
+                        out += f'#endif // {object_type.protect_string}\n'
             count = count + 1
-        validation_source_funcs += '    }\n'
-        validation_source_funcs += '    return object_string;\n'
-        validation_source_funcs += '}\n\n'
-        validation_source_funcs += self.outputValidationStateCheckStructs()
-        validation_source_funcs += self.outputValidationSourceNextChainProtos()
-        validation_source_funcs += self.outputValidationSourceFlagBitValues()
-        validation_source_funcs += self.outputValidationSourceEnumValues()
-        validation_source_funcs += self.writeVerifyExtensions()
-        validation_source_funcs += self.writeValidateHandleChecks()
-        validation_source_funcs += self.writeValidateHandleParent()
-        validation_source_funcs += self.writeValidateStructFuncs()
-        validation_source_funcs += self.outputValidationSourceNextChainFunc()
-
+        out += '    }\n'
+        out += '    return object_string;\n'
+        out += '}\n\n'
+        with out.section('state checks and next chain prototypes'):
+            out += self.outputValidationStateCheckStructs()
+            out += self.outputValidationSourceNextChainProtos()
+        with out.section('flag bit values'):
+            out += self.outputValidationSourceFlagBitValues()
+        with out.section('enum values'):
+            self.outputValidationSourceEnumValues(out)
+        with out.section('extensions and handles'):
+            out += self.writeVerifyExtensions()
+            out += self.writeValidateHandleChecks()
+            out += self.writeValidateHandleParent()
+        with out.section('structs'):
+            self.writeValidateStructFuncs(out)
+        with out.section('next chain'):
+            out += self.outputValidationSourceNextChainFunc()
+        with out.section('commands'):
+            self.outputValidationCommandFuncs(out)
+        with out.section('xrGetInstanceProcAddr'):
+            self.outputValidationGetInstanceProcAddr(out)
+
+    # Write out the validation functions for each command.
+    #   self            the ValidationSourceOutputGenerator object
+    #   out             the SourceEmitter to write to
+    def outputValidationCommandFuncs(self, out):
         cur_extension = CurrentExtensionTracker(self.conventions.api_version_prefix)
 
         for x in range(0, 2):
@@ -2746,7 +2787,7 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
 
             for cur_cmd in commands:
                 assert cur_cmd.ext_name
-                validation_source_funcs += cur_extension.format_if_extension_changed(cur_cmd.ext_name,
+                out += cur_extension.format_if_extension_changed(cur_cmd.ext_name,
                                                                                      "\n// ---- {} commands\n")
 
                 if cur_cmd.name in self.no_trampoline_or_terminator:
@@ -2757,8 +2798,8 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
                     continue
 
                 if cur_cmd.protect_value:
-                    validation_source_funcs += f'#if {cur_cmd.protect_string}\n'
-                    validation_source_funcs += '\n'
+                    out += f'#if {cur_cmd.protect_string}\n'
+                    out += '\n'
 
                 is_create = False
                 is_destroy = False
@@ -2774,20 +2815,24 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
                 elif cur_cmd.return_type is not None:
                     has_return = True
 
-                validation_source_funcs += self.genValidateInputsFunc(cur_cmd)
-                validation_source_funcs += self.genNextValidateFunc(
+                out += self.genValidateInputsFunc(cur_cmd)
+                out += self.genNextValidateFunc(
                     cur_cmd, has_return, is_create, is_destroy, is_sempath_query)
                 if cur_cmd.name not in VALID_USAGE_MANUALLY_DEFINED:
-                    validation_source_funcs += self.genAutoValidateFunc(
+                    out += self.genAutoValidateFunc(
                         cur_cmd, has_return)
 
                 if cur_cmd.protect_value:
-                    validation_source_funcs += f'#endif // {cur_cmd.protect_string}\n'
-                    validation_source_funcs += '\n'
+                    out += f'#endif // {cur_cmd.protect_string}\n'
+                    out += '\n'
 
-        validation_source_funcs += 'static PFN_xrVoidFunction GenValidUsageInnerGetInstanceProcAddr(\n'
-        validation_source_funcs += '    const char*                                 name) {\n'
-        validation_source_funcs += '        std::string func_name = name;\n\n'
+    # Write out the layer's xrGetInstanceProcAddr, and the lookup of each command it uses.
+    #   self            the ValidationSourceOutputGenerator object
+    #   out             the SourceEmitter to write to
+    def outputValidationGetInstanceProcAddr(self, out):
+        out += 'static PFN_xrVoidFunction GenValidUsageInnerGetInstanceProcAddr(\n'
+        out += '    const char*                                 name) {\n'
+        out += '        std::string func_name = name;\n\n'
 
         cur_extension = CurrentExtensionTracker(self.conventions.api_version_prefix)
 
@@ -2799,7 +2844,7 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
 
             for cur_cmd in commands:
                 assert cur_cmd.ext_name
-                validation_source_funcs += cur_extension.format_if_extension_changed(cur_cmd.ext_name,
+                out += cur_extension.format_if_extension_changed(cur_cmd.ext_name,
                                                                                      "\n        // ---- {} commands\n")
 
                 if cur_cmd.name in self.no_trampoline_or_terminator:
@@ -2818,60 +2863,55 @@ class ValidationSourceOutputGenerator(AutomaticSourceOutputGenerator):
                     layer_command_name = cur_cmd.name.replace(
                         "xr", "GenValidUsageXr")
 
-                if cur_cmd.protect_value:
-                    validation_source_funcs += f'#if {cur_cmd.protect_string}\n'
-
-                validation_source_funcs += '        if (func_name == "%s") {\n' % cur_cmd.name
-                validation_source_funcs += f'            return reinterpret_cast<PFN_xrVoidFunction>({layer_command_name});\n'
-                validation_source_funcs += '        }\n'
-                if cur_cmd.protect_value:
-                    validation_source_funcs += f'#endif // {cur_cmd.protect_string}\n'
+                with out.protect(cur_cmd.protect_value, cur_cmd.protect_string):
+                    out += '        if (func_name == "%s") {\n' % cur_cmd.name
+                    out += f'            return reinterpret_cast<PFN_xrVoidFunction>({layer_command_name});\n'
+                    out += '        }\n'
 
         # If we fell thru, return null
-        validation_source_funcs += '        return nullptr;\n'
-        validation_source_funcs += '    }\n'
-
-        validation_source_funcs += '\n// API Layer\'s xrGetInstanceProcAddr\n'
-        validation_source_funcs += 'XRAPI_ATTR XrResult XRAPI_CALL GenValidUsageXrGetInstanceProcAddr(\n'
-        validation_source_funcs += '    XrInstance          instance,\n'
-        validation_source_funcs += '    const char*         name,\n'
-        validation_source_funcs += '    PFN_xrVoidFunction* function) {\n'
-        validation_source_funcs += '    try {\n'
-        validation_source_funcs += '        std::string func_name = name;\n'
-        validation_source_funcs += '        std::vector<GenValidUsageXrObjectInfo> objects;\n'
-        validation_source_funcs += '        if (g_instance_info.verifyHandle(&instance) == VALIDATE_XR_HANDLE_INVALID) {\n'
-        validation_source_funcs += '            // Make sure the instance is valid if it is not XR_NULL_HANDLE\n'
-        validation_source_funcs += '            std::vector<GenValidUsageXrObjectInfo> objects;\n'
-        validation_source_funcs += '            objects.resize(1);\n'
-        validation_source_funcs += '            objects[0].handle = MakeHandleGeneric(instance);\n'
-        validation_source_funcs += '            objects[0].type = XR_OBJECT_TYPE_INSTANCE;\n'
-        validation_source_funcs += '            CoreValidLogMessage(nullptr, "VUID-xrGetInstanceProcAddr-instance-parameter",\n'
-        validation_source_funcs += '                                VALID_USAGE_DEBUG_SEVERITY_ERROR, "xrGetInstanceProcAddr", objects,\n'
-        validation_source_funcs += '                                "Invalid instance handle provided.");\n'
-        validation_source_funcs += '        }\n'
-        validation_source_funcs += '        // NOTE: Can\'t validate "VUID-xrGetInstanceProcAddr-name-parameter" null-termination\n'
-        validation_source_funcs += '        // If we setup the function, just return\n'
-        validation_source_funcs += '        if (function == nullptr) {\n'
-        validation_source_funcs += '            CoreValidLogMessage(nullptr, "VUID-xrGetInstanceProcAddr-function-parameter",\n'
-        validation_source_funcs += '                                VALID_USAGE_DEBUG_SEVERITY_ERROR, "xrGetInstanceProcAddr", objects,\n'
-        validation_source_funcs += '                                "function is NULL");\n'
-        validation_source_funcs += '            return XR_ERROR_VALIDATION_FAILURE;\n'
-        validation_source_funcs += '        }\n'
-
-        validation_source_funcs += '        *function = GenValidUsageInnerGetInstanceProcAddr(name);\n\n'
-
-        validation_source_funcs += '        // If we setup the function, just return\n'
-        validation_source_funcs += '        if (*function != nullptr) {\n'
-        validation_source_funcs += '            return XR_SUCCESS;\n'
-        validation_source_funcs += '        }\n'
-        validation_source_funcs += '        // We have not found it, so pass it down to the next layer/runtime\n'
-        validation_source_funcs += '        GenValidUsageXrInstanceInfo* instance_valid_usage_info = g_instance_info.get(instance);\n'
-        validation_source_funcs += '        if (nullptr == instance_valid_usage_info) {\n'
-        validation_source_funcs += '            return XR_ERROR_HANDLE_INVALID;\n'
-        validation_source_funcs += '        }\n'
-        validation_source_funcs += '        return instance_valid_usage_info->dispatch_table->GetInstanceProcAddr(instance, name, function);\n'
-        validation_source_funcs += '    } catch (...) {\n'
-        validation_source_funcs += '        return XR_ERROR_VALIDATION_FAILURE;\n'
-        validation_source_funcs += '    }\n'
-        validation_source_funcs += '}\n'
-        return validation_source_funcs
+        out += '        return nullptr;\n'
+        out += '    }\n'
+
+        out += '\n// API Layer\'s xrGetInstanceProcAddr\n'
+        out += 'XRAPI_ATTR XrResult XRAPI_CALL GenValidUsageXrGetInstanceProcAddr(\n'
+        out += '    XrInstance          instance,\n'
+        out += '    const char*         name,\n'
+        out += '    PFN_xrVoidFunction* function) {\n'
+        out += '    try {\n'
+        out += '        std::string func_name = name;\n'
+        out += '        std::vector<GenValidUsageXrObjectInfo> objects;\n'
+        out += '        if (g_instance_info.verifyHandle(&instance) == VALIDATE_XR_HANDLE_INVALID) {\n'
+        out += '            // Make sure the instance is valid if it is not XR_NULL_HANDLE\n'
+        out += '            std::vector<GenValidUsageXrObjectInfo> objects;\n'
+        out += '            objects.resize(1);\n'
+        out += '            objects[0].handle = MakeHandleGeneric(instance);\n'
+        out += '            objects[0].type = XR_OBJECT_TYPE_INSTANCE;\n'
+        out += '            CoreValidLogMessage(nullptr, "VUID-xrGetInstanceProcAddr-instance-parameter",\n'
+        out += '                                VALID_USAGE_DEBUG_SEVERITY_ERROR, "xrGetInstanceProcAddr", objects,\n'
+        out += '                                "Invalid instance handle provided.");\n'
+        out += '        }\n'
+        out += '        // NOTE: Can\'t validate "VUID-xrGetInstanceProcAddr-name-parameter" null-termination\n'
+        out += '        // If we setup the function, just return\n'
+        out += '        if (function == nullptr) {\n'
+        out += '            CoreValidLogMessage(nullptr, "VUID-xrGetInstanceProcAddr-function-parameter",\n'
+        out += '                                VALID_USAGE_DEBUG_SEVERITY_ERROR, "xrGetInstanceProcAddr", objects,\n'
+        out += '                                "function is NULL");\n'
+        out += '            return XR_ERROR_VALIDATION_FAILURE;\n'
+        out += '        }\n'
+
+        out += '        *function = GenValidUsageInnerGetInstanceProcAddr(name);\n\n'
+
+        out += '        // If we setup the function, just return\n'
+        out += '        if (*function != nullptr) {\n'
+        out += '            return XR_SUCCESS;\n'
+        out += '        }\n'
+        out += '        // We have not found it, so pass it down to the next layer/runtime\n'
+        out += '        GenValidUsageXrInstanceInfo* instance_valid_usage_info = g_instance_info.get(instance);\n'
+        out += '        if (nullptr == instance_valid_usage_info) {\n'
+        out += '            return XR_ERROR_HANDLE_INVALID;\n'
+        out += '        }\n'
+        out += '        return instance_valid_usage_info->dispatch_table->GetInstanceProcAddr(instance, name, function);\n'
+        out += '    } catch (...) {\n'
+        out += '        return XR_ERROR_VALIDATION_FAILURE;\n'
+        out += '    }\n'
+        out += '}\n'